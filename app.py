@@ -4,30 +4,45 @@ from datetime import timedelta
 from flask_compress import Compress
 from flask_cors import CORS
 from flask import Flask, jsonify
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_smorest import Api
-from db import db
+from db import db, configure_engine, get_engine_options
 from dotenv import load_dotenv
 
 
 from flask_jwt_extended import JWTManager
-from blocklist import BLOCKLIST
+from blocklist import is_token_revoked, purge_expired_tokens, JWT_BLOCKLIST_PURGE_INTERVAL
 from flask_migrate import Migrate
 
 from resources.auth_resource import blp as AuthBlueprint
 from resources.user_resource import blp as UserBlueprint
 from resources.wardrobe_items_resource import blp as WardrobeItemsBlueprint
 from resources.outfits_resource import blp as OutfitsBlueprint
+from resources.internal_resource import blp as InternalBlueprint
 
 from authlib.integrations.flask_client import OAuth
 
+from utils import metrics, object_storage
+from utils.image_cache import cli as image_cache_cli
+from utils.outfit_candidates import cli as outfit_index_cli
+from utils.periodic import register_periodic_task
+from utils.pending_signups import purge_expired_signups, PENDING_SIGNUP_SWEEP_INTERVAL
+
 def create_app(db_url=None):
     app = Flask(__name__)
     load_dotenv()
 
+    # Number of reverse proxies in front of the app that append to X-Forwarded-For; 0 (the default)
+    # trusts none, so a client talking to gunicorn directly can't pick its own address
+    app.config["TRUSTED_PROXY_COUNT"] = int(os.getenv("TRUSTED_PROXY_COUNT", "0"))
+    if app.config["TRUSTED_PROXY_COUNT"]:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["TRUSTED_PROXY_COUNT"])
+
     CORS(app,
          resources={r"/*": {"origins": "*"}},
          methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"],
          allow_headers=["Authorization", "Content-Type", "X-Requested-With"],
+         expose_headers=["X-Next-Cursor"],
          max_age=3600)
 
     app.secret_key = os.getenv("APP_SECRET_KEY")
@@ -42,9 +57,20 @@ def create_app(db_url=None):
     app.config["OPENAPI_SWAGGER_UI_PATH"] = "/api-docs"
     app.config["OPENAPI_SWAGGER_UI_URL"] = "https://cdn.jsdelivr.net/npm/swagger-ui-dist/"
     app.config["SQLALCHEMY_DATABASE_URI"] = db_url or os.getenv("DATABASE_URL", "sqlite:////app/data.db")
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = get_engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    # Whole request body, so it has to fit a full batch upload
+    app.config["MAX_CONTENT_LENGTH"] = int(os.getenv("MAX_CONTENT_LENGTH", str(64 * 1024 * 1024)))
+    app.config["WARDROBE_INGESTION_MODE"] = os.getenv("WARDROBE_INGESTION_MODE", "sync")
     db.init_app(app)
 
+    with app.app_context():
+        configure_engine(db.engine)
+        metrics.instrument_engine(db.engine)
+
+    metrics.init_app(app)
+    object_storage.init_app(app)
+
     oauth = OAuth(app)
     app.oauth = oauth
 
@@ -69,7 +95,7 @@ def create_app(db_url=None):
 
     @jwt.token_in_blocklist_loader
     def check_if_token_in_blocklist(jwt_header, jwt_payload):
-        return jwt_payload['jti'] in BLOCKLIST
+        return is_token_revoked(jwt_payload)
 
     @jwt.revoked_token_loader
     def revoked_token_callback(jwt_header, jwt_payload):
@@ -130,6 +156,10 @@ def create_app(db_url=None):
         from models.user_model import UserModel
         from models.wardrobe_items_model import WardrobeItemsModel
         from models.outfits import OutfitsModel
+        from models.ingestion_job_model import IngestionJobModel
+        from models.token_blocklist_model import TokenBlocklistModel
+        from models.pending_signup_model import PendingSignupModel
+        from models.outfit_candidate_model import OutfitCandidateModel
 
         db.create_all()
 
@@ -137,6 +167,13 @@ def create_app(db_url=None):
     api.register_blueprint(UserBlueprint)
     api.register_blueprint(WardrobeItemsBlueprint)
     api.register_blueprint( OutfitsBlueprint)
+    api.register_blueprint(InternalBlueprint)
+
+    app.cli.add_command(image_cache_cli)
+    app.cli.add_command(outfit_index_cli)
+
+    register_periodic_task(app, "jwt-blocklist-purge", JWT_BLOCKLIST_PURGE_INTERVAL, purge_expired_tokens)
+    register_periodic_task(app, "pending-signup-sweep", PENDING_SIGNUP_SWEEP_INTERVAL, purge_expired_signups)
 
     return app
 
@@ -0,0 +1,176 @@
+"""
+Compares attire classifier backends: the remote prediction service against the
+in-process ONNX model, with and without micro-batching.
+
+Run from the repository root:
+    python -m benchmarks.bench_attire_classifier --model attire.onnx
+    python -m benchmarks.bench_attire_classifier --concurrency 1,4,16 --requests 200
+
+The remote backend talks to a local stand-in of the prediction service that
+runs the same model, so the difference is the HTTP round trip and the JPEG
+encode/decode; pass --remote-latency-ms to add the network latency of the real
+deployment on top. Without --model a small random CNN is generated as the
+model, which needs the onnx package (pip install onnx).
+"""
+import argparse
+import io
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from PIL import Image
+
+from utils.attire_classifier import ATTIRE_LABELS, OnnxClassifier, RemoteClassifier
+from utils.prediction_client import CircuitBreaker, PredictionClient
+
+
+def build_standin_model(path, input_size):
+    # Two strided convolutions, global pooling and a linear layer, with a dynamic batch dimension
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+
+    rng = np.random.default_rng(0)
+
+    def weight(name, *shape):
+        return numpy_helper.from_array(rng.normal(0, 0.1, shape).astype(np.float32), name)
+
+    graph = helper.make_graph(
+        [
+            helper.make_node("Conv", ["input", "w1", "b1"], ["c1"], strides=[2, 2], pads=[1, 1, 1, 1]),
+            helper.make_node("Relu", ["c1"], ["r1"]),
+            helper.make_node("Conv", ["r1", "w2", "b2"], ["c2"], strides=[2, 2], pads=[1, 1, 1, 1]),
+            helper.make_node("Relu", ["c2"], ["r2"]),
+            helper.make_node("GlobalAveragePool", ["r2"], ["pooled"]),
+            helper.make_node("Flatten", ["pooled"], ["flat"]),
+            helper.make_node("Gemm", ["flat", "w3", "b3"], ["scores"], transB=1),
+        ],
+        "attire_standin",
+        [helper.make_tensor_value_info("input", TensorProto.FLOAT, ["batch", 3, input_size, input_size])],
+        [helper.make_tensor_value_info("scores", TensorProto.FLOAT, ["batch", len(ATTIRE_LABELS)])],
+        [
+            weight("w1", 16, 3, 3, 3), weight("b1", 16),
+            weight("w2", 32, 16, 3, 3), weight("b2", 32),
+            weight("w3", len(ATTIRE_LABELS), 32), weight("b3", len(ATTIRE_LABELS)),
+        ],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, path)
+
+
+def start_standin_service(classifier, latency):
+    class PredictHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            # Headers and body are separate writes, don't let Nagle hold the body back
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            # The JPEG is the only part of the multipart body, between the part headers and the boundary
+            start = body.index(b"\r\n\r\n") + 4
+            end = body.rindex(b"\r\n--")
+            image = Image.open(io.BytesIO(body[start:end]))
+
+            if latency:
+                time.sleep(latency)
+            data = json.dumps({"prediction": classifier.run([classifier.preprocess(image)])[0]}).encode()
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PredictHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_images(count):
+    rng = np.random.default_rng(1)
+    images = []
+    for _ in range(count):
+        pixels = rng.integers(0, 256, (512, 384, 4), dtype=np.uint8)
+        pixels[..., 3] = 255
+        images.append(Image.fromarray(pixels, "RGBA"))
+    return images
+
+
+def measure(classify, images, requests, concurrency):
+    latencies = []
+
+    def one(index):
+        started = time.perf_counter()
+        classify(images[index % len(images)])
+        latencies.append(time.perf_counter() - started)
+
+    # Warm up the session, the batcher and the connection pool
+    for index in range(concurrency):
+        classify(images[index % len(images)])
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = np.array(latencies) * 1000
+    return np.percentile(latencies, 50), np.percentile(latencies, 95), requests / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="ONNX attire model, a random stand-in is generated if omitted")
+    parser.add_argument("--input-size", type=int, default=224)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--remote-latency-ms", type=float, default=0, help="added to every stand-in service call")
+    parser.add_argument("--threads", type=int, default=1, help="onnxruntime threads per session")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        model_path = args.model
+        if not model_path:
+            model_path = os.path.join(directory, "attire_standin.onnx")
+            build_standin_model(model_path, args.input_size)
+
+        def onnx_classifier(batch_size):
+            return OnnxClassifier(model_path, ATTIRE_LABELS, input_size=args.input_size,
+                                  threads=args.threads, batch_size=batch_size, batch_wait_ms=2)
+
+        # The stand-in service runs the model directly, one image per call like the real one
+        service_model = onnx_classifier(1)
+        service_model.get_session()
+        server = start_standin_service(service_model, args.remote_latency_ms / 1000)
+
+        client = PredictionClient(f"http://127.0.0.1:{server.server_port}/predict", pool_size=32,
+                                  timeout=(2, 30), retries=0, breaker=CircuitBreaker(10 ** 9, 1))
+        backends = {
+            "remote": RemoteClassifier(client),
+            "onnx": onnx_classifier(1),
+            "onnx-batched": onnx_classifier(16),
+        }
+
+        images = make_images(16)
+        print(f"{'backend':<14}{'concurrency':>12}{'p50 ms':>10}{'p95 ms':>10}{'images/s':>11}")
+        for concurrency in [int(value) for value in args.concurrency.split(",")]:
+            for name, backend in backends.items():
+                p50, p95, throughput = measure(backend.classify, images, args.requests, concurrency)
+                print(f"{name:<14}{concurrency:>12}{p50:>10.2f}{p95:>10.2f}{throughput:>11.1f}")
+
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Compares the fast NumPy color engine with the scikit-learn KMeans engine.
+
+Run from the repository root:
+    python -m benchmarks.bench_color_extractor --images 200
+"""
+import argparse
+import time
+
+import numpy as np
+from PIL import Image
+
+from utils.color_extractor import get_dominant_color
+
+
+def make_synthetic_image(rng, size=400):
+    # Transparent background with a few noisy colored garment-like blobs on top
+    pixels = np.zeros((size, size, 4), dtype=np.uint8)
+    yy, xx = np.mgrid[:size, :size]
+
+    for _ in range(rng.integers(1, 4)):
+        color = rng.integers(0, 256, size=3)
+        cy, cx = rng.integers(size // 4, 3 * size // 4, size=2)
+        radius = rng.integers(size // 8, size // 3)
+        mask = (yy - cy) ** 2 + (xx - cx) ** 2 < radius ** 2
+
+        noise = rng.normal(0, 12, size=(mask.sum(), 3))
+        pixels[mask, :3] = np.clip(color + noise, 0, 255).astype(np.uint8)
+        pixels[mask, 3] = 255
+
+    return Image.fromarray(pixels, "RGBA")
+
+
+def hex_to_rgb(hex_color):
+    return np.array([int(hex_color[i:i + 2], 16) for i in (1, 3, 5)])
+
+
+def run_engine(engine, images):
+    started = time.perf_counter()
+    colors = [get_dominant_color(image, engine=engine) for image in images]
+    return colors, (time.perf_counter() - started) / len(images)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tolerance", type=float, default=20.0, help="max RGB distance counted as agreement")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    images = [make_synthetic_image(rng) for _ in range(args.images)]
+
+    # Warm up imports before timing
+    get_dominant_color(images[0], engine="kmeans")
+    get_dominant_color(images[0], engine="fast")
+
+    kmeans_colors, kmeans_seconds = run_engine("kmeans", images)
+    fast_colors, fast_seconds = run_engine("fast", images)
+
+    distances = np.array([
+        np.linalg.norm(hex_to_rgb(a) - hex_to_rgb(b)) for a, b in zip(kmeans_colors, fast_colors)
+    ])
+
+    print(f"images:             {args.images}")
+    print(f"kmeans per image:   {kmeans_seconds * 1000:.2f} ms")
+    print(f"fast per image:     {fast_seconds * 1000:.2f} ms")
+    print(f"speedup:            {kmeans_seconds / fast_seconds:.1f}x")
+    print(f"agreement (<= {args.tolerance:g}): {(distances <= args.tolerance).mean() * 100:.1f}%")
+    print(f"median distance:    {np.median(distances):.2f}")
+    print(f"max distance:       {distances.max():.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Times the outfit scoring engine on generated wardrobes.
+
+Run from the repository root:
+    python -m benchmarks.bench_outfit_scoring
+    python -m benchmarks.bench_outfit_scoring --items 1000,5000 --harmony neutral
+
+"load" builds the arrays from the items, "anchored" ranks every outfit
+containing one item (what a recommendation scores when it isn't limited to
+the candidate index) and "full" ranks every kira x tego x wonju combination of
+the wardrobe. "python anchored" is the same anchored ranking as a plain Python
+loop over the pairs, for comparison.
+"""
+import argparse
+import colorsys
+import random
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from utils.outfit_scoring import ITEM_TYPES, WardrobeArrays, get_harmony_model, top_outfits
+
+
+def make_items(count, seed=0):
+    rng = random.Random(seed)
+    items = []
+    for item_id in range(1, count + 1):
+        red, green, blue = colorsys.hls_to_rgb(rng.random(), rng.uniform(0.1, 0.9), rng.random())
+        items.append(SimpleNamespace(
+            id=item_id,
+            type=rng.choice(ITEM_TYPES),
+            color=f"#{int(red * 255):02x}{int(green * 255):02x}{int(blue * 255):02x}",
+            hue=None,
+            saturation=None,
+            lightness=None,
+        ))
+    return items
+
+
+def python_anchored(wardrobe, anchor_position, k, model):
+    # The same pair cost, one pair at a time in plain Python
+    hue, saturation, lightness, neutral = (
+        values.tolist() for values in (wardrobe.hue, wardrobe.saturation, wardrobe.lightness, wardrobe.neutral)
+    )
+    hue_weight, saturation_weight, lightness_weight = model.weights
+
+    def cost(a, b):
+        difference = abs(hue[a] - hue[b])
+        difference = min(difference, 360 - difference)
+        hue_cost = min(abs(difference - target) for target in model.targets) / model.hue_range
+        if model.neutral_tolerant and (neutral[a] or neutral[b]):
+            hue_cost = 0.0
+        return (hue_weight * hue_cost + saturation_weight * abs(saturation[a] - saturation[b])
+                + lightness_weight * abs(lightness[a] - lightness[b]))
+
+    others = [item_type for item_type in ITEM_TYPES if ITEM_TYPES.index(item_type) != wardrobe.types[anchor_position]]
+    first, second = (wardrobe.positions(item_type).tolist() for item_type in others)
+    scored = [
+        (cost(anchor_position, a) + cost(anchor_position, b) + cost(a, b), a, b)
+        for a in first for b in second
+    ]
+    return sorted(scored)[:k]
+
+
+def timed(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return np.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", default="300,1000,3000")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--harmony", default="analogous")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--python-max-items", type=int, default=1000,
+                        help="skip the pure Python loop above this wardrobe size, it's quadratic")
+    args = parser.parse_args()
+
+    model = get_harmony_model(args.harmony)
+    print(f"{'items':>7}{'load ms':>10}{'anchored ms':>13}{'full ms':>10}{'python anchored ms':>20}")
+    for count in [int(value) for value in args.items.split(",")]:
+        items = make_items(count)
+        wardrobe = WardrobeArrays.from_items(items)
+        anchor = items[0].id
+
+        load = timed(lambda: WardrobeArrays.from_items(items), args.repeat)
+        anchored = timed(lambda: top_outfits(wardrobe, args.top, anchor=anchor, model=model), args.repeat)
+        full = timed(lambda: top_outfits(wardrobe, args.top, model=model), max(1, args.repeat // 10))
+
+        python = "-"
+        if count <= args.python_max_items:
+            python = f"{timed(lambda: python_anchored(wardrobe, 0, args.top, model), 1):.2f}"
+        print(f"{count:>7}{load:>10.2f}{anchored:>13.2f}{full:>10.1f}{python:>20}")
+
+
+if __name__ == "__main__":
+    main()
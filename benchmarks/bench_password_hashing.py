@@ -0,0 +1,60 @@
+"""
+Measures password verify throughput per core for candidate hashing schemes.
+
+Run from the repository root:
+    python -m benchmarks.bench_password_hashing --seconds 2
+    python -m benchmarks.bench_password_hashing --candidates pbkdf2_sha256:29000,pbkdf2_sha256:100000,argon2
+
+Candidates are "scheme" or "scheme:rounds". Schemes whose backend isn't
+installed (argon2-cffi, bcrypt) are reported as skipped.
+"""
+import argparse
+import time
+
+from passlib.exc import MissingBackendError
+
+from utils.password_service import build_context
+
+DEFAULT_CANDIDATES = "pbkdf2_sha256:29000,pbkdf2_sha256:100000,pbkdf2_sha256:310000,bcrypt:10,bcrypt:12,argon2"
+
+
+def measure(candidate, seconds):
+    scheme, _, rounds = candidate.partition(":")
+    kwargs = {}
+    if rounds and scheme == "pbkdf2_sha256":
+        kwargs["pbkdf2_rounds"] = int(rounds)
+    if rounds and scheme == "bcrypt":
+        kwargs["bcrypt_rounds"] = int(rounds)
+
+    context = build_context([scheme], **kwargs)
+    password_hash = context.hash("correct horse battery staple")
+
+    # Single thread, so the rate is the throughput of one core
+    verifies = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        context.verify("correct horse battery staple", password_hash)
+        verifies += 1
+    elapsed = time.perf_counter() - started
+
+    return verifies / elapsed, elapsed / verifies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidates", default=DEFAULT_CANDIDATES)
+    parser.add_argument("--seconds", type=float, default=2.0, help="time spent verifying per candidate")
+    args = parser.parse_args()
+
+    print(f"{'candidate':<28}{'verifies/s/core':>18}{'ms/verify':>12}")
+    for candidate in args.candidates.split(","):
+        try:
+            per_second, per_verify = measure(candidate.strip(), args.seconds)
+        except (MissingBackendError, ImportError, KeyError) as e:
+            print(f"{candidate:<28}{'skipped':>18}  ({e})")
+            continue
+        print(f"{candidate:<28}{per_second:>18.1f}{per_verify * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
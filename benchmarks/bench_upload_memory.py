@@ -0,0 +1,125 @@
+"""
+Measures peak RSS while one large photo goes through the upload path.
+
+Run from the repository root:
+    python -m benchmarks.bench_upload_memory
+    python -m benchmarks.bench_upload_memory --megapixels 24 --with-rembg
+
+Each variant runs in a fresh process so its peak RSS isn't hidden by an
+earlier one. "buffered" is the previous handling (whole file read for the
+hash, full-size decode before the thumbnail); "streaming" is the current one.
+Background removal needs the rembg model and is only included with --with-rembg.
+"""
+import argparse
+import hashlib
+import io
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+
+def make_photo(path, megapixels):
+    # Smooth gradients plus noise, so the JPEG is about as large as a phone photo
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    pixels = np.stack([x + y * 0, y + x * 0, (x + y) / 2], axis=-1)
+    pixels += rng.normal(0, 12, pixels.shape).astype(np.float32)
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(path, "JPEG", quality=92)
+
+
+def peak_rss_mb():
+    # VmHWM is this process' own high-water mark; ru_maxrss on Linux also
+    # carries the parent's peak over fork + exec
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def buffered(upload, max_side, with_rembg):
+    upload.seek(0)
+    data = upload.read()
+    hashlib.sha256(data).hexdigest()
+
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    image.thumbnail((max_side, max_side))
+    if with_rembg:
+        from rembg import remove
+        from utils.remove_bg import get_session
+        image = remove(image, session=get_session())
+    return image
+
+
+def streaming(upload, max_side, with_rembg):
+    from utils.image_hash import calculate_image_hash
+    from utils.image_io import open_image
+
+    calculate_image_hash(upload)
+    if with_rembg:
+        from utils.remove_bg import remove_background
+        return remove_background(upload)
+    return open_image(upload, max_side)
+
+
+variants = {"buffered": buffered, "streaming": streaming}
+
+
+def run_variant(name, path, max_side, with_rembg, queue):
+    from utils.color_extractor import get_dominant_color
+
+    # Imports and the model session count towards the baseline, not the upload
+    if with_rembg:
+        from utils.remove_bg import get_session
+        get_session()
+    baseline = peak_rss_mb()
+
+    started = time.perf_counter()
+    with open(path, "rb") as upload:
+        image = variants[name](upload, max_side, with_rembg)
+        get_dominant_color(image.convert("RGBA"))
+    elapsed = time.perf_counter() - started
+
+    queue.put((baseline, peak_rss_mb(), elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megapixels", type=float, default=12)
+    parser.add_argument("--max-side", type=int, default=1024)
+    parser.add_argument("--with-rembg", action="store_true")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "photo.jpg")
+        make_photo(path, args.megapixels)
+        print(f"{args.megapixels:g} MP JPEG, {os.path.getsize(path) / 1024 / 1024:.1f} MB on disk\n")
+
+        print(f"{'variant':<12}{'baseline MB':>14}{'peak MB':>10}{'upload MB':>12}{'seconds':>10}")
+        for name in variants:
+            queue = context.Queue()
+            process = context.Process(target=run_variant, args=(name, path, args.max_side, args.with_rembg, queue))
+            process.start()
+            baseline, peak, elapsed = queue.get()
+            process.join()
+            print(f"{name:<12}{baseline:>14.1f}{peak:>10.1f}{peak - baseline:>12.1f}{elapsed:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,139 @@
 """
 blocklist.py
 
-This file just contains the blocklist of the JWT tokens. It will be imported by
-app and the logout resource so that tokens can be added to the blocklist when the
-user logs out.
+This file contains the blocklist of the JWT tokens. It is used by app (to reject
+revoked tokens) and by the logout and refresh resources (to revoke them).
+
+Revoked JTIs are kept until the token's own `exp`, after which the token is
+rejected anyway and the entry is purged. The backend is picked with
+JWT_BLOCKLIST_BACKEND:
+- "database" (default): a table shared by every gunicorn worker
+- "memory": a per-process dict, only correct with a single worker
 """
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from db import db
+from models import TokenBlocklistModel
+
+JWT_BLOCKLIST_BACKEND = os.getenv("JWT_BLOCKLIST_BACKEND", "database")
+JWT_BLOCKLIST_CACHE_SIZE = int(os.getenv("JWT_BLOCKLIST_CACHE_SIZE", "4096"))
+# Seconds a "not revoked" answer may be reused by a worker; a token revoked on
+# another worker stays usable here for up to this long, so it is off by default
+JWT_BLOCKLIST_NEGATIVE_TTL = float(os.getenv("JWT_BLOCKLIST_NEGATIVE_TTL", "0"))
+JWT_BLOCKLIST_PURGE_INTERVAL = int(os.getenv("JWT_BLOCKLIST_PURGE_INTERVAL", "600"))
+
+
+class MemoryBlocklist:
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def add(self, jti, expires_at):
+        with self.lock:
+            self.entries[jti] = expires_at
+
+    def get_expiry(self, jti):
+        return self.entries.get(jti)
+
+    def purge(self, now):
+        with self.lock:
+            expired = [jti for jti, expires_at in self.entries.items() if expires_at <= now]
+            for jti in expired:
+                del self.entries[jti]
+        return len(expired)
+
+
+class DatabaseBlocklist:
+    def add(self, jti, expires_at):
+        db.session.merge(TokenBlocklistModel(
+            jti=jti,
+            expires_at=datetime.fromtimestamp(expires_at, timezone.utc)
+        ))
+        db.session.commit()
+
+    def get_expiry(self, jti):
+        entry = TokenBlocklistModel.query.get(jti)
+        if not entry:
+            return None
+        expires_at = entry.expires_at
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        return expires_at.timestamp()
+
+    def purge(self, now):
+        deleted = TokenBlocklistModel.query.filter(
+            TokenBlocklistModel.expires_at <= datetime.fromtimestamp(now, timezone.utc)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+
+class BlocklistCache:
+    """
+    Small per-worker LRU in front of the backend.
+    Revocations never get undone, so a cached "revoked" answer is valid until the token expires.
+    """
+
+    def __init__(self, max_size, negative_ttl):
+        self.max_size = max_size
+        self.negative_ttl = negative_ttl
+        self.entries = OrderedDict()  # jti -> (revoked, valid_until)
+        self.lock = threading.Lock()
+
+    def get(self, jti, now):
+        with self.lock:
+            entry = self.entries.get(jti)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self.entries[jti]
+                return None
+            self.entries.move_to_end(jti)
+            return entry[0]
+
+    def set(self, jti, revoked, valid_until):
+        with self.lock:
+            self.entries[jti] = (revoked, valid_until)
+            self.entries.move_to_end(jti)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+
+backends = {
+    "database": DatabaseBlocklist,
+    "memory": MemoryBlocklist,
+}
+
+BLOCKLIST = backends[JWT_BLOCKLIST_BACKEND]()
+cache = BlocklistCache(JWT_BLOCKLIST_CACHE_SIZE, JWT_BLOCKLIST_NEGATIVE_TTL)
+
+
+def add_to_blocklist(jwt_payload):
+    BLOCKLIST.add(jwt_payload["jti"], jwt_payload["exp"])
+    cache.set(jwt_payload["jti"], True, jwt_payload["exp"])
+
+
+def is_token_revoked(jwt_payload):
+    jti = jwt_payload["jti"]
+    now = time.time()
+
+    revoked = cache.get(jti, now)
+    if revoked is not None:
+        return revoked
+
+    expires_at = BLOCKLIST.get_expiry(jti)
+    if expires_at is not None:
+        cache.set(jti, True, expires_at)
+        return True
+
+    if JWT_BLOCKLIST_NEGATIVE_TTL:
+        cache.set(jti, False, now + JWT_BLOCKLIST_NEGATIVE_TTL)
+    return False
+
 
-BLOCKLIST = set()
\ No newline at end of file
+def purge_expired_tokens():
+    return BLOCKLIST.purge(time.time())
@@ -1,3 +1,121 @@
+import os
+import threading
+import time
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
 
 db = SQLAlchemy()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that also records how long checkouts wait for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_lock = threading.Lock()
+        self.wait_stats = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+
+    def _do_get(self):
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self.wait_lock:
+                self.wait_stats["checkouts"] += 1
+                self.wait_stats["timeouts"] += timed_out
+                self.wait_stats["total_wait_seconds"] += waited
+                self.wait_stats["max_wait_seconds"] = max(self.wait_stats["max_wait_seconds"], waited)
+
+
+def env_bool(name, default):
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes")
+
+
+def get_engine_options(db_url):
+    """
+    Engine options for SQLALCHEMY_ENGINE_OPTIONS, read from env vars with per-backend defaults.
+    - DB_POOL_SIZE defaults to the request threads of a gunicorn worker plus its
+      background ingestion threads and one spare for periodic tasks
+    - DB_STATEMENT_TIMEOUT_MS applies to Postgres only
+    """
+    url = make_url(db_url)
+
+    # In-memory SQLite lives on a single connection, Flask-SQLAlchemy sets that pool up
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+
+    default_pool_size = int(os.getenv("GUNICORN_THREADS", "1")) + int(os.getenv("INGESTION_WORKERS", "2")) + 1
+    options = {
+        "poolclass": TimedQueuePool,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", default_pool_size)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "5")),
+        "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "10")),
+        "pool_pre_ping": env_bool("DB_POOL_PRE_PING", True),
+    }
+
+    if url.get_backend_name() == "postgresql":
+        # Recycle before the server or a proxy in between drops idle connections
+        options["pool_recycle"] = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+        statement_timeout = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+        if statement_timeout:
+            options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout}"}
+    else:
+        options["pool_recycle"] = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+
+    return options
+
+
+def get_sqlite_pragmas():
+    # DB_SQLITE_PRAGMAS="journal_mode=WAL,synchronous=NORMAL,busy_timeout=5000"
+    pragmas = os.getenv("DB_SQLITE_PRAGMAS", "journal_mode=WAL,synchronous=NORMAL,busy_timeout=5000")
+    return [pragma.strip() for pragma in pragmas.split(",") if pragma.strip()]
+
+
+def configure_engine(engine):
+    if engine.dialect.name != "sqlite":
+        return
+
+    pragmas = get_sqlite_pragmas()
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(f"PRAGMA {pragma}")
+        cursor.close()
+
+
+def get_pool_stats(engine):
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__, "status": pool.status()}
+
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        })
+
+    if isinstance(pool, TimedQueuePool):
+        with pool.wait_lock:
+            wait_stats = dict(pool.wait_stats)
+        wait_stats["avg_wait_seconds"] = (
+            wait_stats["total_wait_seconds"] / wait_stats["checkouts"] if wait_stats["checkouts"] else None
+        )
+        stats.update(wait_stats)
+
+    return stats
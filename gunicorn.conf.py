@@ -0,0 +1,52 @@
+import os
+
+bind = "0.0.0.0:3000"
+workers = int(os.getenv("WEB_CONCURRENCY", "3"))
+# Request threads per worker, also used to size each worker's database pool (see db.py)
+threads = int(os.getenv("GUNICORN_THREADS", "1"))
+
+# Import the app (and its models) once in the master, workers inherit it on fork
+preload_app = True
+
+
+def on_starting(server):
+    # Samples left over from a previous run would be aggregated into /metrics
+    multiproc_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir and os.path.isdir(multiproc_dir):
+        for name in os.listdir(multiproc_dir):
+            if name.endswith(".db"):
+                os.remove(os.path.join(multiproc_dir, name))
+
+
+def when_ready(server):
+    from utils.remove_bg import preload_session
+
+    try:
+        if preload_session():
+            server.log.info("Background removal session preloaded")
+        else:
+            server.log.info("Background removal model downloaded, workers create multi-threaded sessions")
+    except Exception:
+        server.log.exception("Could not preload the background removal session")
+
+
+def post_fork(server, worker):
+    from db import db
+
+    # Connections opened by the master while preloading must not be shared with the workers
+    with server.app.wsgi().app_context():
+        db.engine.dispose(close=False)
+
+    # Warm the session before the worker takes its first upload
+    from utils.remove_bg import get_session
+
+    try:
+        get_session()
+    except Exception:
+        server.log.exception("Could not load the background removal session")
+
+
+def child_exit(server, worker):
+    from utils.metrics import mark_process_dead
+
+    mark_process_dead(worker.pid)
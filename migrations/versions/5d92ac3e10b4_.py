@@ -0,0 +1,59 @@
+"""add indexes for per-user queries
+
+Revision ID: 5d92ac3e10b4
+Revises: b8e41d2c7f60
+Create Date: 2026-10-18 10:41:53.117620
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d92ac3e10b4'
+down_revision = 'b8e41d2c7f60'
+branch_labels = None
+depends_on = None
+
+
+outfits = sa.table(
+    'outfits',
+    sa.column('id', sa.Integer),
+    sa.column('favorite', sa.Boolean),
+    sa.column('user_id', sa.Integer),
+    sa.column('kira_id', sa.Integer),
+    sa.column('tego_id', sa.Integer),
+    sa.column('wonju_id', sa.Integer),
+)
+
+
+def upgrade():
+    # Collapse duplicate outfits onto the oldest row before adding the unique index,
+    # keeping it as a favorite if any of the duplicates was one
+    combination = (outfits.c.user_id, outfits.c.kira_id, outfits.c.tego_id, outfits.c.wonju_id)
+    kept = sa.select(sa.func.min(outfits.c.id)).group_by(*combination)
+    favorite_kept = (
+        sa.select(sa.func.min(outfits.c.id))
+        .group_by(*combination)
+        .having(sa.func.max(sa.case((outfits.c.favorite, 1), else_=0)) == 1)
+    )
+    op.execute(outfits.update().where(outfits.c.id.in_(favorite_kept)).values(favorite=True))
+    op.execute(outfits.delete().where(outfits.c.id.not_in(kept)))
+
+    with op.batch_alter_table('wardrobe_items', schema=None) as batch_op:
+        batch_op.create_index('ix_wardrobe_items_user_id_image_hash', ['user_id', 'image_hash'], unique=False)
+
+    with op.batch_alter_table('outfits', schema=None) as batch_op:
+        batch_op.create_index('ix_outfits_user_id_combination', ['user_id', 'kira_id', 'tego_id', 'wonju_id'], unique=True)
+        batch_op.create_index('ix_outfits_user_id_favorite', ['user_id', 'favorite'], unique=False)
+        batch_op.create_index('ix_outfits_user_id_id_desc', ['user_id', sa.text('id DESC')], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('outfits', schema=None) as batch_op:
+        batch_op.drop_index('ix_outfits_user_id_id_desc')
+        batch_op.drop_index('ix_outfits_user_id_favorite')
+        batch_op.drop_index('ix_outfits_user_id_combination')
+
+    with op.batch_alter_table('wardrobe_items', schema=None) as batch_op:
+        batch_op.drop_index('ix_wardrobe_items_user_id_image_hash')
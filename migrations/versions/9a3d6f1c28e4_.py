@@ -0,0 +1,49 @@
+"""store the storage public id of wardrobe items
+
+Revision ID: 9a3d6f1c28e4
+Revises: c4a07e95b3f1
+Create Date: 2026-10-18 14:21:37.518203
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a3d6f1c28e4'
+down_revision = 'c4a07e95b3f1'
+branch_labels = None
+depends_on = None
+
+
+wardrobe_items = sa.table(
+    'wardrobe_items',
+    sa.column('id', sa.Integer),
+    sa.column('image_url', sa.String),
+    sa.column('public_id', sa.String),
+)
+
+
+def upgrade():
+    with op.batch_alter_table('wardrobe_items', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('public_id', sa.String(length=255), nullable=True))
+
+    # Backfill existing rows from their Cloudinary URL, as WardrobeItem.delete used to
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(wardrobe_items.c.id, wardrobe_items.c.image_url)).fetchall()
+    for item_id, image_url in rows:
+        match = re.search(r"upload\/(?:v\d+\/)?(.+?)\.(jpg|png|jpeg|webp)", image_url or "")
+        if not match:
+            continue
+        connection.execute(
+            wardrobe_items.update()
+            .where(wardrobe_items.c.id == item_id)
+            .values(public_id=match.group(1))
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('wardrobe_items', schema=None) as batch_op:
+        batch_op.drop_column('public_id')
@@ -0,0 +1,60 @@
+"""store hue, saturation and lightness of wardrobe items
+
+Revision ID: b8e41d2c7f60
+Revises: 3c5b1f0e9a7d
+Create Date: 2026-10-18 10:02:11.904512
+
+"""
+import colorsys
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e41d2c7f60'
+down_revision = '3c5b1f0e9a7d'
+branch_labels = None
+depends_on = None
+
+
+wardrobe_items = sa.table(
+    'wardrobe_items',
+    sa.column('id', sa.Integer),
+    sa.column('color', sa.String),
+    sa.column('hue', sa.Float),
+    sa.column('saturation', sa.Float),
+    sa.column('lightness', sa.Float),
+)
+
+
+def upgrade():
+    with op.batch_alter_table('wardrobe_items', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('hue', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('saturation', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('lightness', sa.Float(), nullable=True))
+        batch_op.create_index('ix_wardrobe_items_user_id_type_hue', ['user_id', 'type', 'hue'], unique=False)
+
+    # Backfill existing rows, same conversion as utils.outfits_recommendation.hex_to_hsl
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(wardrobe_items.c.id, wardrobe_items.c.color)).fetchall()
+    for item_id, color in rows:
+        try:
+            hex_color = color.lstrip('#')
+            r, g, b = tuple(int(hex_color[i:i + 2], 16) / 255.0 for i in (0, 2, 4))
+        except (AttributeError, ValueError):
+            continue
+        h, l, s = colorsys.rgb_to_hls(r, g, b)
+        connection.execute(
+            wardrobe_items.update()
+            .where(wardrobe_items.c.id == item_id)
+            .values(hue=h * 360, saturation=s, lightness=l)
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('wardrobe_items', schema=None) as batch_op:
+        batch_op.drop_index('ix_wardrobe_items_user_id_type_hue')
+        batch_op.drop_column('lightness')
+        batch_op.drop_column('saturation')
+        batch_op.drop_column('hue')
@@ -1,3 +1,7 @@
 from models.user_model import UserModel
 from models.wardrobe_items_model import WardrobeItemsModel
 from models.outfits import OutfitsModel
+from models.ingestion_job_model import IngestionJobModel
+from models.token_blocklist_model import TokenBlocklistModel
+from models.pending_signup_model import PendingSignupModel
+from models.outfit_candidate_model import OutfitCandidateModel
@@ -0,0 +1,26 @@
+from datetime import datetime, timezone
+
+from db import db
+
+
+def utc_now():
+    return datetime.now(timezone.utc)
+
+
+class IngestionJobModel(db.Model):
+    __tablename__ = "ingestion_jobs"
+
+    id = db.Column(db.String(32), primary_key=True)
+    name = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="queued")
+    stage = db.Column(db.String(20))
+    stages = db.Column(db.JSON, nullable=False, default=dict)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=utc_now)
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, default=utc_now, onupdate=utc_now)
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    wardrobe_item_id = db.Column(db.Integer, db.ForeignKey("wardrobe_items.id", ondelete="SET NULL"))
+
+    user = db.relationship("UserModel", back_populates="ingestion_jobs")
+    wardrobe_item = db.relationship("WardrobeItemsModel")
@@ -0,0 +1,25 @@
+from db import db
+
+
+class OutfitCandidateModel(db.Model):
+    """One of the nearest items of another type for a wardrobe item, see utils/outfit_candidates.py"""
+    __tablename__ = "outfit_candidates"
+
+    id = db.Column(db.Integer, primary_key=True)
+    distance = db.Column(db.Float, nullable=False)
+    candidate_type = db.Column(db.String(10), nullable=False)
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    item_id = db.Column(db.Integer, db.ForeignKey("wardrobe_items.id", ondelete="CASCADE"), nullable=False)
+    candidate_id = db.Column(db.Integer, db.ForeignKey("wardrobe_items.id", ondelete="CASCADE"), nullable=False)
+
+    user = db.relationship("UserModel", back_populates="outfit_candidates")
+    candidate = db.relationship("WardrobeItemsModel", foreign_keys=[candidate_id])
+
+    __table_args__ = (
+        # best candidates of a type first, the recommend lookup
+        db.Index("ix_outfit_candidates_item_id_type_distance", "item_id", "candidate_type", "distance"),
+        db.Index("ix_outfit_candidates_candidate_id", "candidate_id"),
+        db.Index("ix_outfit_candidates_user_id", "user_id"),
+        db.Index("ix_outfit_candidates_item_id_candidate_id", "item_id", "candidate_id", unique=True),
+    )
@@ -15,3 +15,12 @@ class OutfitsModel(db.Model):
     kira = db.relationship("WardrobeItemsModel", foreign_keys=[kira_id], backref="used_in_kira")
     tego = db.relationship("WardrobeItemsModel", foreign_keys=[tego_id], backref="used_in_tego")
     wonju = db.relationship("WardrobeItemsModel", foreign_keys=[wonju_id], backref="used_in_wonju")
+
+    __table_args__ = (
+        db.Index("ix_outfits_user_id_combination", "user_id", "kira_id", "tego_id", "wonju_id", unique=True),
+        db.Index("ix_outfits_user_id_favorite", "user_id", "favorite"),
+    )
+
+
+# latest outfits first, e.g. the default recommendation
+db.Index("ix_outfits_user_id_id_desc", OutfitsModel.user_id, OutfitsModel.id.desc())
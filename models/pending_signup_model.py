@@ -0,0 +1,12 @@
+from db import db
+
+class PendingSignupModel(db.Model):
+    __tablename__ = "pending_signups"
+
+    email = db.Column(db.String(255), primary_key=True)
+    name = db.Column(db.String(255), nullable=False)
+    password = db.Column(db.String(255), nullable=False)
+    verification_code = db.Column(db.Integer, nullable=False)
+    send_count = db.Column(db.Integer, nullable=False, default=1)
+    window_started_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    expires_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
@@ -0,0 +1,7 @@
+from db import db
+
+class TokenBlocklistModel(db.Model):
+    __tablename__ = "token_blocklist"
+
+    jti = db.Column(db.String(36), primary_key=True)
+    expires_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
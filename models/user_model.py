@@ -16,6 +16,11 @@ class UserModel(db.Model):
     email_code_sent_at = db.Column(db.DateTime(timezone=True))
     code_verified = db.Column(db.Boolean, default=False)
     password = db.Column(db.String(255), nullable=True)
+    # bumped on every change, used as ETags for the collection listings
+    wardrobe_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    outfits_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # set once the outfit candidates of the whole wardrobe are built, see utils/outfit_candidates.py
+    outfit_index_built = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
 
     wardrobe_items = db.relationship("WardrobeItemsModel", back_populates="user", lazy="dynamic", cascade="all, delete")
     outfits = db.relationship(
@@ -24,5 +29,7 @@ class UserModel(db.Model):
         cascade="all, delete",
         foreign_keys="[OutfitsModel.user_id]"
     )
+    ingestion_jobs = db.relationship("IngestionJobModel", back_populates="user", cascade="all, delete")
+    outfit_candidates = db.relationship("OutfitCandidateModel", back_populates="user", cascade="all, delete")
 
 
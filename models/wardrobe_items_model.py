@@ -8,8 +8,19 @@ class WardrobeItemsModel(db.Model):
     name = db.Column(db.String(255), nullable=False)
     type = db.Column(Enum("kira", "tego", "wonju", name="item_type"), nullable=False)
     image_url = db.Column(db.String(255))
+    # Storage key of the image, used to delete it
+    public_id = db.Column(db.String(255))
     color = db.Column(db.String(80), nullable=False)
+    hue = db.Column(db.Float)
+    saturation = db.Column(db.Float)
+    lightness = db.Column(db.Float)
     image_hash = db.Column(db.String(64), nullable=False, unique=False)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), unique=False, nullable=False)
 
     user = db.relationship("UserModel", back_populates="wardrobe_items")
+
+    __table_args__ = (
+        db.Index("ix_wardrobe_items_user_id_image_hash", "user_id", "image_hash"),
+        # also serves the (user_id, type) lookups
+        db.Index("ix_wardrobe_items_user_id_type_hue", "user_id", "type", "hue"),
+    )
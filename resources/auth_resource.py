@@ -1,22 +1,27 @@
 from flask import url_for, request, current_app, redirect, jsonify
 from flask.views import MethodView
 from flask_smorest import Blueprint, abort
-from passlib.hash import pbkdf2_sha256
 from flask_jwt_extended import create_access_token, create_refresh_token, get_jwt
 from urllib.parse import quote
 import json
 from flask_cors import cross_origin
 
-from blocklist import BLOCKLIST
+from blocklist import add_to_blocklist
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timezone
+from sqlalchemy.exc import IntegrityError
 
 from db import db
 from schemas import UserSchema
 from models import UserModel
 from utils.code_verification_utils import is_code_valid, generate_verification_code, is_email_code_valid
+from utils.current_user import get_current_user_or_404, profile_cache
 from utils.email_utils import send_verification_email, send_login_alert_email_async
-from utils.get_user_location import get_location_from_ip
+from utils.password_service import hash_password, verify_password, verify_and_update_password
+from utils.pending_signups import (
+    save_pending_signup, get_pending_signup, is_pending_signup_expired, delete_pending_signup,
+    PendingSignupLimitError
+)
 
 blp = Blueprint("Auth", "auth", description="Authentication routes")
 
@@ -24,8 +29,6 @@ blp = Blueprint("Auth", "auth", description="Authentication routes")
 email_subject = "🔐 Your Email Verification Code"
 password_subject = "🔐 Your Password Verification Code"
 
-pending_users = {}
-
 # sign up users
 @blp.route("/auth/signup")
 class UserSignUp(MethodView):
@@ -37,11 +40,10 @@ class UserSignUp(MethodView):
         code = generate_verification_code()
         email = user_data['email']
 
-        pending_users[email] = {
-            "data": user_data,
-            "code": code,
-            "expires_at": datetime.utcnow().timestamp() + 600  # 10 min expiry
-        }
+        try:
+            save_pending_signup(user_data, code)
+        except PendingSignupLimitError as e:
+            abort(429, message=str(e))
 
         send_verification_email(email, "Signup Verification", code)
 
@@ -56,26 +58,30 @@ class VerifySignUp(MethodView):
         email = data.get("email")
         code = data.get("verification_code")
 
-        pending = pending_users.get(email)
+        pending = get_pending_signup(email)
 
-        if not pending or str(pending["code"]) != str(code):
+        if not pending or str(pending.verification_code) != str(code):
             abort(400, message="Invalid or expired verification code.")
 
-        if datetime.utcnow().timestamp() > pending["expires_at"]:
-            del pending_users[email]
+        if is_pending_signup_expired(pending):
+            delete_pending_signup(pending)
             abort(400, message="Verification code expired.")
 
-        user_data = pending["data"]
         user = UserModel(
-            name=user_data["name"],
-            email=user_data["email"],
+            name=pending.name,
+            email=pending.email,
             role="user",
-            password=pbkdf2_sha256.hash(user_data['password'])
+            password=pending.password
         )
 
         db.session.add(user)
-        db.session.commit()
-        del pending_users[email]
+        db.session.delete(pending)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another worker verified the same signup first
+            db.session.rollback()
+            abort(409, message="A user with that email already exists.")
 
         return {"message": "User signed up successfully."}, 201
 
@@ -86,8 +92,14 @@ class UserLogin(MethodView):
     @blp.arguments(UserSchema)
     def post(self, user_data):
         user = UserModel.query.filter_by(email=user_data["email"]).first()
+        valid, new_hash = verify_and_update_password(user_data["password"], user.password if user else None)
+
+        if valid:
+            # Transparently move the stored hash to the current scheme and cost
+            if new_hash:
+                user.password = new_hash
+                db.session.commit()
 
-        if user and user.password and pbkdf2_sha256.verify(user_data["password"], user.password):
             access_token = create_access_token(identity=str(user.id), fresh=True)
             refresh_token = create_refresh_token(user.id)
             user_schema = UserSchema()
@@ -95,12 +107,12 @@ class UserLogin(MethodView):
 
             # Gather details fast (no blocking)
             now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
-            ip = request.headers.get('X-Forwarded-For', request.remote_addr)
-            location = get_location_from_ip(ip)
+            # client address, resolved from X-Forwarded-For by ProxyFix when TRUSTED_PROXY_COUNT is set
+            ip = request.remote_addr
             device = request.headers.get("User-Agent", "Unknown device")
 
-            # Launch background email sending (non-blocking)
-            send_login_alert_email_async(user.email, now, device, location)
+            # Launch background email sending (non-blocking), the location is looked up there
+            send_login_alert_email_async(user.email, now, device, ip)
 
             # Return immediately
             return {
@@ -167,8 +179,7 @@ class GoogleAuthorize(MethodView):
 class UserLogout(MethodView):
     @jwt_required()
     def post(self):
-        jti = get_jwt()['jti']
-        BLOCKLIST.add(jti)
+        add_to_blocklist(get_jwt())
         return {"message": "Successfully logged out."}
 
 
@@ -180,8 +191,7 @@ class TokenRefresh(MethodView):
         current_user = get_jwt_identity()
         new_token = create_access_token(identity=current_user, fresh=False)
         # Make it clear that when to add the refresh token to the blocklist will depend on the app design
-        jti = get_jwt()["jti"]
-        BLOCKLIST.add(jti)
+        add_to_blocklist(get_jwt())
         return {"access_token": new_token}, 200
 
 
@@ -192,23 +202,18 @@ class RequestPasswordChange(MethodView):
     @jwt_required()
     def post(self):
         data = request.get_json()
-        user_id = get_jwt_identity()
-        user = UserModel.query.get(user_id)
+        user = get_current_user_or_404()
 
-        if not user:
-            abort(404, message="User not found.")
-
-        if not pbkdf2_sha256.verify(data["current_password"], user.password):
+        if not verify_password(data["current_password"], user.password):
             abort(401, message="Current password is incorrect.")
 
         code = generate_verification_code()
         user.verification_code = code
         user.code_sent_at = datetime.now(timezone.utc)
-        user.temp_new_password = pbkdf2_sha256.hash(data["new_password"])
+        user.temp_new_password = hash_password(data["new_password"])
 
-        email_sent = send_verification_email(user.email, password_subject, code)
-        if not email_sent:
-            abort(500, message="Failed to send verification email.")
+        if not send_verification_email(user.email, password_subject, code):
+            abort(503, message="Could not queue the verification email, please try again later.")
 
         db.session.commit()
 
@@ -220,8 +225,7 @@ class VerifyPasswordChange(MethodView):
     @jwt_required()
     def post(self):
         data = request.get_json()
-        user_id = get_jwt_identity()
-        user = UserModel.query.get(user_id)
+        user = get_current_user_or_404()
 
         if not is_code_valid(user, data["verification_code"]):
             abort(400, message="Invalid or expired code.")
@@ -231,6 +235,7 @@ class VerifyPasswordChange(MethodView):
         user.temp_new_password = None
         user.code_sent_at = None
         db.session.commit()
+        profile_cache.invalidate(user.id)
 
         return {"message": "Password changed successfully."}, 200
 
@@ -253,7 +258,7 @@ class RequestResetPassword(MethodView):
         user.code_sent_at = datetime.now(timezone.utc)
 
         if not send_verification_email(user.email, password_subject, code):
-            abort(500, message="Failed to send verification email.")
+            abort(503, message="Could not queue the verification email, please try again later.")
 
         db.session.commit()
 
@@ -284,11 +289,12 @@ class ResetPassword(MethodView):
         if not user or not user.code_verified:
             abort(400, message="Verification required before password reset.")
 
-        user.password = pbkdf2_sha256.hash(data["new_password"])
+        user.password = hash_password(data["new_password"])
         user.verification_code = None
         user.code_sent_at = None
         user.code_verified = False
         db.session.commit()
+        profile_cache.invalidate(user.id)
 
         return {"message": "Password has been reset successfully."}, 200
 
@@ -300,8 +306,7 @@ class RequestEmailChange(MethodView):
     def post(self):
         data = request.get_json()
         new_email = data.get("new_email")
-        user_id = get_jwt_identity()
-        user = UserModel.query.get(user_id)
+        user = get_current_user_or_404()
 
         if not new_email:
             abort(400, message="New email is required.")
@@ -315,7 +320,7 @@ class RequestEmailChange(MethodView):
         user.email_code_sent_at = datetime.now(timezone.utc)
 
         if not send_verification_email(new_email, email_subject, code):
-            abort(500, message="Failed to send verification email.")
+            abort(503, message="Could not queue the verification email, please try again later.")
 
         db.session.commit()
         return {"message": "Verification code sent to new email."}, 200
@@ -328,8 +333,7 @@ class ConfirmEmailChange(MethodView):
     def post(self):
         data = request.get_json()
         code = data.get("verification_code")
-        user_id = get_jwt_identity()
-        user = UserModel.query.get(user_id)
+        user = get_current_user_or_404()
 
         if not code:
             abort(400, message="Verification code is required.")
@@ -343,4 +347,5 @@ class ConfirmEmailChange(MethodView):
         user.email_code_sent_at = None
 
         db.session.commit()
+        profile_cache.invalidate(user.id)
         return {"message": "Email updated successfully."}, 200
@@ -0,0 +1,43 @@
+from flask import Response
+from flask.views import MethodView
+from flask_smorest import Blueprint
+
+from db import db, get_pool_stats
+from utils.email_utils import get_mail_queue_stats
+from utils.internal_access import require_internal_access
+from utils.metrics import render_metrics
+from utils.remove_bg import get_background_removal_stats
+
+blp = Blueprint("internal", __name__, description="Internal operational endpoints")
+
+
+@blp.route("/internal/db-stats")
+class DatabaseStats(MethodView):
+    def get(self):
+        require_internal_access()
+        return {
+            "dialect": db.engine.dialect.name,
+            **get_pool_stats(db.engine),
+        }
+
+
+@blp.route("/internal/mail-stats")
+class MailQueueStats(MethodView):
+    def get(self):
+        require_internal_access()
+        return get_mail_queue_stats()
+
+
+@blp.route("/internal/background-removal-stats")
+class BackgroundRemovalStats(MethodView):
+    def get(self):
+        require_internal_access()
+        return get_background_removal_stats()
+
+
+@blp.route("/metrics")
+class Metrics(MethodView):
+    def get(self):
+        require_internal_access()
+        body, content_type = render_metrics()
+        return Response(body, content_type=content_type)
@@ -2,59 +2,65 @@ from flask.views import MethodView
 from flask_smorest import Blueprint, abort
 from db import db
 from models import WardrobeItemsModel, OutfitsModel, UserModel
-from schemas import OutfitSchema
-from sqlalchemy.exc import SQLAlchemyError
+from schemas import (
+    OutfitSchema, ListQueryArgsSchema, OutfitsQueryArgsSchema, RecommendQueryArgsSchema,
+    GenerateOutfitsArgsSchema, GenerateOutfitsSummarySchema
+)
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from sqlalchemy.orm import joinedload
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
-from utils.outfits_recommendation import get_closest_item_by_hue
+from utils.collection_version import bump_collection_version, check_collection_etag
+from utils.outfit_candidates import ensure_user_index, get_candidates
+from utils.outfit_generation import generate_outfits
+from utils.outfit_scoring import ITEM_TYPES, WardrobeArrays, top_outfits
+from utils.pagination import paginate_by_id, list_response
 
 blp = Blueprint("outfits", __name__, description="Operations on recommended outfits")
 
+
+# Outfits query that loads kira, tego and wonju in the same statement instead of one lazy load each
+def outfits_with_items():
+    return OutfitsModel.query.options(
+        joinedload(OutfitsModel.kira, innerjoin=True),
+        joinedload(OutfitsModel.tego, innerjoin=True),
+        joinedload(OutfitsModel.wonju, innerjoin=True)
+    )
+
+
 @blp.route("/wardrobe-items/<int:item_id>/recommend")
 class RecommendOutfit(MethodView):
 
     # recommend outfits
     @jwt_required()
+    @blp.arguments(RecommendQueryArgsSchema, location="query")
     @blp.response(201, OutfitSchema)
-    def post(self, item_id):
+    def post(self, args, item_id):
         user_id = get_jwt_identity()
         item = WardrobeItemsModel.query.filter_by(id=item_id, user_id=user_id).first()
         if not item:
             abort(404, message="Item not found.")
-        all_items = WardrobeItemsModel.query.filter_by(user_id=user_id).all()
-
-        kira = tego = wonju = None
-
-        if item.type == "kira":
-            kira = item
-            tego = get_closest_item_by_hue(item.color, [i for i in all_items if i.type == "tego"])
-            wonju = get_closest_item_by_hue(item.color, [i for i in all_items if i.type == "wonju"])
-        elif item.type == "tego":
-            tego = item
-            kira = get_closest_item_by_hue(item.color, [i for i in all_items if i.type == "kira"])
-            wonju = get_closest_item_by_hue(item.color, [i for i in all_items if i.type == "wonju"])
-        elif item.type == "wonju":
-            wonju = item
-            kira = get_closest_item_by_hue(item.color, [i for i in all_items if i.type == "kira"])
-            tego = get_closest_item_by_hue(item.color, [i for i in all_items if i.type == "tego"])
-        else:
+
+        if item.type not in ITEM_TYPES:
             abort(400, message="Invalid item type.")
 
-        if not (kira and tego and wonju):
-            abort(404, message="Not enough items to form an outfit.")
+        if ensure_user_index(user_id):
+            db.session.commit()
+        candidates = get_candidates(item)
 
-        # Check for existing outfit with same kira, tego, wonju
-        existing_outfit = OutfitsModel.query.filter_by(
-            user_id=user_id,
-            kira_id=kira.id,
-            tego_id=tego.id,
-            wonju_id=wonju.id
-        ).first()
+        items = {item.id: item}
+        for candidate_list in candidates.values():
+            items.update((candidate.id, candidate) for candidate in candidate_list)
+
+        # Score every outfit of the item and its candidates together, tego against wonju included
+        ranked = top_outfits(WardrobeArrays.from_items(list(items.values())), k=len(items) ** 2, anchor=item.id)
+        if not ranked:
+            abort(404, message="Not enough items to form an outfit.")
 
-        if existing_outfit:
-            return existing_outfit
+        # Cycle through the ranked outfits with ?suggestion=N
+        best = ranked[args["suggestion"] % len(ranked)]
+        kira, tego, wonju = items[best.kira_id], items[best.tego_id], items[best.wonju_id]
 
-        # No duplicate found, create a new one
         outfit = OutfitsModel(
             user_id=user_id,
             kira_id=kira.id,
@@ -65,13 +71,48 @@ class RecommendOutfit(MethodView):
 
         try:
             db.session.add(outfit)
+            bump_collection_version(user_id, "outfits")
             db.session.commit()
+        except IntegrityError:
+            # The unique (user_id, kira_id, tego_id, wonju_id) index rejected a duplicate
+            db.session.rollback()
+            return OutfitsModel.query.filter_by(
+                user_id=user_id,
+                kira_id=kira.id,
+                tego_id=tego.id,
+                wonju_id=wonju.id
+            ).first()
         except SQLAlchemyError as e:
             abort(500, message=str(e))
 
         return outfit
 
 
+# recommend outfits for every item of the wardrobe at once
+@blp.route("/user/outfits/generate")
+class GenerateOutfits(MethodView):
+    @jwt_required()
+    @blp.arguments(GenerateOutfitsArgsSchema, location="query")
+    @blp.response(200, GenerateOutfitsSummarySchema)
+    def post(self, args):
+        user_id = get_jwt_identity()
+
+        try:
+            summary = generate_outfits(user_id, args.get("type"), args["per_item"])
+            if summary["created"]:
+                bump_collection_version(user_id, "outfits")
+            db.session.commit()
+        except IntegrityError:
+            # Only on databases without ON CONFLICT, when another request added one of the outfits first
+            db.session.rollback()
+            abort(409, message="Outfits changed while generating, try again.")
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            abort(500, message=str(e))
+
+        return summary
+
+
 # favorite / un-favorite
 @blp.route("/outfits/<int:outfit_id>/favorite-unfavorite")
 class FavoriteOutfit(MethodView):
@@ -85,6 +126,7 @@ class FavoriteOutfit(MethodView):
         # Set this outfit as favorite
         outfit.favorite = not outfit.favorite
         try:
+            bump_collection_version(user_id, "outfits")
             db.session.commit()
         except SQLAlchemyError as e:
             abort(500, message=str(e))
@@ -100,20 +142,34 @@ class FavoriteOutfit(MethodView):
 @blp.route("/user/outfits")
 class AllUserOutfit(MethodView):
     @jwt_required()
+    @blp.arguments(OutfitsQueryArgsSchema, location="query")
     @blp.response(200, OutfitSchema(many=True))
-    def get(self):
+    def get(self, args):
         user_id = get_jwt_identity()
-        return OutfitsModel.query.filter_by(user_id=user_id).all()
+        check_collection_etag(user_id, "wardrobe", "outfits")
+
+        query = outfits_with_items().filter_by(user_id=user_id)
+        if "favorite" in args:
+            query = query.filter_by(favorite=args["favorite"])
+
+        outfits, next_cursor = paginate_by_id(query, OutfitsModel.id, args.get("cursor"), args.get("limit"))
+        return list_response(outfits, OutfitSchema, next_cursor, args.get("only"))
 
 
 # get all outfits by user id
 @blp.route("/user/favorites")
 class AllFavoriteOutfit(MethodView):
     @jwt_required()
+    @blp.arguments(ListQueryArgsSchema, location="query")
     @blp.response(200, OutfitSchema(many=True))
-    def get(self):
+    def get(self, args):
         user_id = get_jwt_identity()
-        return OutfitsModel.query.filter_by(user_id=user_id, favorite=True).all()
+        check_collection_etag(user_id, "wardrobe", "outfits")
+
+        query = outfits_with_items().filter_by(user_id=user_id, favorite=True)
+
+        outfits, next_cursor = paginate_by_id(query, OutfitsModel.id, args.get("cursor"), args.get("limit"))
+        return list_response(outfits, OutfitSchema, next_cursor, args.get("only"))
 
 # delete outfit by id
 @blp.route("/outfit/<int:outfit_id>/delete")
@@ -123,6 +179,7 @@ class Outfit(MethodView):
         outfit = OutfitsModel.query.get_or_404(outfit_id)
 
         db.session.delete(outfit)
+        bump_collection_version(outfit.user_id, "outfits")
         db.session.commit()
 
         return {"message": "Outfit deleted."}
@@ -134,7 +191,7 @@ class GetOutfit(MethodView):
     @jwt_required()
     @blp.response(200, OutfitSchema())
     def get(self, outfit_id):
-        outfit = OutfitsModel.query.get_or_404(outfit_id)
+        outfit = outfits_with_items().filter_by(id=outfit_id).first_or_404()
         return outfit
 
 
@@ -146,7 +203,7 @@ class GetLatestRecommendation(MethodView):
     @blp.response(200, OutfitSchema)
     def get(self):
         user_id = get_jwt_identity()
-        outfit = OutfitsModel.query.filter_by(user_id=user_id).order_by(OutfitsModel.id.desc()).first()
+        outfit = outfits_with_items().filter_by(user_id=user_id).order_by(OutfitsModel.id.desc()).first()
         if not outfit:
             abort(404, message="No recommendation found.")
 
@@ -173,7 +230,12 @@ class EditOutfit(MethodView):
         if "wonju_id" in outfit_data:
             outfit.wonju_id = outfit_data["wonju_id"]
 
-        db.session.commit()
+        try:
+            bump_collection_version(outfit.user_id, "outfits")
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            abort(400, message="Outfit already exists.")
         return outfit
 
 
@@ -189,17 +251,6 @@ class CreateOutfit(MethodView):
         tego_id = outfit_data["tego_id"]
         wonju_id = outfit_data["wonju_id"]
 
-        # Check for existing outfit with same kira, tego, wonju for this user
-        existing_outfit = OutfitsModel.query.filter_by(
-            user_id=user_id,
-            kira_id=kira_id,
-            tego_id=tego_id,
-            wonju_id=wonju_id
-        ).first()
-
-        if existing_outfit:
-            abort(400, message="Outfit already exists.")
-
         new_outfit = OutfitsModel(
             user_id=user_id,
             kira_id=kira_id,
@@ -207,7 +258,20 @@ class CreateOutfit(MethodView):
             wonju_id=wonju_id
         )
 
-        db.session.add(new_outfit)
-        db.session.commit()
+        try:
+            db.session.add(new_outfit)
+            bump_collection_version(user_id, "outfits")
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            existing_outfit = OutfitsModel.query.filter_by(
+                user_id=user_id,
+                kira_id=kira_id,
+                tego_id=tego_id,
+                wonju_id=wonju_id
+            ).first()
+            if existing_outfit:
+                abort(400, message="Outfit already exists.")
+            abort(400, message=str(e.orig))
 
         return new_outfit
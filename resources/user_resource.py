@@ -4,8 +4,10 @@ from flask_smorest import Blueprint, abort
 from db import db
 from schemas import UserSchema, UserUpdateSchema
 from models import UserModel
-from utils.cloudinary_upload import upload_image_to_cloudinary
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from utils.current_user import current_user_id, get_current_user, get_current_user_or_404, profile_cache
+from utils.object_storage import upload_image
+from utils.password_service import hash_password
+from flask_jwt_extended import jwt_required
 
 
 blp = Blueprint("users", __name__, description="Operations on users")
@@ -15,25 +17,28 @@ class User(MethodView):
     @jwt_required()
     @blp.response(200, UserSchema)
     def get(self):
-        user_id = get_jwt_identity()
-        user = UserModel.query.get_or_404(user_id)
-        return user
+        user_id = current_user_id()
+        profile = profile_cache.get(user_id)
+        if profile is None:
+            profile = UserSchema().dump(get_current_user_or_404())
+            profile_cache.put(user_id, profile)
+        return profile
 
     @jwt_required()
     def delete(self):
-        user_id = get_jwt_identity()
-        user = UserModel.query.get_or_404(user_id)
+        user = get_current_user_or_404()
 
         db.session.delete(user)
         db.session.commit()
+        profile_cache.invalidate(user.id)
 
         return {"message": "User deleted."}, 200
 
     # Upload/update profile picture
     @jwt_required()
     def patch(self):
-        user_id = get_jwt_identity()
-        user = UserModel.query.get_or_404(user_id)
+        user_id = current_user_id()
+        user = get_current_user_or_404()
 
         if 'profile_picture' not in request.files:
             return {"message": "No image file provided."}, 400
@@ -41,9 +46,10 @@ class User(MethodView):
         image_file = request.files['profile_picture']
 
         try:
-            image_url = upload_image_to_cloudinary(image_file, user_id, subfolder="profile", is_unique=False)
+            image_url = upload_image(image_file, user_id, subfolder="profile", is_unique=False).url
             user.profile_picture = image_url
             db.session.commit()
+            profile_cache.invalidate(user_id)
             return {"message": "Profile picture updated.", "image_url": image_url}, 200
         except Exception as e:
             return {"message": str(e)}, 500
@@ -53,19 +59,22 @@ class User(MethodView):
     @blp.arguments(UserUpdateSchema)
     @blp.response(200, UserSchema)
     def put(self, user_data):
-        user_id = get_jwt_identity()
-        user = UserModel.query.get(user_id)
+        user_id = current_user_id()
+        user = get_current_user()
 
         if user:
             if "name" in user_data:
                 user.name = user_data["name"]
             if "password" in user_data:
-                user.password = user_data["password"]
+                user.password = hash_password(user_data["password"])
         else:
+            if "password" in user_data:
+                user_data["password"] = hash_password(user_data["password"])
             user = UserModel(id=user_id, **user_data)
 
         db.session.add(user)
         db.session.commit()
+        profile_cache.invalidate(user_id)
 
         return user
 
@@ -1,36 +1,46 @@
 
+import os
 import traceback
-import io
 from flask.views import MethodView
 from flask_smorest import Blueprint, abort
-from flask import request
+from flask import request, current_app, jsonify, url_for
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import UserModel, WardrobeItemsModel
-from schemas import WardrobeItemsSchema
-from utils.cloudinary_upload import upload_image_to_cloudinary
-from utils.color_extractor import get_dominant_color
-from cloudinary.uploader import destroy
-import re
+from models import WardrobeItemsModel, IngestionJobModel
+from schemas import WardrobeItemsSchema, IngestionJobSchema, BatchUploadResultSchema, WardrobeItemsQueryArgsSchema
 from db import db
-from utils.image_hash import calculate_image_hash
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
-import requests
 
-from utils.remove_bg import remove_background
+from utils.collection_version import bump_collection_version, check_collection_etag
+from utils.batch_ingestion import process_batch, BATCH_MAX_FILES
+from utils.image_io import MAX_IMAGE_BYTES, upload_size
+from utils.ingestion_jobs import submit_ingestion_job
+from utils.metrics import stage_timer
+from utils.object_storage import schedule_delete
+from utils.outfit_candidates import index_item, unindex_item
+from utils.pagination import paginate_by_id, list_response
+from utils.wardrobe_pipeline import run_pipeline, PipelineError
 
 blp = Blueprint("user_wardrobe", __name__, description="Wardrobe endpoints")
 
 @blp.route("/user/wardrobe-items")
 class UserWardrobeItems(MethodView):
     @jwt_required()
+    @blp.arguments(WardrobeItemsQueryArgsSchema, location="query")
     @blp.response(200, WardrobeItemsSchema(many=True))
-    def get(self):
+    def get(self, args):
         user_id = get_jwt_identity()
-        user = UserModel.query.get_or_404(user_id)
-        return user.wardrobe_items.all()
+        check_collection_etag(user_id, "wardrobe")
+
+        query = WardrobeItemsModel.query.filter_by(user_id=user_id)
+        if "type" in args:
+            query = query.filter_by(type=args["type"])
+
+        items, next_cursor = paginate_by_id(query, WardrobeItemsModel.id, args.get("cursor"), args.get("limit"))
+        return list_response(items, WardrobeItemsSchema, next_cursor, args.get("only"))
 
     @jwt_required()
     @blp.response(201, WardrobeItemsSchema)
+    @blp.alt_response(202, schema=IngestionJobSchema)
     def post(self):
         user_id = get_jwt_identity()
         name = request.form.get("name")
@@ -38,68 +48,38 @@ class UserWardrobeItems(MethodView):
 
         if not name or not image_file:
             abort(400, message="Both 'name' and 'image' are required.")
+        if upload_size(image_file) > MAX_IMAGE_BYTES:
+            abort(413, message=f"Images can be at most {MAX_IMAGE_BYTES} bytes.")
 
+        mode = request.args.get("mode") or request.form.get("mode") or current_app.config["WARDROBE_INGESTION_MODE"]
+        if mode == "async":
+            job = submit_ingestion_job(user_id, name, image_file)
+            response = jsonify(IngestionJobSchema().dump(job))
+            response.headers["Location"] = url_for("user_wardrobe.WardrobeIngestionJob", job_id=job.id)
+            return response, 202
+
+        fields = None
         try:
-            # Step 1: Check for duplicate image using hash
-            image_hash = calculate_image_hash(image_file)
-
-            duplicate_item = WardrobeItemsModel.query.filter_by(
-                user_id=user_id,
-                image_hash=image_hash
-            ).first()
-            if duplicate_item:
-                abort(400, message="This image has already been uploaded.")
-
-            # Step 2: Remove background
-            img_no_bg = remove_background(image_file)  # Returns PIL.Image
-
-        # Step 3: Convert image to RGB and prepare for prediction
-            img_for_model = img_no_bg.convert("RGB")
-            img_byte_arr = io.BytesIO()
-            img_for_model.save(img_byte_arr, format="JPEG")
-            img_byte_arr.seek(0)
-
-            files = {"file": ("attire.jpg", img_byte_arr, "image/jpeg")}
-            prediction_response = requests.post("https://model.gyencha.purnabdrrana.com/predict", files=files)
-
-            if prediction_response.status_code != 200:
-                abort(500, message=f"Prediction service error: {prediction_response.text}")
-
-            attire_type = prediction_response.json().get("prediction")
-            if not attire_type:
-                abort(500, message="Invalid response from prediction service.")
-
-            # Step 4: Extract dominant color
-            color_hex = get_dominant_color(img_no_bg)
-
-            # Step 5: Upload image to cloud
-            temp_stream = io.BytesIO()
-            img_no_bg.save(temp_stream, format="PNG")
-            temp_stream.seek(0)
-
-            image_url = upload_image_to_cloudinary(
-                temp_stream,
-                user_id,
-                subfolder="attire",
-                is_unique=True
-            )
-
-            # Step 6: Save to DB
-            wardrobe_item = WardrobeItemsModel(
-                name=name,
-                type=attire_type,
-                color=color_hex,
-                image_url=image_url,
-                user_id=user_id,
-                image_hash=image_hash
-            )
+            fields = run_pipeline(image_file, user_id)
+
+            # Save to DB
+            wardrobe_item = WardrobeItemsModel(name=name, user_id=user_id, **fields)
 
             db.session.add(wardrobe_item)
-            db.session.commit()
+            db.session.flush()
+            index_item(wardrobe_item)
+            bump_collection_version(user_id, "wardrobe")
+            with stage_timer("commit"):
+                db.session.commit()
             return wardrobe_item
 
+        except PipelineError as e:
+            abort(e.status_code, message=str(e))
+
         except SQLAlchemyError as e:
             traceback.print_exc()
+            if fields:
+                schedule_delete(fields["public_id"])
             abort(500, message=f"Database error: {str(e)}")
 
         except ValueError as e:
@@ -111,6 +91,75 @@ class UserWardrobeItems(MethodView):
             abort(500, message=f"Internal Server Error:\n{traceback.format_exc()}")
 
 
+# upload many images at once
+@blp.route("/user/wardrobe-items/batch")
+class UserWardrobeItemsBatch(MethodView):
+    @jwt_required()
+    @blp.response(200, BatchUploadResultSchema(many=True))
+    def post(self):
+        user_id = get_jwt_identity()
+        image_files = request.files.getlist("images")
+        names = request.form.getlist("names")
+
+        if not image_files:
+            abort(400, message="At least one file in 'images' is required.")
+        if len(image_files) > BATCH_MAX_FILES:
+            abort(400, message=f"A batch can contain at most {BATCH_MAX_FILES} images.")
+
+        # The files stay in the request's streams, which Werkzeug spools to disk past 500 KB, instead of
+        # all being read into memory at once
+        uploads = []
+        for index, image_file in enumerate(image_files):
+            filename = image_file.filename or f"image_{index + 1}"
+            if upload_size(image_file) > MAX_IMAGE_BYTES:
+                abort(413, message=f"{filename} is larger than {MAX_IMAGE_BYTES} bytes.")
+            uploads.append({
+                "filename": filename,
+                "name": names[index] if index < len(names) and names[index] else os.path.splitext(filename)[0],
+                "file": image_file,
+            })
+
+        results = process_batch(user_id, uploads)
+
+        # Save every processed item in one transaction
+        created = [result for result in results if result["status"] == "created"]
+        for result in created:
+            result["item"] = WardrobeItemsModel(name=result["name"], user_id=user_id, **result.pop("fields"))
+
+        try:
+            for result in created:
+                # One at a time, so each item is indexed against the ones before it
+                db.session.add(result["item"])
+                db.session.flush()
+                index_item(result["item"])
+            if created:
+                bump_collection_version(user_id, "wardrobe")
+            with stage_timer("commit"):
+                db.session.commit()
+        except SQLAlchemyError as e:
+            traceback.print_exc()
+            db.session.rollback()
+            for result in created:
+                result["status"] = "failed"
+                result["message"] = f"Database error: {str(e)}"
+                schedule_delete(result.pop("item").public_id)
+
+        return results
+
+
+# status of an asynchronous upload
+@blp.route("/wardrobe-items/jobs/<string:job_id>")
+class WardrobeIngestionJob(MethodView):
+    @jwt_required()
+    @blp.response(200, IngestionJobSchema)
+    def get(self, job_id):
+        user_id = get_jwt_identity()
+        job = IngestionJobModel.query.filter_by(id=job_id, user_id=user_id).first()
+        if not job:
+            abort(404, message="Upload job not found.")
+        return job
+
+
 # upload
 @blp.route("/wardrobe-items/<int:item_id>")
 class WardrobeItem(MethodView):
@@ -132,6 +181,7 @@ class WardrobeItem(MethodView):
 
         item.name = new_name
         try:
+            bump_collection_version(item.user_id, "wardrobe")
             db.session.commit()
             return item
         except SQLAlchemyError as e:
@@ -140,24 +190,21 @@ class WardrobeItem(MethodView):
     @jwt_required()
     def delete(self, item_id):
         item = WardrobeItemsModel.query.get_or_404(item_id)
-
-        # Extract public_id from image_url
-        try:
-            match = re.search(r"upload\/(?:v\d+\/)?(.+?)\.(jpg|png|jpeg|webp)", item.image_url)
-            if match:
-                public_id = match.group(1)
-                destroy(public_id)
-        except Exception as e:
-            print(f"Warning: Failed to delete Cloudinary image: {str(e)}")
+        public_id = item.public_id
 
         try:
+            unindex_item(item)
             db.session.delete(item)
+            bump_collection_version(item.user_id, "wardrobe", "outfits")
             db.session.commit()
-            return {"message": "Item deleted successfully."}
         except IntegrityError as e:
             db.session.rollback()
             abort(400,
                   message=f"Oops! You can’t delete this item yet — it's still part of an outfit using this {item.type}. Please remove that outfit first to proceed.")
         except SQLAlchemyError as e:
             db.session.rollback()
-            abort(500, message="An unexpected database error occurred: " + str(e))
\ No newline at end of file
+            abort(500, message="An unexpected database error occurred: " + str(e))
+
+        # Only once the item is gone, the image is removed in the next delete batch
+        schedule_delete(public_id)
+        return {"message": "Item deleted successfully."}
@@ -1,4 +1,4 @@
-from marshmallow import Schema, fields
+from marshmallow import Schema, fields, validate
 
 class UserSchema(Schema):
     id = fields.Int(dump_only=True)
@@ -26,6 +26,26 @@ class WardrobeItemsSchema(PlainWardrobeItemsSchema):
     user = fields.Nested(UserSchema(), dump_only=True, load_only=True)
 
 
+class IngestionJobSchema(Schema):
+    id = fields.Str(dump_only=True)
+    name = fields.Str(dump_only=True)
+    status = fields.Str(dump_only=True)
+    stage = fields.Str(dump_only=True)
+    stages = fields.Dict(keys=fields.Str(), values=fields.Dict(), dump_only=True)
+    error = fields.Str(dump_only=True)
+    created_at = fields.DateTime(dump_only=True)
+    updated_at = fields.DateTime(dump_only=True)
+    wardrobe_item = fields.Nested(WardrobeItemsSchema, dump_only=True)
+
+
+class BatchUploadResultSchema(Schema):
+    filename = fields.Str(dump_only=True)
+    name = fields.Str(dump_only=True)
+    status = fields.Str(dump_only=True)
+    message = fields.Str(dump_only=True)
+    item = fields.Nested(WardrobeItemsSchema, dump_only=True)
+
+
 class PlainOutfitSchema(Schema):
     id = fields.Int(dump_only=True)
     favorite = fields.Bool(required=True)
@@ -40,3 +60,36 @@ class OutfitSchema(PlainOutfitSchema):
     kira = fields.Nested(WardrobeItemsSchema, dump_only=True)
     tego = fields.Nested(WardrobeItemsSchema, dump_only=True)
     wonju = fields.Nested(WardrobeItemsSchema, dump_only=True)
+
+
+class ListQueryArgsSchema(Schema):
+    cursor = fields.Str()
+    limit = fields.Int(validate=validate.Range(min=1, max=200))
+    # comma separated field names, e.g. "id,name"
+    only = fields.Str(data_key="fields")
+
+
+class WardrobeItemsQueryArgsSchema(ListQueryArgsSchema):
+    type = fields.Str(validate=validate.OneOf(["kira", "tego", "wonju"]))
+
+
+class OutfitsQueryArgsSchema(ListQueryArgsSchema):
+    favorite = fields.Bool()
+
+
+class RecommendQueryArgsSchema(Schema):
+    # 0 is the best match, 1 the next one and so on; wraps around
+    suggestion = fields.Int(load_default=0, validate=validate.Range(min=0))
+
+
+class GenerateOutfitsArgsSchema(Schema):
+    # only generate outfits for items of this type
+    type = fields.Str(validate=validate.OneOf(["kira", "tego", "wonju"]))
+    per_item = fields.Int(load_default=1, validate=validate.Range(min=1, max=25))
+
+
+class GenerateOutfitsSummarySchema(Schema):
+    items = fields.Int(dump_only=True)
+    generated = fields.Int(dump_only=True)
+    created = fields.Int(dump_only=True)
+    existing = fields.Int(dump_only=True)
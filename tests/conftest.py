@@ -0,0 +1,81 @@
+import io
+import os
+import tempfile
+
+# Settings read at import time, before the app modules are imported
+os.environ.setdefault("JWT_SECRET_KEY", "test-jwt-secret-key-of-at-least-32-bytes")
+os.environ.setdefault("APP_SECRET_KEY", "test-app-secret")
+os.environ.setdefault("STORAGE_BACKEND", "local")
+os.environ.setdefault("STORAGE_LOCAL_DIR", tempfile.mkdtemp(prefix="gyencha-test-media-"))
+os.environ.setdefault("IMAGE_CACHE_DIR", "")
+
+import pytest
+from flask_jwt_extended import create_access_token
+from PIL import Image
+
+from app import create_app
+from db import db
+from models import OutfitsModel, UserModel, WardrobeItemsModel
+from utils import wardrobe_pipeline
+from utils.outfits_recommendation import hsl_columns
+
+
+@pytest.fixture
+def app():
+    app = create_app("sqlite://")
+    app.config["TESTING"] = True
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def stages():
+    """Local stand-ins for background removal and attire prediction."""
+    original = dict(wardrobe_pipeline.stages)
+    wardrobe_pipeline.set_stage("remove_bg", lambda image_file: Image.open(image_file).convert("RGBA"))
+    wardrobe_pipeline.set_stage("predict", lambda img_no_bg: "kira")
+    yield wardrobe_pipeline
+    wardrobe_pipeline.stages.update(original)
+
+
+def make_user(app, email="user@example.com"):
+    """Returns (user id, Authorization headers)."""
+    with app.app_context():
+        user = UserModel(name="user", email=email, role="user", password="x")
+        db.session.add(user)
+        db.session.commit()
+        token = create_access_token(identity=str(user.id), fresh=True)
+        return user.id, {"Authorization": f"Bearer {token}"}
+
+
+def add_item(app, user_id, item_type, color, name="item"):
+    with app.app_context():
+        item = WardrobeItemsModel(
+            name=name, type=item_type, color=color, image_hash=f"{item_type}{color}", user_id=user_id,
+            **hsl_columns(color)
+        )
+        db.session.add(item)
+        db.session.commit()
+        return item.id
+
+
+def add_outfit(app, user_id, kira_id, tego_id, wonju_id, favorite=False):
+    with app.app_context():
+        outfit = OutfitsModel(user_id=user_id, kira_id=kira_id, tego_id=tego_id, wonju_id=wonju_id, favorite=favorite)
+        db.session.add(outfit)
+        db.session.commit()
+        return outfit.id
+
+
+def png(color, size=32):
+    image_file = io.BytesIO()
+    Image.new("RGB", (size, size), color).save(image_file, "PNG")
+    image_file.seek(0)
+    return image_file
@@ -0,0 +1,82 @@
+"""The attire classifiers, with small ONNX models built in the test."""
+import os
+
+import onnx
+import pytest
+from onnx import TensorProto, helper
+from PIL import Image
+
+from utils.attire_classifier import OnnxClassifier, RemoteClassifier
+from utils.prediction_client import PredictionClient, PredictionError
+
+
+def test_identity_changes_with_the_model(tmp_path):
+    model_path = tmp_path / "attire.onnx"
+    model_path.write_bytes(b"model v1")
+    classifier = OnnxClassifier(str(model_path), ["kira", "tego", "wonju"])
+    before = classifier.identity
+
+    # Retrained model replacing the file at the same path
+    model_path.write_bytes(b"model v2, retrained")
+    os.utime(model_path, ns=(0, 0))
+
+    assert classifier.identity != before
+    assert OnnxClassifier(str(model_path), ["kira", "tego"]).identity != classifier.identity
+    assert (RemoteClassifier(PredictionClient("http://a/predict")).identity
+            != RemoteClassifier(PredictionClient("http://b/predict")).identity)
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    """Scores each label by the mean of one color channel: red, green, blue."""
+    graph = helper.make_graph(
+        [helper.make_node("ReduceMean", ["pixels"], ["scores"], axes=[2, 3], keepdims=0)],
+        "channel-means",
+        [helper.make_tensor_value_info("pixels", TensorProto.FLOAT, ["N", 3, 8, 8])],
+        [helper.make_tensor_value_info("scores", TensorProto.FLOAT, ["N", 3])],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)], ir_version=8)
+    path = tmp_path / "attire.onnx"
+    onnx.save(model, str(path))
+    return str(path)
+
+
+def make_classifier(model_path, input_size=8):
+    return OnnxClassifier(model_path, ["kira", "tego", "wonju"], input_size=input_size, mean=(0, 0, 0),
+                          std=(1, 1, 1), batch_size=8, batch_wait_ms=200)
+
+
+def test_classifies_a_batch(model_path):
+    images = [Image.new("RGB", (16, 16), color) for color in ("#ff0000", "#00ff00", "#0000ff")]
+
+    assert make_classifier(model_path).classify_batch(images) == ["kira", "tego", "wonju"]
+
+
+def test_model_errors_are_prediction_errors(model_path):
+    # The model only takes 8x8 images
+    classifier = make_classifier(model_path, input_size=16)
+
+    with pytest.raises(PredictionError):
+        classifier.classify(Image.new("RGB", (16, 16), "#ff0000"))
+
+
+def test_bad_input_fails_only_itself(model_path):
+    classifier = make_classifier(model_path)
+    run = classifier.run
+    batches = []
+
+    def run_rejecting_blank_images(inputs):
+        batches.append(len(inputs))
+        if any(pixels.max() == pixels.min() for pixels in inputs):
+            raise PredictionError("Blank image.")
+        return run(inputs)
+
+    classifier.run = run_rejecting_blank_images
+    futures = [classifier.submit(Image.new("RGB", (16, 16), color)) for color in ("#ff0000", "#000000", "#0000ff")]
+
+    assert futures[0].result() == "kira"
+    with pytest.raises(PredictionError):
+        futures[1].result()
+    assert futures[2].result() == "wonju"
+    # Batched together, then again one at a time
+    assert batches == [3, 1, 1, 1]
@@ -0,0 +1,55 @@
+"""Batch uploads run their stages in the web worker, with the stage hooks and metrics."""
+import threading
+
+from PIL import Image
+from prometheus_client import REGISTRY
+
+from conftest import make_user, png
+
+
+def stage_count(stage):
+    return REGISTRY.get_sample_value("wardrobe_pipeline_stage_seconds_count", {"stage": stage}) or 0
+
+
+def test_batch_uses_the_stage_hooks_in_process(app, client, stages):
+    _, headers = make_user(app)
+    threads = []
+
+    def remove_bg(image_file):
+        threads.append(threading.current_thread().name)
+        return Image.open(image_file).convert("RGBA")
+
+    stages.set_stage("remove_bg", remove_bg)
+    before = stage_count("remove_bg")
+
+    response = client.post(
+        "/user/wardrobe-items/batch", headers=headers,
+        data={"images": [(png("#123456"), "a.png"), (png("#654321"), "b.png"), (png("#abcdef"), "c.png")]}
+    )
+
+    assert response.status_code == 200
+    assert [result["status"] for result in response.get_json()] == ["created"] * 3
+    assert len(threads) == 3 and all(name.startswith("wardrobe-batch-cpu") for name in threads)
+    assert stage_count("remove_bg") == before + 3
+
+
+def test_failed_image_fails_only_itself(app, client, stages):
+    _, headers = make_user(app)
+
+    def remove_bg(image_file):
+        image = Image.open(image_file).convert("RGBA")
+        if image.getpixel((0, 0))[:3] == (255, 0, 0):
+            raise ValueError("Could not remove the background.")
+        return image
+
+    stages.set_stage("remove_bg", remove_bg)
+
+    response = client.post(
+        "/user/wardrobe-items/batch", headers=headers,
+        data={"images": [(png("#ff0000"), "red.png"), (png("#00ff00"), "green.png")]}
+    )
+
+    assert response.status_code == 200
+    results = response.get_json()
+    assert [result["status"] for result in results] == ["failed", "created"]
+    assert results[0]["message"] == "Could not remove the background."
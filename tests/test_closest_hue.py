@@ -0,0 +1,115 @@
+"""Nearest hue lookups, used for recommendations when the outfit candidate index is disabled."""
+import random
+
+import pytest
+from sqlalchemy import event
+
+from conftest import add_item, make_user
+from db import db
+from models import WardrobeItemsModel
+from utils import outfit_candidates, outfit_generation
+from utils.outfits_recommendation import get_closest_item_by_hue, hue_difference
+
+
+def closest_by_scan(base_hue, user_id, item_type):
+    items = WardrobeItemsModel.query.filter_by(user_id=user_id, type=item_type).order_by(WardrobeItemsModel.id)
+    return min(items, key=lambda item: hue_difference(base_hue, item.hue), default=None)
+
+
+@pytest.fixture
+def index_disabled(monkeypatch):
+    monkeypatch.setattr(outfit_candidates, "OUTFIT_CANDIDATES_PER_TYPE", 0)
+    monkeypatch.setattr(outfit_generation, "OUTFIT_CANDIDATES_PER_TYPE", 0)
+
+
+def test_matches_a_full_scan(app):
+    user_id, _ = make_user(app)
+    rng = random.Random(5)
+    # A few colors more than once, so equally near items are tied
+    colors = [f"#{rng.randrange(256):02x}{rng.randrange(256):02x}{rng.randrange(256):02x}" for _ in range(30)]
+    for color in colors + colors[:5] + ["#ff0000", "#ff0008", "#ff0800"]:
+        add_item(app, user_id, "tego", color)
+
+    with app.app_context():
+        for base_hue in [0.0, 0.5, 90.0, 180.0, 270.0, 359.5] + [rng.uniform(0, 360) for _ in range(50)]:
+            assert get_closest_item_by_hue(base_hue, user_id, "tego") == closest_by_scan(base_hue, user_id, "tego")
+        assert get_closest_item_by_hue(10.0, user_id, "wonju") is None
+
+
+def test_wraps_around_the_color_wheel(app):
+    user_id, _ = make_user(app)
+    add_item(app, user_id, "tego", "#00ffff")  # 180
+    near_red = add_item(app, user_id, "tego", "#ff0004")  # just under 360
+
+    with app.app_context():
+        assert get_closest_item_by_hue(2.0, user_id, "tego").id == near_red
+
+
+def test_seeks_the_hue_index(app):
+    user_id, _ = make_user(app)
+    for color in ("#ff0000", "#00ff00", "#0000ff"):
+        add_item(app, user_id, "tego", color)
+
+    with app.app_context():
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        event.listen(db.engine, "before_cursor_execute", capture)
+        try:
+            get_closest_item_by_hue(200.0, user_id, "tego")
+        finally:
+            event.remove(db.engine, "before_cursor_execute", capture)
+
+        plans = [
+            [row[-1] for row in db.session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+            for statement, parameters in statements
+        ]
+
+    steps = [step for plan in plans for step in plan]
+    assert any("ix_wardrobe_items_user_id_type_hue" in step for step in steps), plans
+    assert not any(step.startswith("SCAN wardrobe_items") or "TEMP B-TREE" in step for step in steps), plans
+
+
+def test_recommend_without_the_index(app, client, index_disabled):
+    user_id, headers = make_user(app)
+    kira_id = add_item(app, user_id, "kira", "#ff0000")
+    add_item(app, user_id, "tego", "#0000ff")
+    tego_id = add_item(app, user_id, "tego", "#ff2000")
+    wonju_id = add_item(app, user_id, "wonju", "#ff0020")
+    add_item(app, user_id, "wonju", "#00ff00")
+
+    response = client.post(f"/wardrobe-items/{kira_id}/recommend", headers=headers)
+
+    assert response.status_code == 201
+    outfit = response.get_json()
+    assert (outfit["tego"]["id"], outfit["wonju"]["id"]) == (tego_id, wonju_id)
+    with app.app_context():
+        assert outfit_candidates.OutfitCandidateModel.query.count() == 0
+
+
+def test_generate_matches_recommend_without_the_index(app, client, index_disabled):
+    user_id, headers = make_user(app)
+    items = [
+        add_item(app, user_id, item_type, color)
+        for item_type, color in (("kira", "#ff0000"), ("kira", "#00ff40"), ("tego", "#0040ff"),
+                                 ("tego", "#ff2000"), ("wonju", "#ff0020"), ("wonju", "#20ff00"))
+    ]
+
+    recommended = set()
+    for item_id in items:
+        outfit = client.post(f"/wardrobe-items/{item_id}/recommend", headers=headers).get_json()
+        recommended.add((outfit["kira"]["id"], outfit["tego"]["id"], outfit["wonju"]["id"]))
+    outfits = client.get("/user/outfits", headers=headers).get_json()
+    for outfit in outfits:
+        client.delete(f"/outfit/{outfit['id']}/delete", headers=headers)
+
+    response = client.post("/user/outfits/generate", headers=headers)
+
+    assert response.status_code == 200
+    generated = {
+        (outfit["kira"]["id"], outfit["tego"]["id"], outfit["wonju"]["id"])
+        for outfit in client.get("/user/outfits", headers=headers).get_json()
+    }
+    assert generated == recommended
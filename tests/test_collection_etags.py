@@ -0,0 +1,150 @@
+"""Every endpoint that changes a collection invalidates the ETag of its listings."""
+import pytest
+
+from conftest import add_item, add_outfit, make_user, png
+
+
+@pytest.fixture
+def wardrobe(app):
+    """A user with one item of each type and an outfit of them."""
+    user_id, headers = make_user(app)
+    items = {
+        item_type: add_item(app, user_id, item_type, color)
+        for item_type, color in (("kira", "#aa2222"), ("tego", "#2222aa"), ("wonju", "#eeeeee"))
+    }
+    outfit_id = add_outfit(app, user_id, items["kira"], items["tego"], items["wonju"])
+    return user_id, headers, items, outfit_id
+
+
+def etag_of(client, path, headers):
+    response = client.get(path, headers=headers)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert client.get(path, headers={**headers, "If-None-Match": etag}).status_code == 304
+    return etag
+
+
+def assert_changed(client, path, headers, etag):
+    response = client.get(path, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_upload_invalidates_wardrobe(client, stages, wardrobe):
+    _, headers, _, _ = wardrobe
+    etag = etag_of(client, "/user/wardrobe-items", headers)
+
+    response = client.post(
+        "/user/wardrobe-items?mode=sync", headers=headers,
+        data={"name": "new", "image": (png("#123456"), "new.png")}
+    )
+    assert response.status_code == 201
+
+    assert_changed(client, "/user/wardrobe-items", headers, etag)
+
+
+def test_batch_upload_invalidates_wardrobe(client, stages, wardrobe):
+    _, headers, _, _ = wardrobe
+    etag = etag_of(client, "/user/wardrobe-items", headers)
+
+    response = client.post(
+        "/user/wardrobe-items/batch", headers=headers,
+        data={"images": [(png("#123456"), "a.png"), (png("#654321"), "b.png")]}
+    )
+    assert response.status_code == 200
+    assert [result["status"] for result in response.get_json()] == ["created", "created"]
+
+    assert_changed(client, "/user/wardrobe-items", headers, etag)
+
+
+def test_rename_invalidates_wardrobe(client, wardrobe):
+    _, headers, items, _ = wardrobe
+    etag = etag_of(client, "/user/wardrobe-items", headers)
+
+    response = client.patch(f"/wardrobe-items/{items['kira']}", headers=headers, json={"name": "renamed"})
+    assert response.status_code == 200
+
+    assert_changed(client, "/user/wardrobe-items", headers, etag)
+
+
+def test_item_delete_invalidates_wardrobe_and_outfits(app, client, wardrobe):
+    user_id, headers, _, _ = wardrobe
+    item_id = add_item(app, user_id, "kira", "#22aa22")
+    wardrobe_etag = etag_of(client, "/user/wardrobe-items", headers)
+    outfits_etag = etag_of(client, "/user/outfits", headers)
+
+    response = client.delete(f"/wardrobe-items/{item_id}", headers=headers)
+    assert response.status_code == 200
+
+    assert_changed(client, "/user/wardrobe-items", headers, wardrobe_etag)
+    assert_changed(client, "/user/outfits", headers, outfits_etag)
+
+
+def test_recommend_invalidates_outfits(app, client, wardrobe):
+    user_id, headers, items, _ = wardrobe
+    add_item(app, user_id, "wonju", "#dddddd")
+    etag = etag_of(client, "/user/outfits", headers)
+
+    response = client.post(f"/wardrobe-items/{items['kira']}/recommend", headers=headers)
+    assert response.status_code == 201
+
+    assert_changed(client, "/user/outfits", headers, etag)
+
+
+def test_generate_invalidates_outfits(app, client, wardrobe):
+    user_id, headers, _, _ = wardrobe
+    add_item(app, user_id, "wonju", "#dddddd")
+    etag = etag_of(client, "/user/outfits", headers)
+
+    response = client.post("/user/outfits/generate", headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()["created"]
+
+    assert_changed(client, "/user/outfits", headers, etag)
+
+
+def test_create_invalidates_outfits(app, client, wardrobe):
+    user_id, headers, items, _ = wardrobe
+    wonju_id = add_item(app, user_id, "wonju", "#dddddd")
+    etag = etag_of(client, "/user/outfits", headers)
+
+    response = client.post(
+        "/outfit/create", headers=headers,
+        json={"kira_id": items["kira"], "tego_id": items["tego"], "wonju_id": wonju_id}
+    )
+    assert response.status_code == 201
+
+    assert_changed(client, "/user/outfits", headers, etag)
+
+
+def test_edit_invalidates_outfits(app, client, wardrobe):
+    user_id, headers, _, outfit_id = wardrobe
+    wonju_id = add_item(app, user_id, "wonju", "#dddddd")
+    etag = etag_of(client, "/user/outfits", headers)
+
+    response = client.patch(f"/outfit/{outfit_id}/edit", headers=headers, json={"wonju_id": wonju_id})
+    assert response.status_code == 200
+
+    assert_changed(client, "/user/outfits", headers, etag)
+
+
+def test_favorite_invalidates_outfits_and_favorites(client, wardrobe):
+    _, headers, _, outfit_id = wardrobe
+    outfits_etag = etag_of(client, "/user/outfits", headers)
+    favorites_etag = etag_of(client, "/user/favorites", headers)
+
+    response = client.patch(f"/outfits/{outfit_id}/favorite-unfavorite", headers=headers)
+    assert response.status_code == 200
+
+    assert_changed(client, "/user/outfits", headers, outfits_etag)
+    assert_changed(client, "/user/favorites", headers, favorites_etag)
+
+
+def test_outfit_delete_invalidates_outfits(client, wardrobe):
+    _, headers, _, outfit_id = wardrobe
+    etag = etag_of(client, "/user/outfits", headers)
+
+    response = client.delete(f"/outfit/{outfit_id}/delete", headers=headers)
+    assert response.status_code == 200
+
+    assert_changed(client, "/user/outfits", headers, etag)
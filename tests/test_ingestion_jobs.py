@@ -0,0 +1,85 @@
+"""Asynchronous uploads report the state of each stage, including after a failure."""
+import threading
+import time
+
+import pytest
+
+from app import create_app
+from conftest import make_user, png
+from db import db
+
+
+@pytest.fixture
+def app(tmp_path):
+    """
+    On a database file: with the in-memory one, the job thread and the
+    polling requests share a single connection and its transaction.
+    """
+    app = create_app(f"sqlite:///{tmp_path / 'jobs.db'}")
+    app.config["TESTING"] = True
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def wait_for_job(client, headers, location, timeout=5):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(location, headers=headers).get_json()
+        if job["status"] not in ("queued", "running") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.01)
+
+
+def test_failed_predict_leaves_no_stage_running(app, client, stages):
+    _, headers = make_user(app)
+    upload_started = threading.Event()
+    release_upload = threading.Event()
+
+    def upload(img_no_bg, user_id):
+        upload_started.set()
+        release_upload.wait(5)
+        raise RuntimeError("Upload discarded.")
+
+    def predict(img_no_bg):
+        # Fail while the upload is still in flight
+        assert upload_started.wait(5)
+        raise ValueError("Could not classify the image.")
+
+    stages.set_stage("upload", upload)
+    stages.set_stage("predict", predict)
+
+    try:
+        response = client.post(
+            "/user/wardrobe-items?mode=async", headers=headers, data={"name": "kira", "image": (png("#123456"), "a.png")}
+        )
+        assert response.status_code == 202
+        job = wait_for_job(client, headers, response.headers["Location"])
+    finally:
+        release_upload.set()
+
+    assert job["status"] == "failed"
+    assert job["error"] == "Could not classify the image."
+    assert {stage: value["state"] for stage, value in job["stages"].items()} == {
+        "hash": "done", "remove_bg": "done", "upload": "cancelled", "predict": "failed", "color": "pending"
+    }
+
+
+def test_failed_background_upload_is_marked_failed(app, client, stages):
+    _, headers = make_user(app)
+
+    def upload(img_no_bg, user_id):
+        raise RuntimeError("Storage unavailable.")
+
+    stages.set_stage("upload", upload)
+
+    response = client.post(
+        "/user/wardrobe-items?mode=async", headers=headers, data={"name": "kira", "image": (png("#123456"), "a.png")}
+    )
+    job = wait_for_job(client, headers, response.headers["Location"])
+
+    assert job["status"] == "failed"
+    assert {stage: value["state"] for stage, value in job["stages"].items()} == {
+        "hash": "done", "remove_bg": "done", "upload": "failed", "predict": "done", "color": "done"
+    }
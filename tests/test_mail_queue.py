@@ -0,0 +1,143 @@
+"""The mail queue workers against a local SMTP stand-in."""
+import socketserver
+import threading
+import time
+from email.message import EmailMessage
+
+import pytest
+
+from utils import email_utils
+from utils.email_utils import MailQueue
+
+BACKOFF = 0.05
+
+
+class StubSMTPServer(socketserver.ThreadingTCPServer):
+    """
+    Speaks just enough SMTP for smtplib. Each DATA command takes the next
+    scripted reply, then 250: a reply code, or "drop" to hang up instead.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubSMTPHandler)
+        self.replies = []
+        self.connections = 0
+        self.attempts = []
+        self.received = []
+        self.lock = threading.Lock()
+
+    def next_reply(self):
+        with self.lock:
+            self.attempts.append(time.monotonic())
+            return self.replies.pop(0) if self.replies else 250
+
+
+class StubSMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        with self.server.lock:
+            self.server.connections += 1
+        self.reply("220 stub ready")
+        while line := self.rfile.readline():
+            command = line.decode().strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 stub")
+            elif command.startswith(("MAIL", "RCPT", "RSET", "NOOP")):
+                self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 go ahead")
+                body = b"".join(iter(self.rfile.readline, b".\r\n"))
+                reply = self.server.next_reply()
+                if reply == "drop":
+                    return
+                if reply == 250:
+                    with self.server.lock:
+                        self.server.received.append(body)
+                self.reply(f"{reply} {'OK' if reply == 250 else 'try again later'}")
+            elif command == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("502 not implemented")
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    server = StubSMTPServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(email_utils, "SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(email_utils, "SMTP_PORT", server.server_address[1])
+    monkeypatch.setattr(email_utils, "SMTP_USE_SSL", False)
+    monkeypatch.setattr(email_utils, "EMAIL_PASSWORD", None)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_queue(max_retries=2):
+    return MailQueue(max_size=10, workers=1, batch_size=5, max_retries=max_retries, retry_backoff=BACKOFF,
+                     idle_timeout=5)
+
+
+def message(index):
+    msg = EmailMessage()
+    msg["Subject"] = f"Message {index}"
+    msg["From"] = "app@example.com"
+    msg["To"] = "user@example.com"
+    msg.set_content("Hello")
+    return msg
+
+
+def test_worker_reuses_its_connection(smtp_server):
+    mail_queue = make_queue()
+    for index in range(3):
+        assert mail_queue.enqueue(message(index))
+    mail_queue.queue.join()
+
+    assert len(smtp_server.received) == 3
+    assert smtp_server.connections == 1
+    assert mail_queue.get_stats()["connections"] == 1
+
+
+def test_failed_send_is_retried_on_a_fresh_connection_after_a_backoff(smtp_server):
+    smtp_server.replies = [451, "drop"]
+    mail_queue = make_queue()
+
+    assert mail_queue.enqueue(message(0))
+    mail_queue.queue.join()
+
+    stats = mail_queue.get_stats()
+    assert (stats["sent"], stats["retries"], stats["failed"]) == (1, 2, 0)
+    assert len(smtp_server.received) == 1
+    assert smtp_server.connections == 3
+    # Exponential: at least BACKOFF, then 2 * BACKOFF
+    first, second, third = smtp_server.attempts
+    assert second - first >= BACKOFF
+    assert third - second >= 2 * BACKOFF
+
+
+def test_gives_up_after_the_retries(smtp_server):
+    smtp_server.replies = [451, 451]
+    mail_queue = make_queue(max_retries=1)
+
+    mail_queue.enqueue(message(0))
+    mail_queue.enqueue(message(1))
+    mail_queue.queue.join()
+
+    stats = mail_queue.get_stats()
+    assert (stats["sent"], stats["retries"], stats["failed"]) == (1, 1, 1)
+    assert len(smtp_server.attempts) == 3
+
+
+def test_full_queue_rejects_the_message():
+    # No workers, so nothing drains the queue
+    mail_queue = MailQueue(max_size=1, workers=0, batch_size=1, max_retries=0, retry_backoff=0, idle_timeout=1)
+
+    assert mail_queue.enqueue(message(0))
+    assert not mail_queue.enqueue(message(1))
+    assert mail_queue.get_stats()["rejected"] == 1
@@ -0,0 +1,45 @@
+"""The outfit listings load their items in the listing query, not one query per outfit."""
+import pytest
+from sqlalchemy import event
+
+from conftest import add_item, add_outfit, make_user
+from db import db
+
+
+def count_statements(app, client, path, headers):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        response = client.get(path, headers=headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    assert response.status_code == 200
+    return len(statements), response.get_json()
+
+
+@pytest.mark.parametrize("path", ["/user/outfits", "/user/favorites"])
+def test_statement_count_does_not_grow_with_outfits(app, client, path):
+    user_id, headers = make_user(app)
+    tego_id = add_item(app, user_id, "tego", "#000000")
+    wonju_id = add_item(app, user_id, "wonju", "#ffffff")
+
+    counts = {}
+    outfits = 0
+    for total in (1, 20):
+        while outfits < total:
+            kira_id = add_item(app, user_id, "kira", f"#{outfits:06x}")
+            add_outfit(app, user_id, kira_id, tego_id, wonju_id, favorite=True)
+            outfits += 1
+
+        counts[total], body = count_statements(app, client, path, headers)
+        assert len(body) == total
+        assert all(outfit["kira"]["id"] and outfit["tego"]["id"] and outfit["wonju"]["id"] for outfit in body)
+
+    assert counts[1] == counts[20]
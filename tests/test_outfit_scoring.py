@@ -0,0 +1,35 @@
+"""Pruning doesn't change which outfits top_outfits ranks best."""
+import colorsys
+import random
+
+import pytest
+
+from utils import outfit_scoring
+from utils.outfit_scoring import HARMONY_MODELS, ITEM_TYPES, WardrobeArrays, get_harmony_model, top_outfits
+
+
+def make_wardrobe(count, seed):
+    rng = random.Random(seed)
+    ids, types, colors = [], [], []
+    for item_id in range(1, count + 1):
+        red, green, blue = colorsys.hls_to_rgb(rng.random(), rng.uniform(0.1, 0.9), rng.random())
+        ids.append(item_id)
+        types.append(rng.choice(ITEM_TYPES))
+        # Few distinct colors, so there are ties to break
+        colors.append(f"#{int(red * 8) * 32:02x}{int(green * 8) * 32:02x}{int(blue * 8) * 32:02x}")
+    return WardrobeArrays(ids, types, colors)
+
+
+@pytest.mark.parametrize("harmony", sorted(HARMONY_MODELS))
+@pytest.mark.parametrize("count, k, anchored", [(60, 1, False), (300, 10, False), (300, 200, False), (300, 5, True)])
+def test_pruned_search_matches_full_search(monkeypatch, harmony, count, k, anchored):
+    model = get_harmony_model(harmony)
+    wardrobe = make_wardrobe(count, seed=count + k)
+    anchor = int(wardrobe.ids[0]) if anchored else None
+
+    pruned = top_outfits(wardrobe, k, anchor=anchor, model=model)
+    monkeypatch.setattr(outfit_scoring, "OUTFIT_PRUNE_SEED", 0)
+    full = top_outfits(wardrobe, k, anchor=anchor, model=model)
+
+    assert len(pruned) == k
+    assert pruned == full
@@ -0,0 +1,112 @@
+"""Pending signups are shared by every worker through the database."""
+import threading
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app import create_app
+from db import db
+from models import UserModel
+from resources import auth_resource
+from utils import pending_signups
+
+SIGNUP = {"name": "new", "email": "new@example.com", "password": "a-long-password"}
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two app instances on the same database file, as two gunicorn workers would be."""
+    db_url = f"sqlite:///{tmp_path / 'shared.db'}"
+    apps = [create_app(db_url), create_app(db_url)]
+    for app in apps:
+        app.config["TESTING"] = True
+    yield apps
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+
+@pytest.fixture
+def sent_codes(monkeypatch):
+    """The verification code mailed to each address, instead of sending it."""
+    codes = {}
+    monkeypatch.setattr(auth_resource, "send_verification_email", lambda email, subject, code: codes.update({email: code}))
+    return codes
+
+
+def users_with_email(app, email):
+    with app.app_context():
+        return UserModel.query.filter_by(email=email).count()
+
+
+def test_code_issued_by_one_worker_verifies_on_the_other(workers, sent_codes):
+    first, second = workers
+
+    response = first.test_client().post("/auth/signup", json=SIGNUP)
+    assert response.status_code == 200
+
+    response = second.test_client().post(
+        "/auth/verify-signup", json={"email": SIGNUP["email"], "verification_code": sent_codes[SIGNUP["email"]]}
+    )
+    assert response.status_code == 201
+    assert users_with_email(first, SIGNUP["email"]) == 1
+
+
+def test_concurrent_verification_creates_one_user(workers, sent_codes):
+    first, second = workers
+    assert first.test_client().post("/auth/signup", json=SIGNUP).status_code == 200
+    body = {"email": SIGNUP["email"], "verification_code": sent_codes[SIGNUP["email"]]}
+
+    statuses = []
+    barrier = threading.Barrier(len(workers))
+
+    def verify(app):
+        client = app.test_client()
+        barrier.wait()
+        statuses.append(client.post("/auth/verify-signup", json=body).status_code)
+
+    threads = [threading.Thread(target=verify, args=(app,)) for app in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # The other one either finds the pending signup already gone or loses on the unique email
+    assert sorted(statuses) in ([201, 400], [201, 409])
+    assert users_with_email(first, SIGNUP["email"]) == 1
+
+
+def signup(app, email):
+    return app.test_client().post("/auth/signup", json={**SIGNUP, "email": email}).status_code
+
+
+def test_total_cap_holds_across_concurrent_workers(workers, sent_codes, monkeypatch):
+    monkeypatch.setattr(pending_signups, "PENDING_SIGNUP_MAX_TOTAL", 1)
+    statuses = []
+    barrier = threading.Barrier(len(workers))
+
+    def request(app, email):
+        barrier.wait()
+        statuses.append(signup(app, email))
+
+    threads = [
+        threading.Thread(target=request, args=(app, f"user{index}@example.com")) for index, app in enumerate(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(statuses) == [200, 429]
+    # A pending email can still ask for a new code
+    assert signup(workers[1], next(iter(sent_codes))) == 200
+
+
+def test_losing_every_race_gives_up(workers, sent_codes, monkeypatch):
+    def collide(values, now):
+        raise IntegrityError("INSERT INTO pending_signups", {}, Exception("UNIQUE constraint failed"))
+
+    monkeypatch.setattr(pending_signups, "insert_if_under_cap", collide)
+
+    assert signup(workers[0], SIGNUP["email"]) == 429
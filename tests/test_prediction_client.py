@@ -0,0 +1,184 @@
+"""The prediction client against a local stub of the prediction service."""
+import io
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from utils.prediction_client import CircuitBreaker, PredictionClient, PredictionError, PredictionUnavailableError
+
+RESET_TIMEOUT = 0.1
+
+
+class StubService(ThreadingHTTPServer):
+    """
+    Answers each request with the next scripted reply, then with a 200 prediction:
+    a status code, "slow" (sleeps past the read timeout) or "truncated" (a body
+    shorter than its Content-Length).
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.replies = []
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}/predict"
+
+    def next_reply(self):
+        with self.lock:
+            self.requests += 1
+            return self.replies.pop(0) if self.replies else 200
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        reply = self.server.next_reply()
+
+        if reply == "slow":
+            time.sleep(0.5)
+            reply = 200
+
+        body = json.dumps({"prediction": "kira"}).encode() if reply == 200 else b"error"
+        self.send_response(200 if reply == "truncated" else reply)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body) + 100 if reply == "truncated" else len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        if reply == "truncated":
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def service():
+    server = StubService()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(service):
+    return PredictionClient(
+        service.url, timeout=(1, 0.2), retries=2, backoff=0.01, backoff_max=0.02,
+        breaker=CircuitBreaker(failure_threshold=2, reset_timeout=RESET_TIMEOUT)
+    )
+
+
+def predict(client):
+    return client.predict(io.BytesIO(b"image"))
+
+
+def test_retries_until_the_service_recovers(service, client):
+    service.replies = [503, 502]
+
+    assert predict(client) == "kira"
+    assert service.requests == 3
+    assert client.breaker.state == "closed"
+
+
+def test_gives_up_after_the_retries(service, client):
+    service.replies = [503, 503, 503]
+
+    with pytest.raises(PredictionError):
+        predict(client)
+    assert service.requests == 3
+    assert client.breaker.failures == 1
+
+
+def test_retries_a_read_timeout(service, client):
+    service.replies = ["slow"]
+
+    assert predict(client) == "kira"
+    assert service.requests == 2
+
+
+def test_rejected_request_is_not_retried(service, client):
+    service.replies = [400]
+
+    with pytest.raises(PredictionError):
+        predict(client)
+    assert service.requests == 1
+    # The service answered, it is up
+    assert client.breaker.failures == 0
+
+
+def test_repeated_server_errors_open_the_breaker(service, client):
+    service.replies = [500, 500]
+    for _ in range(2):
+        with pytest.raises(PredictionError):
+            predict(client)
+    # 500 isn't retried
+    assert service.requests == 2
+    assert client.breaker.state == "open"
+
+    with pytest.raises(PredictionUnavailableError):
+        predict(client)
+    assert service.requests == 2
+
+
+def test_breaker_opens_then_closes_after_a_successful_trial(service, client):
+    service.replies = [503] * 6
+    for _ in range(2):
+        with pytest.raises(PredictionError):
+            predict(client)
+    assert client.breaker.state == "open"
+
+    # Open: fails fast without calling the service
+    requests_before = service.requests
+    with pytest.raises(PredictionUnavailableError):
+        predict(client)
+    assert service.requests == requests_before
+
+    time.sleep(RESET_TIMEOUT)
+    assert client.breaker.state == "half-open"
+
+    assert predict(client) == "kira"
+    assert client.breaker.state == "closed"
+
+
+def test_failed_trial_reopens_the_breaker(service, client):
+    service.replies = [503] * 9
+    for _ in range(2):
+        with pytest.raises(PredictionError):
+            predict(client)
+
+    time.sleep(RESET_TIMEOUT)
+    with pytest.raises(PredictionError):
+        predict(client)
+    assert client.breaker.state == "open"
+
+    time.sleep(RESET_TIMEOUT)
+    assert predict(client) == "kira"
+    assert client.breaker.state == "closed"
+
+
+def test_trial_failing_with_an_unexpected_error_ends(service, client):
+    service.replies = [503] * 6
+    for _ in range(2):
+        with pytest.raises(PredictionError):
+            predict(client)
+
+    # The trial's response breaks off mid-body, which isn't a connection error or a timeout
+    time.sleep(RESET_TIMEOUT)
+    service.replies = ["truncated"]
+    with pytest.raises(requests.RequestException):
+        predict(client)
+    assert not client.breaker.trial_running
+    assert client.breaker.state == "open"
+
+    time.sleep(RESET_TIMEOUT)
+    assert predict(client) == "kira"
+    assert client.breaker.state == "closed"
@@ -0,0 +1,46 @@
+"""The per-user lookups are answered from the composite indexes, not table scans."""
+import pytest
+from sqlalchemy import text
+
+from db import db
+from models import OutfitsModel, WardrobeItemsModel
+
+
+def query_plan(query):
+    sql = str(query.statement.compile(db.engine, compile_kwargs={"literal_binds": True}))
+    return [row[-1] for row in db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+
+# Both wardrobe indexes lead with user_id, either one answers the plain listing
+WARDROBE_USER_INDEXES = ("ix_wardrobe_items_user_id_type_hue", "ix_wardrobe_items_user_id_image_hash")
+
+
+@pytest.mark.parametrize("build_query, indexes", [
+    # wardrobe listing, with and without the type filter
+    (lambda: WardrobeItemsModel.query.filter_by(user_id=1).order_by(WardrobeItemsModel.id),
+     WARDROBE_USER_INDEXES),
+    (lambda: WardrobeItemsModel.query.filter_by(user_id=1, type="kira").order_by(WardrobeItemsModel.id),
+     "ix_wardrobe_items_user_id_type_hue"),
+    # duplicate upload check
+    (lambda: WardrobeItemsModel.query.filter(
+        WardrobeItemsModel.user_id == 1, WardrobeItemsModel.image_hash.in_(["a", "b"])
+    ), "ix_wardrobe_items_user_id_image_hash"),
+    # outfit listings and the default recommendation
+    (lambda: OutfitsModel.query.filter_by(user_id=1).order_by(OutfitsModel.id),
+     "ix_outfits_user_id_id_desc"),
+    (lambda: OutfitsModel.query.filter_by(user_id=1, favorite=True).order_by(OutfitsModel.id),
+     "ix_outfits_user_id_favorite"),
+    (lambda: OutfitsModel.query.filter_by(user_id=1).order_by(OutfitsModel.id.desc()).limit(1),
+     "ix_outfits_user_id_id_desc"),
+    # existing combination lookup after a duplicate insert
+    (lambda: OutfitsModel.query.filter_by(user_id=1, kira_id=1, tego_id=2, wonju_id=3),
+     "ix_outfits_user_id_combination"),
+])
+def test_per_user_lookup_uses_index(app, build_query, indexes):
+    if isinstance(indexes, str):
+        indexes = (indexes,)
+    with app.app_context():
+        plan = query_plan(build_query())
+
+    assert any(f"INDEX {index} " in step for step in plan for index in indexes), plan
+    assert not any(step.startswith("SCAN") for step in plan), plan
@@ -0,0 +1,56 @@
+"""Offline IP range lookups, from a GEOIP_RANGES_FILE."""
+import ipaddress
+
+import pytest
+
+from utils import get_user_location
+from utils.get_user_location import lookup_offline
+
+RANGES = """\
+# start_ip,end_ip,city,region,country
+1.0.0.0,1.255.255.255,Wide,Region,AA
+1.2.0.0,1.2.255.255,Nested,Region,AA
+1.2.3.0,1.2.3.255,Innermost,Region,AA
+1.250.0.0,2.0.255.255,Overlapping,Region,BB
+2001:db8::,2001:db8::ffff,Six,Region,CC
+0.0.0.10,0.0.0.1,Backwards,Region,DD
+"""
+
+
+@pytest.fixture
+def ranges_file(tmp_path, monkeypatch):
+    path = tmp_path / "ranges.csv"
+    path.write_text(RANGES)
+    monkeypatch.setattr(get_user_location, "GEOIP_RANGES_FILE", str(path))
+    monkeypatch.setattr(get_user_location, "ranges", None)
+    return path
+
+
+def city(ip):
+    location = lookup_offline(ipaddress.ip_address(ip))
+    return location and location.split(",")[0]
+
+
+@pytest.mark.parametrize("ip, expected", [
+    ("1.0.0.1", "Wide"),
+    ("1.2.0.1", "Nested"),
+    ("1.2.3.4", "Innermost"),
+    # Back in the enclosing ranges after the nested ones end
+    ("1.2.4.0", "Nested"),
+    ("1.3.0.0", "Wide"),
+    # Overlap: the narrower range wins, each range still covers the rest of itself
+    ("1.250.0.0", "Overlapping"),
+    ("1.249.255.255", "Wide"),
+    ("2.0.0.1", "Overlapping"),
+    ("2.1.0.0", None),
+    ("0.0.0.5", None),
+])
+def test_ipv4_ranges(ranges_file, ip, expected):
+    assert city(ip) == expected
+
+
+def test_address_families_are_kept_apart(ranges_file):
+    assert city("2001:db8::1") == "Six"
+    # IPv6 addresses with the same integer value as IPv4 addresses in a range
+    assert city(str(ipaddress.IPv6Address(int(ipaddress.IPv4Address("1.2.3.4"))))) is None
+    assert city("::2.0.0.1") is None
@@ -0,0 +1,220 @@
+"""
+Attire type classification, on the background-removed image.
+
+The backend is picked with ATTIRE_CLASSIFIER:
+- "remote" (default): the HTTP prediction service, see utils/prediction_client.py
+- "onnx": a local ONNX model (ATTIRE_MODEL_PATH), loaded once per worker.
+  Concurrent requests are micro-batched: a batcher thread waits up to
+  ATTIRE_BATCH_WAIT_MS after the first image for others to arrive and runs
+  them through the model together, up to ATTIRE_BATCH_SIZE at a time.
+
+Either backend raises PredictionError when it can't classify an image.
+
+The ONNX model takes a float32 RGB batch, NCHW or NHWC, scaled to [0, 1] and
+normalized with ATTIRE_INPUT_MEAN / ATTIRE_INPUT_STD, and outputs one score
+per label in ATTIRE_LABELS order.
+"""
+import io
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+from PIL import Image
+
+from utils.prediction_client import PredictionError, client as prediction_client
+
+ATTIRE_CLASSIFIER = os.getenv("ATTIRE_CLASSIFIER", "remote")
+
+ATTIRE_MODEL_PATH = os.getenv("ATTIRE_MODEL_PATH")
+ATTIRE_LABELS = os.getenv("ATTIRE_LABELS", "kira,tego,wonju").split(",")
+ATTIRE_INPUT_SIZE = int(os.getenv("ATTIRE_INPUT_SIZE", "224"))
+ATTIRE_INPUT_MEAN = [float(value) for value in os.getenv("ATTIRE_INPUT_MEAN", "0.485,0.456,0.406").split(",")]
+ATTIRE_INPUT_STD = [float(value) for value in os.getenv("ATTIRE_INPUT_STD", "0.229,0.224,0.225").split(",")]
+ATTIRE_THREADS = int(os.getenv("ATTIRE_THREADS", "1"))
+ATTIRE_BATCH_SIZE = int(os.getenv("ATTIRE_BATCH_SIZE", "8"))
+ATTIRE_BATCH_WAIT_MS = float(os.getenv("ATTIRE_BATCH_WAIT_MS", "5"))
+
+
+class RemoteClassifier:
+    name = "remote"
+
+    def __init__(self, client):
+        self.client = client
+
+    @property
+    def identity(self):
+        # What the predictions depend on, for caches keyed on it
+        return f"remote:{self.client.url}"
+
+    @staticmethod
+    def encode(img_no_bg):
+        img_byte_arr = io.BytesIO()
+        try:
+            img_no_bg.convert("RGB").save(img_byte_arr, format="JPEG")
+        except Exception as e:
+            raise PredictionError(f"Could not encode the image for the prediction service: {e}") from e
+        img_byte_arr.seek(0)
+        return img_byte_arr
+
+    def classify(self, img_no_bg):
+        return self.client.predict(self.encode(img_no_bg))
+
+    def classify_batch(self, images):
+        return self.client.predict_batch([self.encode(image) for image in images])
+
+
+class OnnxClassifier:
+    name = "onnx"
+
+    def __init__(self, model_path, labels, input_size=224, mean=(0.485, 0.456, 0.406), std=(0.229, 0.224, 0.225),
+                 threads=1, batch_size=8, batch_wait_ms=5.0):
+        if not model_path:
+            raise ValueError("ATTIRE_MODEL_PATH is required for the onnx attire classifier.")
+        self.model_path = model_path
+        self.labels = labels
+        self.input_size = input_size
+        self.mean = np.array(mean, dtype=np.float32)
+        self.std = np.array(std, dtype=np.float32)
+        self.threads = threads
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000
+
+        self.session = None
+        self.session_lock = threading.Lock()
+        self.pending = queue.Queue()
+        self.batcher_pid = None
+        self.batcher_lock = threading.Lock()
+
+    @property
+    def identity(self):
+        # What the predictions depend on, for caches keyed on it; the file's size and
+        # mtime change when a retrained model replaces it at the same path
+        try:
+            stat = os.stat(self.model_path)
+            version = f"{stat.st_size}:{stat.st_mtime_ns}"
+        except OSError:
+            version = "missing"
+        return (f"onnx:{self.model_path}:{version}:{','.join(self.labels)}:{self.input_size}:"
+                f"{self.mean.tolist()}:{self.std.tolist()}")
+
+    def get_session(self):
+        # Created in each worker, onnxruntime thread pools don't survive a fork
+        if self.session is None:
+            with self.session_lock:
+                if self.session is None:
+                    import onnxruntime
+
+                    options = onnxruntime.SessionOptions()
+                    options.intra_op_num_threads = self.threads
+                    options.inter_op_num_threads = 1
+                    session = onnxruntime.InferenceSession(
+                        self.model_path, options, providers=["CPUExecutionProvider"]
+                    )
+
+                    model_input = session.get_inputs()[0]
+                    self.input_name = model_input.name
+                    self.channels_first = model_input.shape[1] == 3
+                    # A model exported with a fixed batch dimension of 1 can't be batched
+                    if model_input.shape[0] == 1:
+                        self.batch_size = 1
+                    self.session = session
+        return self.session
+
+    def preprocess(self, img_no_bg):
+        image = img_no_bg.convert("RGB").resize((self.input_size, self.input_size), Image.BILINEAR)
+        pixels = (np.asarray(image, dtype=np.float32) / 255 - self.mean) / self.std
+        return pixels.transpose(2, 0, 1) if self.channels_first else pixels
+
+    def run(self, inputs):
+        try:
+            scores = self.get_session().run(None, {self.input_name: np.stack(inputs)})[0]
+            return [self.labels[index] for index in np.argmax(scores, axis=1)]
+        except Exception as e:
+            raise PredictionError(f"Attire model failed: {e}") from e
+
+    def ensure_batcher(self):
+        # Started lazily so each gunicorn worker gets its own thread
+        if self.batcher_pid == os.getpid():
+            return
+        with self.batcher_lock:
+            if self.batcher_pid != os.getpid():
+                self.pending = queue.Queue()
+                threading.Thread(target=self.batch_loop, name="attire-classifier-batcher", daemon=True).start()
+                self.batcher_pid = os.getpid()
+
+    def batch_loop(self):
+        pending = self.pending
+        while True:
+            batch = [pending.get()]
+            # Give concurrent requests a moment to join the batch
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(pending.get(timeout=self.batch_wait))
+            except queue.Empty:
+                pass
+
+            try:
+                labels = self.run([inputs for inputs, _ in batch])
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0][1].set_exception(e)
+                else:
+                    # One bad input fails the whole batch, run them one at a time so only it fails
+                    self.run_each(batch)
+                continue
+            for (_, future), label in zip(batch, labels):
+                future.set_result(label)
+
+    def run_each(self, batch):
+        for inputs, future in batch:
+            try:
+                future.set_result(self.run([inputs])[0])
+            except Exception as e:
+                future.set_exception(e)
+
+    def submit(self, img_no_bg):
+        try:
+            self.get_session()
+        except Exception as e:
+            raise PredictionError(f"Could not load the attire model: {e}") from e
+        try:
+            inputs = self.preprocess(img_no_bg)
+        except Exception as e:
+            raise PredictionError(f"Could not prepare the image for the attire model: {e}") from e
+        self.ensure_batcher()
+        future = Future()
+        self.pending.put((inputs, future))
+        return future
+
+    def classify(self, img_no_bg):
+        return self.submit(img_no_bg).result()
+
+    def classify_batch(self, images):
+        futures = [self.submit(image) for image in images]
+        return [future.result() for future in futures]
+
+
+def build_classifier(name):
+    if name == "remote":
+        return RemoteClassifier(prediction_client)
+    if name == "onnx":
+        return OnnxClassifier(
+            ATTIRE_MODEL_PATH,
+            ATTIRE_LABELS,
+            input_size=ATTIRE_INPUT_SIZE,
+            mean=ATTIRE_INPUT_MEAN,
+            std=ATTIRE_INPUT_STD,
+            threads=ATTIRE_THREADS,
+            batch_size=ATTIRE_BATCH_SIZE,
+            batch_wait_ms=ATTIRE_BATCH_WAIT_MS,
+        )
+    raise ValueError(f"Unknown attire classifier: {name}")
+
+
+classifier = build_classifier(ATTIRE_CLASSIFIER)
+
+
+def classify_attire(img_no_bg):
+    return classifier.classify(img_no_bg)
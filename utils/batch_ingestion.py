@@ -0,0 +1,108 @@
+import os
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from models import WardrobeItemsModel
+from utils.image_cache import get_cached_image, store_cached_image
+from utils.outfits_recommendation import hsl_columns
+from utils.wardrobe_pipeline import run_stage, remove_background_and_extract_color, predict_and_upload
+
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "50"))
+
+# Background removal and color extraction; the threads share the worker's rembg session, onnxruntime
+# releases the GIL while it runs and each call already uses REMBG_THREADS cores
+BATCH_CPU_WORKERS = int(os.getenv("BATCH_CPU_WORKERS", "2"))
+BATCH_IO_WORKERS = int(os.getenv("BATCH_IO_WORKERS", "8"))
+
+cpu_executor = ThreadPoolExecutor(max_workers=BATCH_CPU_WORKERS, thread_name_prefix="wardrobe-batch-cpu")
+io_executor = ThreadPoolExecutor(max_workers=BATCH_IO_WORKERS, thread_name_prefix="wardrobe-batch-io")
+
+
+def upload_cached(img_no_bg, attire_type, user_id):
+    return attire_type, run_stage("upload", img_no_bg, user_id)
+
+
+def process_batch(user_id, uploads):
+    """
+    Runs a batch of uploads through the ingestion stages in parallel.
+    - uploads: list of dicts with "filename", "name" and "file", a seekable
+      stream read by one stage at a time (hash, then background removal)
+    - Returns one result per upload with "status" created, duplicate or failed;
+      created results carry the column values for WardrobeItemsModel in "fields"
+    """
+    results = [{"filename": upload["filename"], "name": upload["name"]} for upload in uploads]
+
+    # Step 1: Hash everything and dedupe within the batch
+    hashes = {}
+    for result, upload in zip(results, uploads):
+        image_hash = run_stage("hash", upload["file"])
+        result["image_hash"] = image_hash
+        if image_hash in hashes:
+            result["status"] = "duplicate"
+            result["message"] = "This image appears more than once in the batch."
+        else:
+            hashes[image_hash] = result
+
+    # Step 2: Dedupe against the wardrobe with a single IN query
+    existing = WardrobeItemsModel.query.with_entities(WardrobeItemsModel.image_hash).filter(
+        WardrobeItemsModel.user_id == user_id,
+        WardrobeItemsModel.image_hash.in_(list(hashes))
+    ).all()
+    for (image_hash,) in existing:
+        result = hashes.pop(image_hash)
+        result["status"] = "duplicate"
+        result["message"] = "This image has already been uploaded."
+
+    # Step 3: Background removal and color extraction on the CPU pool,
+    # unless the image cache already has the results for that content
+    cpu_futures = {}
+    cached = {}
+    for result, upload in zip(results, uploads):
+        if "status" in result:
+            continue
+        cached_image = get_cached_image(result["image_hash"])
+        if cached_image:
+            cached[result["image_hash"]] = cached_image
+            continue
+        cpu_futures[result["image_hash"]] = cpu_executor.submit(
+            remove_background_and_extract_color, upload["file"]
+        )
+
+    # Step 4: Prediction and upload overlap on the I/O pool as images come back
+    io_futures = {}
+    colors = {}
+    images = {}
+    for image_hash, (img_no_bg, attire_type, colors[image_hash]) in cached.items():
+        io_futures[image_hash] = io_executor.submit(upload_cached, img_no_bg, attire_type, user_id)
+
+    for image_hash, future in cpu_futures.items():
+        result = hashes[image_hash]
+        try:
+            images[image_hash], colors[image_hash] = future.result()
+            io_futures[image_hash] = io_executor.submit(predict_and_upload, images[image_hash], user_id)
+        except Exception as e:
+            traceback.print_exc()
+            result["status"] = "failed"
+            result["message"] = str(e)
+
+    for image_hash, future in io_futures.items():
+        result = hashes[image_hash]
+        try:
+            attire_type, stored_image = future.result()
+            result["status"] = "created"
+            result["fields"] = {
+                "type": attire_type,
+                "color": colors[image_hash],
+                "image_url": stored_image.url,
+                "public_id": stored_image.public_id,
+                "image_hash": image_hash,
+                **hsl_columns(colors[image_hash]),
+            }
+            if image_hash in images:
+                store_cached_image(image_hash, images.pop(image_hash), attire_type, colors[image_hash])
+        except Exception as e:
+            traceback.print_exc()
+            result["status"] = "failed"
+            result["message"] = str(e)
+
+    return results
@@ -0,0 +1,49 @@
+import hashlib
+
+from flask import abort, after_this_request, make_response, request
+
+from db import db
+from models import UserModel
+
+
+def version_columns(collections):
+    # "wardrobe" -> UserModel.wardrobe_version, "outfits" -> UserModel.outfits_version
+    return [getattr(UserModel, f"{collection}_version") for collection in collections]
+
+
+def bump_collection_version(user_id, *collections):
+    """
+    Increments the user's version counters for the given collections.
+    Runs inside the caller's transaction, so it is committed (or rolled back) with the change itself.
+    """
+    UserModel.query.filter_by(id=user_id).update(
+        {column: column + 1 for column in version_columns(collections)},
+        synchronize_session=False
+    )
+
+
+def check_collection_etag(user_id, *collections):
+    """
+    Conditional GET for a per-user collection listing.
+    - Answers 304 straight away when If-None-Match holds the current ETag
+    - Otherwise tags the response that the view is about to return
+    Only the version columns of the user row are read, never the item tables.
+    """
+    versions = db.session.query(*version_columns(collections)).filter(UserModel.id == user_id).first()
+    if versions is None:
+        return
+
+    # Query args (cursor, limit, fields, filters) produce different bodies, so they are part of the tag
+    raw = f"{user_id}|{request.path}|{request.query_string.decode()}|{'.'.join(map(str, versions))}"
+    etag = hashlib.sha1(raw.encode()).hexdigest()
+
+    if request.if_none_match.contains_weak(etag):
+        response = make_response("", 304)
+        response.set_etag(etag, weak=True)
+        abort(response)
+
+    @after_this_request
+    def set_etag(response):
+        if response.status_code == 200:
+            response.set_etag(etag, weak=True)
+        return response
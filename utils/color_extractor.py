@@ -1,11 +1,14 @@
 from PIL import Image
 import numpy as np
-from sklearn.cluster import KMeans
+import os
+
+# "fast" (NumPy only) or "kmeans" (scikit-learn)
+COLOR_ENGINE = os.getenv("COLOR_ENGINE", "fast")
 
 def rgb_to_hex(rgb):
     return '#{:02X}{:02X}{:02X}'.format(*rgb)
 
-def get_dominant_color(image_file, k=5, image_resize=(100, 100)):
+def get_opaque_pixels(image_file, image_resize=(100, 100)):
     if not isinstance(image_file, Image.Image):
         image_file = Image.open(image_file)
 
@@ -15,15 +18,70 @@ def get_dominant_color(image_file, k=5, image_resize=(100, 100)):
     pixels = pixels.reshape(-1, 4)
     pixels = pixels[pixels[:, 3] > 0]  # Keep pixels with alpha > 0
 
-    if pixels.size == 0:
-        return "#000000"
+    return pixels[:, :3]
 
-    pixels_rgb = pixels[:, :3]
+def kmeans_dominant_color(pixels_rgb, k=5):
+    # Imported lazily, scikit-learn is only needed for this engine
+    from sklearn.cluster import KMeans
 
     kmeans = KMeans(n_clusters=k, random_state=42)
     kmeans.fit(pixels_rgb)
 
     counts = np.bincount(kmeans.labels_)
-    dominant_color = kmeans.cluster_centers_[np.argmax(counts)].astype(int)
+    return kmeans.cluster_centers_[np.argmax(counts)].astype(int)
+
+def fast_dominant_color(pixels_rgb, k=5, bins=32, max_iter=10):
+    # Collapse the pixels into the occupied cells of a quantized 3-D histogram
+    cells = pixels_rgb.astype(np.int64) * bins // 256
+    cell_ids = (cells[:, 0] * bins + cells[:, 1]) * bins + cells[:, 2]
+    weights = np.bincount(cell_ids, minlength=bins ** 3)
+    occupied = np.flatnonzero(weights)
+    weights = weights[occupied].astype(np.float64)
+
+    points = np.stack([
+        np.bincount(cell_ids, weights=pixels_rgb[:, channel], minlength=bins ** 3)[occupied]
+        for channel in range(3)
+    ], axis=1) / weights[:, None]
+
+    # Deterministic k-means++ style seeding: start from the most populated cell,
+    # then repeatedly take the cell with the largest weighted distance to the seeds
+    centers = points[[np.argmax(weights)]]
+    closest = ((points - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, min(k, len(points))):
+        seed = points[np.argmax(weights * closest)]
+        centers = np.vstack([centers, seed])
+        closest = np.minimum(closest, ((points - seed) ** 2).sum(axis=1))
+
+    # Weighted Lloyd iterations with a fixed budget
+    for _ in range(max_iter):
+        distances = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        labels = distances.argmin(axis=1)
+        counts = np.bincount(labels, weights=weights, minlength=len(centers))
+
+        sums = np.stack([
+            np.bincount(labels, weights=weights * points[:, channel], minlength=len(centers))
+            for channel in range(3)
+        ], axis=1)
+        new_centers = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centers)
+
+        converged = np.abs(new_centers - centers).max() < 0.5
+        centers = new_centers
+        if converged:
+            break
+
+    return centers[np.argmax(counts)].astype(int)
+
+color_engines = {
+    "fast": fast_dominant_color,
+    "kmeans": kmeans_dominant_color,
+}
+
+def get_dominant_color(image_file, k=5, image_resize=(100, 100), engine=None):
+    pixels_rgb = get_opaque_pixels(image_file, image_resize)
+
+    if pixels_rgb.size == 0:
+        return "#000000"
+
+    dominant_color = color_engines[engine or COLOR_ENGINE](pixels_rgb, k=k)
 
     return rgb_to_hex(dominant_color)
@@ -0,0 +1,88 @@
+"""
+The user of the current request.
+
+current_user_id() is the JWT identity as an int, and get_current_user() loads
+that user's row at most once per request (both are kept on flask.g); endpoints
+that only need the id should filter by it instead of loading the user.
+
+profile_cache keeps the serialized GET /user response of recently seen users
+for USER_PROFILE_CACHE_TTL seconds (0, the default, disables it). It is per
+worker: the endpoints that change a user invalidate the entry in the worker
+that handled them, the other workers can serve the old profile until it
+expires, so keep the TTL short.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g
+from flask_jwt_extended import get_jwt_identity
+from flask_smorest import abort
+
+from db import db
+from models import UserModel
+
+USER_PROFILE_CACHE_TTL = float(os.getenv("USER_PROFILE_CACHE_TTL", "0"))
+USER_PROFILE_CACHE_SIZE = int(os.getenv("USER_PROFILE_CACHE_SIZE", "10000"))
+
+# Stored on g when the user has been looked up and doesn't exist
+MISSING = object()
+
+
+def current_user_id():
+    if "current_user_id" not in g:
+        g.current_user_id = int(get_jwt_identity())
+    return g.current_user_id
+
+
+def get_current_user():
+    """The current user's row, or None if it doesn't exist (anymore)."""
+    if "current_user" not in g:
+        g.current_user = db.session.get(UserModel, current_user_id()) or MISSING
+    return None if g.current_user is MISSING else g.current_user
+
+
+def get_current_user_or_404():
+    user = get_current_user()
+    if user is None:
+        abort(404, message="User not found.")
+    return user
+
+
+class ProfileCache:
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, user_id):
+        if not self.ttl:
+            return None
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, profile = entry
+            if expires_at <= time.monotonic():
+                del self.entries[user_id]
+                return None
+            return profile
+
+    def put(self, user_id, profile):
+        if not self.ttl:
+            return
+        with self.lock:
+            self.entries.pop(user_id, None)
+            self.entries[user_id] = (time.monotonic() + self.ttl, profile)
+            # Insertion order is expiry order, drop the oldest
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.entries.pop(int(user_id), None)
+
+
+profile_cache = ProfileCache(USER_PROFILE_CACHE_TTL, USER_PROFILE_CACHE_SIZE)
@@ -1,27 +1,223 @@
 import smtplib
 from email.message import EmailMessage
 import os
+import queue
+import random
 import threading
+import time
+
+from utils.get_user_location import get_location_from_ip
+from utils.metrics import MAIL_MESSAGES, MAIL_QUEUE_DEPTH, MAIL_SEND_SECONDS
 
 EMAIL_ADDRESS = os.getenv("EMAIL_ADDRESS")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
 
-def send_email_verification(to_email, subject, html_body, plain_body=None):
+# SMTP server, point it at a local stand-in (SMTP_USE_SSL=false) for tests
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_USE_SSL = os.getenv("SMTP_USE_SSL", "true").lower() == "true"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "10"))
+
+MAIL_QUEUE_SIZE = int(os.getenv("MAIL_QUEUE_SIZE", "1000"))
+MAIL_WORKERS = int(os.getenv("MAIL_WORKERS", "2"))
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", "20"))
+MAIL_MAX_RETRIES = int(os.getenv("MAIL_MAX_RETRIES", "3"))
+MAIL_RETRY_BACKOFF = float(os.getenv("MAIL_RETRY_BACKOFF", "1.0"))
+# Idle seconds after which a worker closes its SMTP connection
+MAIL_IDLE_TIMEOUT = float(os.getenv("MAIL_IDLE_TIMEOUT", "30"))
+
+
+class MailQueue:
+    """
+    Bounded outbound mail queue served by a small pool of worker threads.
+    - Each worker keeps one authenticated SMTP connection open and reuses it
+    - Messages that arrive together are sent as a batch over that connection
+    - Failed sends are retried with exponential backoff and a fresh connection
+    """
+
+    def __init__(self, max_size, workers, batch_size, max_retries, retry_backoff, idle_timeout):
+        self.queue = queue.Queue(maxsize=max_size)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.idle_timeout = idle_timeout
+
+        self.started_pid = None
+        self.lock = threading.Lock()
+        self.stats = {
+            "sent": 0,
+            "failed": 0,
+            "retries": 0,
+            "rejected": 0,
+            "batches": 0,
+            "connections": 0,
+            "total_send_seconds": 0.0,
+            "last_send_seconds": None,
+        }
+
+    def start(self):
+        # Threads don't survive a fork, so start them lazily in every process
+        if self.started_pid == os.getpid():
+            return
+        with self.lock:
+            if self.started_pid == os.getpid():
+                return
+            for index in range(self.workers):
+                threading.Thread(target=self.run_worker, name=f"mail-queue-{index}", daemon=True).start()
+            self.started_pid = os.getpid()
+
+    def enqueue(self, msg):
+        """
+        Queues an EmailMessage, or a callable returning one when building the
+        message needs slow work that shouldn't happen on the request thread.
+        - Returns True once the message is queued, which says nothing about
+          delivery: send failures only show up in the stats and metrics
+        - Returns False when it can't be queued, because the queue is full or
+          no worker can be started to send it (the process is shutting down)
+        """
+        try:
+            self.start()
+        except RuntimeError as e:
+            return self.reject(f"no mail queue worker ({e})")
+        try:
+            self.queue.put_nowait(msg)
+            MAIL_QUEUE_DEPTH.set(self.queue.qsize())
+            return True
+        except queue.Full:
+            return self.reject("mail queue is full")
+
+    def reject(self, reason):
+        with self.lock:
+            self.stats["rejected"] += 1
+        MAIL_MESSAGES.labels(outcome="rejected").inc()
+        print(f"Failed to queue email: {reason}")
+        return False
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats["depth"] = self.queue.qsize()
+        stats["avg_send_seconds"] = stats["total_send_seconds"] / stats["sent"] if stats["sent"] else None
+        return stats
+
+    def connect(self):
+        if SMTP_USE_SSL:
+            connection = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+        else:
+            connection = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+        if EMAIL_PASSWORD:
+            connection.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
+        with self.lock:
+            self.stats["connections"] += 1
+        return connection
+
+    @staticmethod
+    def close(connection):
+        try:
+            connection.quit()
+        except Exception:
+            pass
+
+    def run_worker(self):
+        connection = None
+
+        while True:
+            try:
+                batch = [self.queue.get(timeout=self.idle_timeout)]
+            except queue.Empty:
+                if connection:
+                    self.close(connection)
+                    connection = None
+                continue
+
+            # Drain whatever else is already waiting into the same batch
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            MAIL_QUEUE_DEPTH.set(self.queue.qsize())
+
+            with self.lock:
+                self.stats["batches"] += 1
+
+            for msg in batch:
+                connection = self.send(msg, connection)
+                self.queue.task_done()
+
+    def send(self, msg, connection):
+        if callable(msg):
+            try:
+                msg = msg()
+            except Exception as e:
+                print(f"Failed to build email: {e}")
+                with self.lock:
+                    self.stats["failed"] += 1
+                MAIL_MESSAGES.labels(outcome="failed").inc()
+                return connection
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                if connection is None:
+                    connection = self.connect()
+
+                started = time.perf_counter()
+                connection.send_message(msg)
+                elapsed = time.perf_counter() - started
+
+                with self.lock:
+                    self.stats["sent"] += 1
+                    self.stats["total_send_seconds"] += elapsed
+                    self.stats["last_send_seconds"] = elapsed
+                MAIL_SEND_SECONDS.observe(elapsed)
+                MAIL_MESSAGES.labels(outcome="sent").inc()
+                return connection
+
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused) as e:
+                # Retrying won't help with a rejected address
+                print(f"Failed to send email: {e}")
+                break
+
+            except Exception as e:
+                print(f"Failed to send email (attempt {attempt + 1}): {e}")
+                if connection:
+                    self.close(connection)
+                    connection = None
+                if attempt < self.max_retries:
+                    with self.lock:
+                        self.stats["retries"] += 1
+                    MAIL_MESSAGES.labels(outcome="retry").inc()
+                    time.sleep(self.retry_backoff * 2 ** attempt + random.uniform(0, self.retry_backoff))
+
+        with self.lock:
+            self.stats["failed"] += 1
+        MAIL_MESSAGES.labels(outcome="failed").inc()
+        return connection
+
+
+mail_queue = MailQueue(
+    MAIL_QUEUE_SIZE, MAIL_WORKERS, MAIL_BATCH_SIZE, MAIL_MAX_RETRIES, MAIL_RETRY_BACKOFF, MAIL_IDLE_TIMEOUT
+)
+
+
+def get_mail_queue_stats():
+    return mail_queue.get_stats()
+
+
+def build_email(to_email, subject, html_body, plain_body=None):
     msg = EmailMessage()
     msg["Subject"] = subject
     msg["From"] = EMAIL_ADDRESS
     msg["To"] = to_email
     msg.set_content(plain_body or "Please use an HTML-compatible email viewer.")
     msg.add_alternative(html_body, subtype="html")
+    return msg
 
-    try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as smtp:
-            smtp.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
-            smtp.send_message(msg)
-        return True
-    except Exception as e:
-        print(f"Failed to send email: {e}")
-        return False
+
+def send_email_verification(to_email, subject, html_body, plain_body=None):
+    """Queues the email; True means queued, not delivered (see MailQueue.enqueue)."""
+    return mail_queue.enqueue(build_email(to_email, subject, html_body, plain_body))
 
 def send_verification_email(email, subject, code):
     html_body = f"""
@@ -50,34 +246,37 @@ def send_verification_email(email, subject, code):
 
 
 
-def send_login_alert_email_async(user_email, now, device, location):
-    def task():
-        html_body = f"""
-        <div style='font-family: Arial; background-color: #f9f9f9; padding: 20px;'>
-          <div style='max-width: 500px; margin: auto; background: white; border-radius: 8px; padding: 30px; box-shadow: 0 4px 8px rgba(0,0,0,0.1);'>
-            <h2 style='color: #534ca0; text-align: center;'>Login Notification</h2>
-            <p style='font-size: 16px; color: #333; text-align: center;'>
-              A login to your account was made:
-            </p>
-            <ul style='font-size: 14px; color: #555;'>
-              <li><strong>Time:</strong> {now}</li>
-              <li><strong>Device:</strong> {device}</li>
-              <li><strong>Location:</strong> {location}</li>
-            </ul>
-            <p style='font-size: 13px; color: #999; text-align: center; margin-top: 20px;'>
-              If this wasn't you, please reset your password immediately.
-            </p>
-          </div>
-        </div>
-        """
+def build_login_alert_email(user_email, now, device, ip):
+    # Runs on a mail queue worker, so the geolocation lookup stays off the login request
+    location = get_location_from_ip(ip)
+
+    html_body = f"""
+    <div style='font-family: Arial; background-color: #f9f9f9; padding: 20px;'>
+      <div style='max-width: 500px; margin: auto; background: white; border-radius: 8px; padding: 30px; box-shadow: 0 4px 8px rgba(0,0,0,0.1);'>
+        <h2 style='color: #534ca0; text-align: center;'>Login Notification</h2>
+        <p style='font-size: 16px; color: #333; text-align: center;'>
+          A login to your account was made:
+        </p>
+        <ul style='font-size: 14px; color: #555;'>
+          <li><strong>Time:</strong> {now}</li>
+          <li><strong>Device:</strong> {device}</li>
+          <li><strong>Location:</strong> {location}</li>
+        </ul>
+        <p style='font-size: 13px; color: #999; text-align: center; margin-top: 20px;'>
+          If this wasn't you, please reset your password immediately.
+        </p>
+      </div>
+    </div>
+    """
+
+    plain_body = (f"Login detected:\n"
+                  f"- Time: {now}\n"
+                  f"- Device: {device}\n"
+                  f"- Location: {location}\n\n"
+                  f"If this wasn't you, please change your password.")
 
-        plain_body = (f"Login detected:\n"
-                      f"- Time: {now}\n"
-                      f"- Device: {device}\n"
-                      f"- Location: {location}\n\n"
-                      f"If this wasn't you, please change your password.")
+    return build_email(user_email, "Login Alert", html_body, plain_body)
 
-        send_email_verification(user_email, "Login Alert", html_body, plain_body)
 
-    # Start thread
-    threading.Thread(target=task).start()
\ No newline at end of file
+def send_login_alert_email_async(user_email, now, device, ip):
+    return mail_queue.enqueue(lambda: build_login_alert_email(user_email, now, device, ip))
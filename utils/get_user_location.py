@@ -1,15 +1,184 @@
+import bisect
+import csv
+import heapq
+import ipaddress
+import os
+import threading
+import time
+from collections import OrderedDict
+
 import requests
+from requests.adapters import HTTPAdapter
 
-def get_location_from_ip(ip):
+UNKNOWN_LOCATION = "Unknown location"
+
+GEOIP_URL = os.getenv("GEOIP_URL", "https://ipwho.is/{ip}")
+GEOIP_CONNECT_TIMEOUT = float(os.getenv("GEOIP_CONNECT_TIMEOUT", "1"))
+GEOIP_READ_TIMEOUT = float(os.getenv("GEOIP_READ_TIMEOUT", "2"))
+
+GEOIP_CACHE_SIZE = int(os.getenv("GEOIP_CACHE_SIZE", "4096"))
+GEOIP_CACHE_TTL = int(os.getenv("GEOIP_CACHE_TTL", "86400"))
+# Failed lookups are cached briefly so a down provider isn't hit on every login
+GEOIP_FAILURE_TTL = int(os.getenv("GEOIP_FAILURE_TTL", "60"))
+# Share cache entries between neighbouring addresses (/24 for IPv4, /48 for IPv6)
+GEOIP_CACHE_BY_PREFIX = os.getenv("GEOIP_CACHE_BY_PREFIX", "true").lower() == "true"
+
+# Optional offline lookup, CSV rows of: start_ip,end_ip,city,region,country
+GEOIP_RANGES_FILE = os.getenv("GEOIP_RANGES_FILE")
+
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+
+class LocationCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()  # key -> (location, expires_at)
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, location, ttl):
+        with self.lock:
+            self.entries[key] = (location, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+
+cache = LocationCache(GEOIP_CACHE_SIZE)
+
+ranges_lock = threading.Lock()
+ranges = None  # IP version -> (sorted start ints, [(end int, location)]), disjoint ranges
+
+
+def load_ranges():
+    global ranges
+
+    with ranges_lock:
+        if ranges is not None:
+            return ranges
+
+        rows = {4: [], 6: []}
+        if GEOIP_RANGES_FILE:
+            try:
+                with open(GEOIP_RANGES_FILE, newline="") as ranges_file:
+                    for row in csv.reader(ranges_file):
+                        if len(row) < 5 or row[0].startswith("#"):
+                            continue
+                        try:
+                            start, end = ipaddress.ip_address(row[0].strip()), ipaddress.ip_address(row[1].strip())
+                        except ValueError:
+                            continue
+                        if start.version != end.version or start > end:
+                            continue
+                        rows[start.version].append((int(start), int(end), format_location(row[2], row[3], row[4])))
+            except OSError as e:
+                print(f"Warning: Failed to load IP ranges file: {e}")
+
+        ranges = {version: flatten_ranges(version_rows) for version, version_rows in rows.items()}
+        return ranges
+
+
+def flatten_ranges(rows):
+    """
+    Splits (start, end, location) ranges that may nest or overlap into disjoint
+    ones, so a lookup is a single bisect. Where ranges overlap the narrowest
+    one wins, then the first one in the file.
+    - Returns (sorted start ints, [(end int, location)])
+    """
+    rows = sorted(rows, key=lambda row: row[0])
+    boundaries = sorted({start for start, _, _ in rows} | {end + 1 for _, end, _ in rows})
+
+    starts, entries = [], []
+    active = []  # heap of (width, row index, end, location)
+    next_row = 0
+    for boundary, next_boundary in zip(boundaries, boundaries[1:]):
+        while next_row < len(rows) and rows[next_row][0] <= boundary:
+            start, end, location = rows[next_row]
+            heapq.heappush(active, (end - start, next_row, end, location))
+            next_row += 1
+        while active and active[0][2] < boundary:
+            heapq.heappop(active)
+        if not active:
+            continue
+
+        location = active[0][3]
+        if entries and entries[-1] == (boundary - 1, location):
+            entries[-1] = (next_boundary - 1, location)
+        else:
+            starts.append(boundary)
+            entries.append((next_boundary - 1, location))
+    return starts, entries
+
+
+def format_location(city, region, country):
+    return f"{city}, {region}, {country}"
+
+
+def cache_key(address):
+    if not GEOIP_CACHE_BY_PREFIX:
+        return str(address)
+    prefix = 24 if address.version == 4 else 48
+    return str(ipaddress.ip_network(f"{address}/{prefix}", strict=False))
+
+
+def lookup_offline(address):
+    starts, entries = load_ranges()[address.version]
+    index = bisect.bisect_right(starts, int(address)) - 1
+    if index >= 0:
+        end, location = entries[index]
+        if int(address) <= end:
+            return location
+    return None
+
+
+def lookup_online(address):
     try:
-        response = requests.get(f"https://ipwho.is/{ip}")
+        response = session.get(
+            GEOIP_URL.format(ip=address),
+            timeout=(GEOIP_CONNECT_TIMEOUT, GEOIP_READ_TIMEOUT)
+        )
         if response.status_code == 200:
             data = response.json()
             if data.get("success"):
                 city = data.get("city", "")
                 region = data.get("region", "")
                 country = data.get("country", "")
-                return f"{city}, {region}, {country}"
+                return format_location(city, region, country)
     except Exception:
         pass
-    return "Unknown location"
+    return None
+
+
+def get_location_from_ip(ip):
+    try:
+        address = ipaddress.ip_address((ip or "").strip())
+    except ValueError:
+        return UNKNOWN_LOCATION
+
+    if not address.is_global:
+        return UNKNOWN_LOCATION
+
+    key = cache_key(address)
+    location = cache.get(key)
+    if location is not None:
+        return location
+
+    location = lookup_offline(address) or lookup_online(address)
+    if location:
+        cache.set(key, location, GEOIP_CACHE_TTL)
+        return location
+
+    cache.set(key, UNKNOWN_LOCATION, GEOIP_FAILURE_TTL)
+    return UNKNOWN_LOCATION
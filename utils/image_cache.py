@@ -0,0 +1,201 @@
+"""
+Content-addressed cache of processed uploads, keyed by the image hash.
+
+Each entry holds what the expensive ingestion stages produce for an image: the
+background-removed PNG, the predicted attire type and the dominant color. The
+same photo uploaded again (by anyone, or after a delete) then only needs to be
+uploaded to storage.
+
+Entries live on local disk, as <dir>/<settings>/<hash[:2]>/<hash>.png + .json,
+where <settings> changes with the background removal, attire classifier and
+color settings so a model change never serves stale results. The directory is
+kept under IMAGE_CACHE_MAX_BYTES by evicting the least recently used entries
+(by mtime).
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import click
+from flask.cli import AppGroup
+from PIL import Image
+
+from utils.attire_classifier import classifier
+from utils.color_extractor import COLOR_ENGINE
+from utils.metrics import IMAGE_CACHE_REQUESTS
+from utils.remove_bg import REMBG_MAX_SIDE, REMBG_MODEL
+
+# Empty disables the cache
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "gyencha-image-cache"))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+
+class ImageCache:
+    def __init__(self, root, max_bytes, settings):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.directory = os.path.join(root, hashlib.sha256(settings.encode()).hexdigest()[:12])
+        self.lock = threading.Lock()
+        self.size_estimate = None
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def paths(self, image_hash):
+        base = os.path.join(self.directory, image_hash[:2], image_hash)
+        return base + ".png", base + ".json"
+
+    def count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def get(self, image_hash):
+        """Returns (background-removed image, attire type, color hex) or None."""
+        png_path, meta_path = self.paths(image_hash)
+        try:
+            with open(meta_path) as meta_file:
+                meta = json.load(meta_file)
+            with Image.open(png_path) as image:
+                image.load()
+            # Refresh the entry for LRU eviction
+            os.utime(png_path)
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            self.count("misses")
+            IMAGE_CACHE_REQUESTS.labels(result="miss").inc()
+            return None
+
+        self.count("hits")
+        IMAGE_CACHE_REQUESTS.labels(result="hit").inc()
+        return image, meta["type"], meta["color"]
+
+    def put(self, image_hash, img_no_bg, attire_type, color_hex):
+        png_path, meta_path = self.paths(image_hash)
+        directory = os.path.dirname(png_path)
+        os.makedirs(directory, exist_ok=True)
+
+        # Write to temporary files and rename, so readers never see a partial entry;
+        # the .json goes last since get() needs both
+        written = 0
+        for path, write in (
+            (png_path, lambda f: img_no_bg.save(f, format="PNG")),
+            (meta_path, lambda f: f.write(json.dumps({"type": attire_type, "color": color_hex}).encode())),
+        ):
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as temp_file:
+                    write(temp_file)
+                written += os.path.getsize(temp_path)
+                os.replace(temp_path, path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+
+        self.count("stores")
+        with self.lock:
+            if self.size_estimate is not None:
+                self.size_estimate += written
+            needs_eviction = self.size_estimate is None or self.size_estimate > self.max_bytes
+        if needs_eviction:
+            self.evict()
+
+    def entries(self):
+        # (mtime, size, png path, json path) per complete entry
+        entries = []
+        for dirpath, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if not filename.endswith(".json"):
+                    continue
+                meta_path = os.path.join(dirpath, filename)
+                png_path = meta_path[:-len(".json")] + ".png"
+                try:
+                    meta_stat, png_stat = os.stat(meta_path), os.stat(png_path)
+                except OSError:
+                    continue
+                entries.append((meta_stat.st_mtime, meta_stat.st_size + png_stat.st_size, png_path, meta_path))
+        return entries
+
+    def evict(self):
+        """Deletes the least recently used entries until the cache is back under 90% of its budget."""
+        entries = self.entries()
+        total = sum(entry[1] for entry in entries)
+        evicted = 0
+
+        if total > self.max_bytes:
+            target = self.max_bytes * 0.9
+            for _, size, png_path, meta_path in sorted(entries):
+                if total <= target:
+                    break
+                for path in (meta_path, png_path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                total -= size
+                evicted += 1
+
+        self.count("evictions", evicted)
+        with self.lock:
+            self.size_estimate = total
+        return evicted
+
+    def purge(self):
+        # Drops every entry, including those written under older settings
+        shutil.rmtree(self.root, ignore_errors=True)
+        with self.lock:
+            self.size_estimate = 0
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats["directory"] = self.directory
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+
+cache = ImageCache(
+    IMAGE_CACHE_DIR,
+    IMAGE_CACHE_MAX_BYTES,
+    settings=f"{REMBG_MODEL}:{REMBG_MAX_SIDE}:{COLOR_ENGINE}:{classifier.identity}"
+) if IMAGE_CACHE_DIR else None
+
+
+def get_cached_image(image_hash):
+    if cache is None:
+        return None
+    return cache.get(image_hash)
+
+
+def store_cached_image(image_hash, img_no_bg, attire_type, color_hex):
+    # The cache only saves work, failing to fill it must not fail the upload
+    if cache is None:
+        return
+    try:
+        cache.put(image_hash, img_no_bg, attire_type, color_hex)
+    except Exception as e:
+        print(f"Warning: Failed to cache processed image {image_hash}: {e}")
+
+
+cli = AppGroup("image-cache", help="Manage the processed image cache.")
+
+
+@cli.command("purge")
+def purge_command():
+    """Delete every cached image."""
+    if cache is None:
+        click.echo("The image cache is disabled.")
+        return
+    cache.purge()
+    click.echo(f"Purged {cache.root}")
+
+
+@cli.command("stats")
+def stats_command():
+    """Show the size of the cache."""
+    if cache is None:
+        click.echo("The image cache is disabled.")
+        return
+    entries = cache.entries()
+    click.echo(f"{len(entries)} entries, {sum(entry[1] for entry in entries)} bytes in {cache.directory}")
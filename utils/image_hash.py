@@ -1,7 +1,13 @@
 import hashlib
 
+# Read uploads in chunks so hashing never holds a second copy of the file in memory
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
 def calculate_image_hash(file):
     file.seek(0)
-    file_bytes = file.read()
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
     file.seek(0)
-    return hashlib.sha256(file_bytes).hexdigest()
+    return digest.hexdigest()
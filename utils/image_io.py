@@ -0,0 +1,51 @@
+import os
+
+from PIL import Image
+
+# Largest accepted upload per image, in bytes
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(16 * 1024 * 1024)))
+# Largest accepted decoded size; also makes PIL refuse decompression bombs early
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", str(40_000_000)))
+
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+
+class ImageTooLargeError(ValueError):
+    pass
+
+
+def upload_size(file):
+    # Werkzeug spools large uploads to disk, so this doesn't read the file
+    position = file.tell()
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(position)
+    return size
+
+
+def open_image(file, max_side=0):
+    """
+    Decodes an uploaded image, downscaled so its longest side is at most max_side (0 keeps the size).
+    - Only the header is read before the pixel count check
+    - JPEGs are decoded directly at a reduced scale with draft(), so the
+      full-size bitmap never has to exist in memory
+    """
+    file.seek(0)
+    try:
+        image = Image.open(file)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e))
+
+    width, height = image.size
+    if width * height > MAX_IMAGE_PIXELS:
+        raise ImageTooLargeError(
+            f"Image is too large ({width}x{height}), the limit is {MAX_IMAGE_PIXELS} pixels."
+        )
+
+    if max_side:
+        image.draft("RGB", (max_side, max_side))
+        image.thumbnail((max_side, max_side))
+    else:
+        image.load()
+
+    return image
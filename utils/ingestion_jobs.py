@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from db import db
+from models import IngestionJobModel, WardrobeItemsModel
+from utils.collection_version import bump_collection_version
+from utils.metrics import stage_timer
+from utils.object_storage import schedule_delete
+from utils.outfit_candidates import index_item
+from utils.wardrobe_pipeline import STAGE_NAMES, run_pipeline
+
+# Local worker pool shared by every request handled in this process
+executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("INGESTION_WORKERS", "2")),
+    thread_name_prefix="wardrobe-ingestion"
+)
+
+INGESTION_SPOOL_BYTES = int(os.getenv("INGESTION_SPOOL_BYTES", str(1024 * 1024)))
+
+
+def submit_ingestion_job(user_id, name, image_file):
+    """
+    Stores a queued job and hands the upload over to the worker pool.
+    The file is copied because the request stream is closed once the
+    response is sent; copies larger than INGESTION_SPOOL_BYTES go to disk.
+    """
+    image_file.seek(0)
+    image_stream = tempfile.SpooledTemporaryFile(max_size=INGESTION_SPOOL_BYTES)
+    shutil.copyfileobj(image_file, image_stream)
+
+    job = IngestionJobModel(
+        id=uuid.uuid4().hex,
+        name=name,
+        status="queued",
+        stages={stage: {"state": "pending", "seconds": None} for stage in STAGE_NAMES},
+        user_id=user_id
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    executor.submit(run_ingestion_job, app, job.id, image_stream)
+
+    return job
+
+
+def failed_stages(stages, last_stage):
+    """
+    Stage states once the pipeline has failed: no stage is left "running".
+    The last stage started failed if it never finished; stages running beside
+    it (the upload) are "cancelled". If it did finish, the failure came from
+    a stage still running in the background, which is marked failed instead.
+    """
+    failed = last_stage if stages.get(last_stage, {}).get("state") == "running" else None
+    return {
+        stage: {"state": "failed" if failed in (None, stage) else "cancelled", "seconds": None}
+        if value["state"] == "running" else value
+        for stage, value in stages.items()
+    }
+
+
+def run_ingestion_job(app, job_id, image_stream):
+    with app.app_context():
+        job = IngestionJobModel.query.get(job_id)
+        job.status = "running"
+        db.session.commit()
+
+        def on_stage(stage, state, seconds):
+            job.stage = stage
+            job.stages = {**job.stages, stage: {"state": state, "seconds": seconds}}
+            db.session.commit()
+
+        fields = None
+        try:
+            fields = run_pipeline(image_stream, job.user_id, on_stage=on_stage)
+
+            wardrobe_item = WardrobeItemsModel(name=job.name, user_id=job.user_id, **fields)
+            db.session.add(wardrobe_item)
+            db.session.flush()
+            index_item(wardrobe_item)
+
+            job.wardrobe_item_id = wardrobe_item.id
+            job.status = "succeeded"
+            bump_collection_version(job.user_id, "wardrobe")
+            with stage_timer("commit"):
+                db.session.commit()
+
+        except Exception as e:
+            traceback.print_exc()
+            db.session.rollback()
+            if fields:
+                schedule_delete(fields["public_id"])
+
+            job = IngestionJobModel.query.get(job_id)
+            job.stages = failed_stages(job.stages, job.stage)
+            job.status = "failed"
+            job.error = str(e)
+            db.session.commit()
+
+        finally:
+            image_stream.close()
+            db.session.remove()
@@ -0,0 +1,34 @@
+import hmac
+import ipaddress
+import os
+
+from flask import current_app, request
+from flask_smorest import abort
+
+# Token for /internal/* and /metrics, sent as "X-Internal-Token" or "Authorization: Bearer <token>";
+# without it only loopback callers are allowed, and only when no proxy is trusted
+INTERNAL_STATS_TOKEN = os.getenv("INTERNAL_STATS_TOKEN")
+
+
+def require_internal_access():
+    if INTERNAL_STATS_TOKEN:
+        token = request.headers.get("X-Internal-Token", "")
+        if not token and request.headers.get("Authorization", "").startswith("Bearer "):
+            token = request.headers["Authorization"][len("Bearer "):]
+        if hmac.compare_digest(token.encode(), INTERNAL_STATS_TOKEN.encode()):
+            return
+        abort(403, message="Invalid internal token.")
+
+    if current_app.config.get("TRUSTED_PROXY_COUNT"):
+        # Behind a proxy the address is taken from X-Forwarded-For, and the proxy itself is often on loopback
+        abort(403, message="Internal endpoints require INTERNAL_STATS_TOKEN behind a proxy.")
+
+    # The socket peer, never an address rewritten from X-Forwarded-For
+    remote_addr = request.environ.get("werkzeug.proxy_fix.orig", request.environ).get("REMOTE_ADDR")
+    try:
+        is_loopback = ipaddress.ip_address(remote_addr or "").is_loopback
+    except ValueError:
+        is_loopback = False
+
+    if not is_loopback:
+        abort(403, message="Internal endpoints are only reachable from localhost.")
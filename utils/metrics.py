@@ -0,0 +1,180 @@
+"""
+Prometheus metrics for requests, the wardrobe ingestion stages, the processed
+image cache, the outbound mail queue and SQL queries.
+
+Under gunicorn set PROMETHEUS_MULTIPROC_DIR to an empty directory shared by the
+workers; every worker then writes its samples there and /metrics aggregates
+them, whichever worker serves the scrape.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from flask import g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+SQL_STATEMENT_TYPES = {"SELECT", "INSERT", "UPDATE", "DELETE", "BEGIN", "COMMIT", "ROLLBACK"}
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling a request",
+    ["method", "endpoint"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+REQUEST_COUNT = Counter(
+    "http_requests_total",
+    "Requests handled, by response status",
+    ["method", "endpoint", "status"],
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requests currently being handled",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+
+PIPELINE_STAGE_SECONDS = Histogram(
+    "wardrobe_pipeline_stage_seconds",
+    "Time spent in each wardrobe ingestion stage",
+    ["stage"],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+PIPELINE_STAGE_FAILURES = Counter(
+    "wardrobe_pipeline_stage_failures_total",
+    "Wardrobe ingestion stages that raised",
+    ["stage"],
+)
+
+PREDICTION_REQUESTS = Counter(
+    "prediction_requests_total",
+    "Calls to the attire prediction service, by outcome",
+    ["outcome"],
+)
+
+IMAGE_CACHE_REQUESTS = Counter(
+    "image_cache_requests_total",
+    "Processed image cache lookups, by hit or miss",
+    ["result"],
+)
+
+MAIL_QUEUE_DEPTH = Gauge(
+    "mail_queue_depth",
+    "Emails waiting in the outbound mail queue",
+    multiprocess_mode="livesum",
+)
+MAIL_SEND_SECONDS = Histogram(
+    "mail_send_duration_seconds",
+    "Time spent handing one email to the SMTP server",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+MAIL_MESSAGES = Counter(
+    "mail_messages_total",
+    "Emails handled by the mail queue, by outcome",
+    ["outcome"],
+)
+
+SQL_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds",
+    "Time spent executing SQL statements",
+    ["statement"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1, 5),
+)
+SQL_QUERY_ERRORS = Counter(
+    "db_query_errors_total",
+    "SQL statements that raised",
+    ["statement"],
+)
+
+
+@contextmanager
+def stage_timer(stage):
+    # Only successful runs are timed, failures are counted separately
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        PIPELINE_STAGE_FAILURES.labels(stage=stage).inc()
+        raise
+    PIPELINE_STAGE_SECONDS.labels(stage=stage).observe(time.perf_counter() - started)
+
+
+def statement_type(statement):
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return verb if verb in SQL_STATEMENT_TYPES else "OTHER"
+
+
+def instrument_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        SQL_QUERY_SECONDS.labels(statement=statement_type(statement)).observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+        if started:
+            started.pop()
+        SQL_QUERY_ERRORS.labels(statement=statement_type(exception_context.statement or "")).inc()
+
+
+def init_app(app):
+    def endpoint_label():
+        # The URL rule rather than the path, so ids don't blow up the label set
+        return request.url_rule.rule if request.url_rule else "unmatched"
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+        g.metrics_recorded = False
+        REQUESTS_IN_PROGRESS.labels(method=request.method).inc()
+
+    @app.after_request
+    def record_request(response):
+        if "metrics_started" in g:
+            labels = {"method": request.method, "endpoint": endpoint_label()}
+            REQUEST_LATENCY.labels(**labels).observe(time.perf_counter() - g.metrics_started)
+            REQUEST_COUNT.labels(status=str(response.status_code), **labels).inc()
+            g.metrics_recorded = True
+        return response
+
+    @app.teardown_request
+    def finish_request(exc):
+        if "metrics_started" not in g:
+            return
+        REQUESTS_IN_PROGRESS.labels(method=request.method).dec()
+        # Unhandled exceptions skip after_request
+        if not g.metrics_recorded:
+            labels = {"method": request.method, "endpoint": endpoint_label()}
+            REQUEST_LATENCY.labels(**labels).observe(time.perf_counter() - g.metrics_started)
+            REQUEST_COUNT.labels(status="500", **labels).inc()
+
+
+def render_metrics():
+    """Returns (body, content type) for the /metrics endpoint."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid):
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,241 @@
+"""
+Object storage for uploaded images.
+
+The backend is picked with STORAGE_BACKEND:
+- "cloudinary" (default)
+- "local": files under STORAGE_LOCAL_DIR, served by the app on /media, for
+  tests and self-hosting
+
+Uploads run on a bounded thread pool (STORAGE_UPLOAD_WORKERS) that shares the
+backend's keep-alive connections. Deletions are queued and sent in bulk, at
+most STORAGE_DELETE_BATCH at a time and at least every
+STORAGE_DELETE_INTERVAL seconds; the queue is per process, so deletions still
+queued when a worker dies are left behind in storage.
+"""
+import atexit
+import glob
+import os
+import queue
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import cloudinary
+import cloudinary.api
+import cloudinary.uploader
+import cloudinary.utils
+from flask import send_from_directory
+from PIL import Image
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "cloudinary")
+STORAGE_LOCAL_DIR = os.getenv("STORAGE_LOCAL_DIR", os.path.join(os.getcwd(), "media"))
+STORAGE_LOCAL_URL = os.getenv("STORAGE_LOCAL_URL", "/media")
+
+STORAGE_UPLOAD_WORKERS = int(os.getenv("STORAGE_UPLOAD_WORKERS", "4"))
+STORAGE_UPLOAD_TIMEOUT = float(os.getenv("STORAGE_UPLOAD_TIMEOUT", "30"))
+# delete_resources accepts up to 100 public ids per call
+STORAGE_DELETE_BATCH = min(int(os.getenv("STORAGE_DELETE_BATCH", "100")), 100)
+STORAGE_DELETE_INTERVAL = float(os.getenv("STORAGE_DELETE_INTERVAL", "5"))
+STORAGE_DELETE_ATTEMPTS = int(os.getenv("STORAGE_DELETE_ATTEMPTS", "3"))
+
+StoredImage = namedtuple("StoredImage", ["url", "public_id"])
+
+
+class CloudinaryStorage:
+    name = "cloudinary"
+
+    def __init__(self, pool_size, timeout):
+        # Configure Cloudinary (use env variables in production)
+        cloudinary.config(
+            cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
+            api_key=os.getenv("CLOUDINARY_API_KEY"),
+            api_secret=os.getenv("CLOUDINARY_API_SECRET")
+        )
+        self.timeout = timeout
+
+        # The uploader keeps one connection per host by default; give every upload thread its own
+        cloudinary.uploader._http = cloudinary.utils.get_http_connector(
+            cloudinary.config(), {**cloudinary.CERT_KWARGS, "maxsize": pool_size}
+        )
+
+    def upload(self, image_file, folder, filename, overwrite):
+        result = cloudinary.uploader.upload(
+            image_file,
+            folder=folder,
+            public_id=filename,
+            overwrite=overwrite,
+            resource_type="image",
+            timeout=self.timeout,
+            transformation=[
+                {"quality": "auto", "fetch_format": "auto", "crop": "limit", "width": 400, "height": 400}
+            ]
+        )
+        return StoredImage(result.get("secure_url"), result.get("public_id"))
+
+    def delete_many(self, public_ids):
+        cloudinary.api.delete_resources(public_ids, resource_type="image", timeout=self.timeout)
+
+
+class LocalStorage:
+    name = "local"
+
+    def __init__(self, root, base_url):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    def upload(self, image_file, folder, filename, overwrite):
+        public_id = f"{folder}/{filename}"
+        directory = os.path.join(self.root, folder)
+        os.makedirs(directory, exist_ok=True)
+
+        image_file.seek(0)
+        try:
+            extension = (Image.open(image_file).format or "bin").lower()
+        except OSError:
+            extension = "bin"
+        image_file.seek(0)
+
+        path = os.path.join(directory, f"{filename}.{extension}")
+        if not overwrite and glob.glob(os.path.join(glob.escape(directory), glob.escape(filename) + ".*")):
+            raise FileExistsError(f"{public_id} already exists.")
+
+        # Write next to the target and rename, so readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                for chunk in iter(lambda: image_file.read(1024 * 1024), b""):
+                    temp_file.write(chunk)
+            if overwrite:
+                self.delete_many([public_id])
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return StoredImage(f"{self.base_url}/{public_id}.{extension}", public_id)
+
+    def delete_many(self, public_ids):
+        for public_id in public_ids:
+            for path in glob.glob(os.path.join(glob.escape(os.path.join(self.root, public_id)) + ".*")):
+                if not path.endswith(".tmp"):
+                    os.remove(path)
+
+
+class DeleteQueue:
+    """Collects public ids on a background thread and deletes them in batches."""
+
+    def __init__(self, storage, batch_size, interval, attempts):
+        self.storage = storage
+        self.batch_size = batch_size
+        self.interval = interval
+        self.attempts = attempts
+        self.pending = queue.Queue()
+        self.worker_pid = None
+        self.lock = threading.Lock()
+
+    def put(self, public_id):
+        self.ensure_worker()
+        self.pending.put((public_id, 1))
+
+    def ensure_worker(self):
+        # Started lazily so each gunicorn worker gets its own thread
+        if self.worker_pid == os.getpid():
+            return
+        with self.lock:
+            if self.worker_pid != os.getpid():
+                self.pending = queue.Queue()
+                threading.Thread(target=self.loop, name="storage-delete", daemon=True).start()
+                self.worker_pid = os.getpid()
+
+    def take_batch(self, wait, limit):
+        batch = []
+        deadline = time.monotonic() + wait
+        while len(batch) < limit:
+            timeout = deadline - time.monotonic()
+            try:
+                batch.append(self.pending.get(timeout=timeout) if timeout > 0 else self.pending.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self, batch):
+        try:
+            self.storage.delete_many([public_id for public_id, _ in batch])
+        except Exception:
+            traceback.print_exc()
+            for public_id, attempt in batch:
+                if attempt < self.attempts:
+                    self.pending.put((public_id, attempt + 1))
+                else:
+                    print(f"Warning: Giving up deleting stored image {public_id}")
+
+    def loop(self):
+        while True:
+            # Block for the first id, then give others until the interval ends to join the batch
+            first = self.pending.get()
+            batch = [first] + self.take_batch(self.interval, self.batch_size - 1)
+            self.flush(batch)
+
+    def drain(self):
+        # Flushes what is still queued in this process, used at exit
+        if self.worker_pid != os.getpid():
+            return
+        while True:
+            batch = self.take_batch(0, self.batch_size)
+            if not batch:
+                return
+            self.flush([(public_id, self.attempts) for public_id, _ in batch])
+
+
+def build_storage(name):
+    if name == "cloudinary":
+        return CloudinaryStorage(STORAGE_UPLOAD_WORKERS, STORAGE_UPLOAD_TIMEOUT)
+    if name == "local":
+        return LocalStorage(STORAGE_LOCAL_DIR, STORAGE_LOCAL_URL)
+    raise ValueError(f"Unknown storage backend: {name}")
+
+
+storage = build_storage(STORAGE_BACKEND)
+upload_executor = ThreadPoolExecutor(max_workers=STORAGE_UPLOAD_WORKERS, thread_name_prefix="storage-upload")
+delete_queue = DeleteQueue(storage, STORAGE_DELETE_BATCH, STORAGE_DELETE_INTERVAL, STORAGE_DELETE_ATTEMPTS)
+atexit.register(delete_queue.drain)
+
+
+def upload_image(image_file, user_id, subfolder="profile", is_unique=False):
+    """
+    Uploads an image and returns its StoredImage (url, public_id).
+    - Profile: overwrites old image
+    - Attire: adds a new image with a unique name
+    """
+    try:
+        folder = f"gyencha/{user_id}/{subfolder}"
+
+        if is_unique:
+            timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+            unique_id = uuid.uuid4().hex[:8]
+            return storage.upload(image_file, folder, f"{timestamp}_{unique_id}", overwrite=False)
+
+        return storage.upload(image_file, folder, "profile_img", overwrite=True)
+
+    except Exception as e:
+        raise Exception(f"Image upload failed: {str(e)}")
+
+
+def schedule_delete(public_id):
+    if public_id:
+        delete_queue.put(public_id)
+
+
+def init_app(app):
+    if storage.name != "local":
+        return
+
+    @app.route(f"{STORAGE_LOCAL_URL.rstrip('/')}/<path:filename>")
+    def media(filename):
+        return send_from_directory(STORAGE_LOCAL_DIR, filename, max_age=86400)
@@ -0,0 +1,248 @@
+"""
+Precomputed outfit candidates.
+
+For every wardrobe item, the OUTFIT_CANDIDATES_PER_TYPE best matching items of
+each other type (lowest pair cost, see utils/outfit_scoring.py) are stored in
+outfit_candidates, so a recommendation only has to score the outfits made of
+an item and its candidates. The index only depends on the user's wardrobe.
+
+A wardrobe is indexed as a whole by rebuild_user_index(), which also sets
+UserModel.outfit_index_built; ensure_user_index() does that for wardrobes
+that aren't indexed yet (e.g. from before the index existed) the first time
+the index is read. After that it is updated incrementally: index_item() when
+an item is added, unindex_item() before one is deleted. Both skip wardrobes
+that aren't indexed, the rebuild will pick their items up.
+'flask outfit-index rebuild' recomputes every wardrobe from scratch.
+
+OUTFIT_CANDIDATES_PER_TYPE=0 disables the index: nothing is built or
+maintained, and the candidate of each type is the item with the nearest hue,
+looked up when it is needed. Run the rebuild after enabling it again, the
+wardrobes indexed before weren't kept up to date in the meantime.
+"""
+import os
+from collections import defaultdict
+
+import click
+import numpy as np
+from flask.cli import AppGroup
+from sqlalchemy.orm import joinedload
+
+from db import db
+from models import OutfitCandidateModel, UserModel, WardrobeItemsModel
+from utils.outfit_scoring import ITEM_TYPES, WardrobeArrays, pair_costs
+from utils.outfits_recommendation import get_closest_item_by_hue
+
+OUTFIT_CANDIDATES_PER_TYPE = int(os.getenv("OUTFIT_CANDIDATES_PER_TYPE", "5"))
+
+
+def distances(item, candidates):
+    """Pair cost (see utils/outfit_scoring.py) between item and each candidate."""
+    wardrobe = WardrobeArrays.from_items([item] + list(candidates))
+    return pair_costs(wardrobe, [0], np.arange(1, len(wardrobe)))[0].tolist()
+
+
+def rank_key(distance, candidate_id):
+    # Ties go to the oldest item
+    return distance, candidate_id
+
+
+def indexable_items(user_id, item_types=ITEM_TYPES):
+    return WardrobeItemsModel.query.filter(
+        WardrobeItemsModel.user_id == user_id,
+        WardrobeItemsModel.type.in_(item_types),
+        WardrobeItemsModel.hue.isnot(None)
+    ).order_by(WardrobeItemsModel.id).all()
+
+
+def candidate_row(item, candidate_id, candidate_type, distance):
+    return OutfitCandidateModel(
+        user_id=item.user_id,
+        item_id=item.id,
+        candidate_id=candidate_id,
+        candidate_type=candidate_type,
+        distance=distance
+    )
+
+
+def candidate_rows(item, candidates, limit):
+    scored = sorted(
+        zip(distances(item, candidates), (candidate.id for candidate in candidates)),
+        key=lambda scored_candidate: rank_key(*scored_candidate)
+    )
+    return [
+        candidate_row(item, candidate_id, candidates[0].type, distance)
+        for distance, candidate_id in scored[:limit]
+    ]
+
+
+def is_user_indexed(user_id):
+    # Locks the user row until the end of the transaction (on databases that support it),
+    # so an item can't be indexed against a wardrobe that is being rebuilt
+    return bool(db.session.query(UserModel.outfit_index_built).filter_by(id=user_id).with_for_update().scalar())
+
+
+def index_item(item):
+    """
+    Adds a new item to its user's index: its own candidate lists, and itself
+    to the lists of other items it is now among the nearest for.
+    The item must be flushed (have an id); nothing is committed.
+    """
+    if item.hue is None or not OUTFIT_CANDIDATES_PER_TYPE or not is_user_indexed(item.user_id):
+        return
+
+    limit = OUTFIT_CANDIDATES_PER_TYPE
+    other_items = [other for other in indexable_items(item.user_id) if other.id != item.id and other.type != item.type]
+
+    by_type = defaultdict(list)
+    for other in other_items:
+        by_type[other.type].append(other)
+    for candidates in by_type.values():
+        db.session.add_all(candidate_rows(item, candidates, limit))
+
+    # Lists of the other items that hold candidates of this item's type
+    current = defaultdict(list)
+    if other_items:
+        for row in OutfitCandidateModel.query.filter(
+            OutfitCandidateModel.item_id.in_([other.id for other in other_items]),
+            OutfitCandidateModel.candidate_type == item.type
+        ):
+            current[row.item_id].append(row)
+
+    # The pair cost is symmetric
+    for other, distance in zip(other_items, distances(item, other_items)):
+        rows = current[other.id]
+        if len(rows) >= limit:
+            worst = max(rows, key=lambda row: rank_key(row.distance, row.candidate_id))
+            if rank_key(distance, item.id) >= rank_key(worst.distance, worst.candidate_id):
+                continue
+            db.session.delete(worst)
+        db.session.add(candidate_row(other, item.id, item.type, distance))
+
+
+def unindex_item(item):
+    """
+    Removes an item that is about to be deleted from its user's index; the
+    lists it was part of get their next nearest candidate instead.
+    Nothing is committed.
+    """
+    if not is_user_indexed(item.user_id):
+        return
+
+    OutfitCandidateModel.query.filter_by(item_id=item.id).delete(synchronize_session=False)
+
+    affected = [
+        item_id for (item_id,) in db.session.query(OutfitCandidateModel.item_id).filter_by(candidate_id=item.id)
+    ]
+    OutfitCandidateModel.query.filter_by(candidate_id=item.id).delete(synchronize_session=False)
+    if not affected or not OUTFIT_CANDIDATES_PER_TYPE:
+        return
+
+    replacements = [candidate for candidate in indexable_items(item.user_id, [item.type]) if candidate.id != item.id]
+    remaining = defaultdict(set)
+    for row in OutfitCandidateModel.query.filter(
+        OutfitCandidateModel.item_id.in_(affected),
+        OutfitCandidateModel.candidate_type == item.type
+    ):
+        remaining[row.item_id].add(row.candidate_id)
+
+    for affected_item in WardrobeItemsModel.query.filter(WardrobeItemsModel.id.in_(affected)):
+        candidates = [candidate for candidate in replacements if candidate.id not in remaining[affected_item.id]]
+        if candidates:
+            db.session.add_all(candidate_rows(affected_item, candidates, 1))
+
+
+def rebuild_user_index(user_id):
+    """Recomputes the user's whole index and marks it built; nothing is committed."""
+    # Updated first, so the user row is locked while the wardrobe is read
+    UserModel.query.filter_by(id=user_id).update({"outfit_index_built": True}, synchronize_session=False)
+    OutfitCandidateModel.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+
+    items = indexable_items(user_id)
+    wardrobe = WardrobeArrays.from_items(items)
+    positions = {item_type: wardrobe.positions(item_type) for item_type in ITEM_TYPES}
+
+    for item_type in ITEM_TYPES:
+        for candidate_type in ITEM_TYPES:
+            rows, cols = positions[item_type], positions[candidate_type]
+            if item_type == candidate_type or not len(rows) or not len(cols):
+                continue
+            costs = pair_costs(wardrobe, rows, cols)
+            # Items are in id order, so the stable sort breaks ties like rank_key
+            nearest = np.argsort(costs, axis=1, kind="stable")[:, :OUTFIT_CANDIDATES_PER_TYPE]
+            for row, position in enumerate(rows):
+                db.session.add_all(
+                    candidate_row(items[position], int(wardrobe.ids[cols[col]]), candidate_type, float(costs[row, col]))
+                    for col in nearest[row]
+                )
+
+
+def ensure_user_index(user_id):
+    """
+    Builds the user's index if it never was. Returns True when it did, the
+    caller commits. Don't infer this from an empty candidate list: a wardrobe
+    of a single type has none, and items of a wardrobe that isn't indexed yet
+    only get lists once it is.
+    """
+    if not OUTFIT_CANDIDATES_PER_TYPE or is_user_indexed(user_id):
+        return False
+    rebuild_user_index(user_id)
+    return True
+
+
+def get_candidates(item):
+    """Returns {type: [candidate items, nearest first]} for the other types."""
+    if not OUTFIT_CANDIDATES_PER_TYPE:
+        candidates = defaultdict(list)
+        for item_type in ITEM_TYPES:
+            closest = get_closest_item_by_hue(item.hue, item.user_id, item_type) if item_type != item.type else None
+            if closest:
+                candidates[item_type].append(closest)
+        return candidates
+
+    rows = OutfitCandidateModel.query.options(
+        joinedload(OutfitCandidateModel.candidate, innerjoin=True)
+    ).filter_by(item_id=item.id).order_by(
+        OutfitCandidateModel.candidate_type,
+        OutfitCandidateModel.distance,
+        OutfitCandidateModel.candidate_id
+    ).all()
+
+    candidates = defaultdict(list)
+    for row in rows:
+        candidates[row.candidate_type].append(row.candidate)
+    return candidates
+
+
+def nearest_hue_candidates(wardrobe):
+    """
+    {item id: [candidate ids]} of a whole wardrobe with the index disabled,
+    the same items get_candidates looks up one at a time.
+    """
+    candidates = defaultdict(list)
+    for item_type in ITEM_TYPES:
+        positions = wardrobe.positions(item_type)
+        if not len(positions):
+            continue
+        difference = np.abs(wardrobe.hue[:, None] - wardrobe.hue[positions][None, :])
+        difference = np.minimum(difference, 360 - difference)
+        # Items are in id order, argmin picks the oldest of the equally near ones
+        nearest = positions[np.argmin(difference, axis=1)]
+        for position in np.flatnonzero(wardrobe.types != ITEM_TYPES.index(item_type)):
+            candidates[int(wardrobe.ids[position])].append(int(wardrobe.ids[nearest[position]]))
+    return candidates
+
+
+cli = AppGroup("outfit-index", help="Manage the precomputed outfit candidates.")
+
+
+@cli.command("rebuild")
+@click.option("--user-id", type=int, help="Only rebuild this user's index.")
+def rebuild_command(user_id):
+    """Recompute the outfit candidates from the wardrobes."""
+    user_ids = [user_id] if user_id else [user_id for (user_id,) in db.session.query(UserModel.id)]
+    for index, rebuilt_user_id in enumerate(user_ids, start=1):
+        rebuild_user_index(rebuilt_user_id)
+        db.session.commit()
+        if index % 100 == 0:
+            click.echo(f"Rebuilt {index}/{len(user_ids)} users")
+    click.echo(f"Rebuilt the outfit index of {len(user_ids)} user(s).")
@@ -0,0 +1,107 @@
+"""
+Generates outfits for a whole wardrobe at once.
+
+Every item gets the same outfits RecommendOutfit would suggest for it, ranked
+from the outfit candidate index. The candidate rows and the user's existing
+outfits are loaded with one query each, duplicates are dropped in memory and
+the new outfits are written with one bulk insert per OUTFIT_INSERT_CHUNK rows.
+"""
+import os
+from collections import defaultdict
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+
+from db import db
+from models import OutfitCandidateModel, OutfitsModel
+from utils.outfit_candidates import (
+    OUTFIT_CANDIDATES_PER_TYPE, ensure_user_index, indexable_items, nearest_hue_candidates
+)
+from utils.outfit_scoring import WardrobeArrays, top_outfits
+
+# Rows per INSERT statement, 5 parameters each stays under SQLite's 32766 limit
+OUTFIT_INSERT_CHUNK = int(os.getenv("OUTFIT_INSERT_CHUNK", "1000"))
+
+
+def insert_ignoring_duplicates(rows):
+    """
+    Inserts outfit rows, skipping those the unique combination index rejects.
+    Returns how many were inserted.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        statement = postgresql.insert(OutfitsModel).on_conflict_do_nothing()
+    elif dialect == "sqlite":
+        statement = sqlite.insert(OutfitsModel).on_conflict_do_nothing()
+    else:
+        # No portable ON CONFLICT, the rows are already deduplicated against the table
+        statement = insert(OutfitsModel)
+
+    inserted = 0
+    for start in range(0, len(rows), OUTFIT_INSERT_CHUNK):
+        result = db.session.execute(statement.values(rows[start:start + OUTFIT_INSERT_CHUNK]))
+        inserted += result.rowcount
+    return inserted
+
+
+def load_candidate_rows(user_id):
+    # In the order get_candidates returns them
+    return db.session.query(
+        OutfitCandidateModel.item_id, OutfitCandidateModel.candidate_id
+    ).filter_by(user_id=user_id).order_by(
+        OutfitCandidateModel.item_id,
+        OutfitCandidateModel.candidate_type,
+        OutfitCandidateModel.distance,
+        OutfitCandidateModel.candidate_id
+    ).all()
+
+
+def generate_outfits(user_id, item_type=None, per_item=1):
+    """
+    Picks the per_item best outfits of every item (of item_type, if given)
+    and inserts the new ones. Returns a summary; nothing is committed.
+    """
+    items = indexable_items(user_id)
+    if not items:
+        return {"items": 0, "generated": 0, "created": 0, "existing": 0}
+
+    wardrobe = WardrobeArrays.from_items(items)
+
+    if OUTFIT_CANDIDATES_PER_TYPE:
+        if ensure_user_index(user_id):
+            db.session.flush()
+        candidates = defaultdict(list)
+        for item_id, candidate_id in load_candidate_rows(user_id):
+            candidates[item_id].append(candidate_id)
+    else:
+        candidates = nearest_hue_candidates(wardrobe)
+
+    position_of = {item.id: position for position, item in enumerate(items)}
+
+    anchors = [item for item in items if item_type in (None, item.type)]
+    generated = []
+    for item in anchors:
+        # Same items in the same order as RecommendOutfit, so ties are broken the same way
+        positions = [position_of[item.id]] + [position_of[candidate_id] for candidate_id in candidates[item.id]]
+        ranked = top_outfits(wardrobe.subset(np.array(positions)), k=per_item, anchor=item.id)
+        generated.extend((outfit.kira_id, outfit.tego_id, outfit.wonju_id) for outfit in ranked)
+
+    existing = set(map(tuple, db.session.query(
+        OutfitsModel.kira_id, OutfitsModel.tego_id, OutfitsModel.wonju_id
+    ).filter_by(user_id=user_id)))
+    # dict.fromkeys keeps the first occurrence and the order
+    new = [combination for combination in dict.fromkeys(generated) if combination not in existing]
+
+    rows = [
+        {"user_id": user_id, "kira_id": kira_id, "tego_id": tego_id, "wonju_id": wonju_id, "favorite": False}
+        for kira_id, tego_id, wonju_id in new
+    ]
+    created = insert_ignoring_duplicates(rows) if rows else 0
+
+    return {
+        "items": len(anchors),
+        "generated": len(set(generated)),
+        "created": created,
+        "existing": len(set(generated)) - created,
+    }
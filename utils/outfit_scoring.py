@@ -0,0 +1,245 @@
+"""
+Outfit scoring on NumPy arrays.
+
+A wardrobe is loaded once into WardrobeArrays (type code, HSL and CIE Lab of
+every item's dominant color), then whole sets of pairs and outfits are scored
+at once. The cost of a pair of items is a weighted sum (OUTFIT_SCORE_WEIGHTS)
+of three criteria, each in [0, 1]:
+- hue: how far the hue difference is from the harmony model's targets
+- saturation: the difference in HSL saturation
+- lightness: the difference in Lab lightness, which unlike HSL lightness is
+  perceptually uniform
+The cost of an outfit is the sum of its three pairs; lower is better.
+
+Harmony models (OUTFIT_HARMONY):
+- "analogous" (default): close hues match
+- "complementary": close or opposite hues match
+- "neutral": analogous, but neutral items (Lab chroma below
+  OUTFIT_NEUTRAL_CHROMA: greys, black, white, beige) go with any hue
+
+The outfit candidate index is ranked with this pair cost, rebuild it with
+'flask outfit-index rebuild' after changing the model or the weights.
+"""
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from utils.outfits_recommendation import hex_to_hsl
+
+ITEM_TYPES = ("kira", "tego", "wonju")
+
+OUTFIT_HARMONY = os.getenv("OUTFIT_HARMONY", "analogous")
+# hue, saturation, lightness
+OUTFIT_SCORE_WEIGHTS = tuple(float(value) for value in os.getenv("OUTFIT_SCORE_WEIGHTS", "1,0.3,0.3").split(","))
+OUTFIT_NEUTRAL_CHROMA = float(os.getenv("OUTFIT_NEUTRAL_CHROMA", "12"))
+# Outfits scored at a time in a full search, bounds the temporary arrays
+OUTFIT_SCORE_BLOCK = int(os.getenv("OUTFIT_SCORE_BLOCK", "1000000"))
+# Items of each type whose outfits are scored first to bound the k-th best cost (see prune), 0 disables pruning
+OUTFIT_PRUNE_SEED = int(os.getenv("OUTFIT_PRUNE_SEED", "16"))
+
+# targets: hue differences in degrees that cost nothing; hue_range: largest distance to a target
+HarmonyModel = namedtuple("HarmonyModel", ["name", "targets", "hue_range", "neutral_tolerant", "weights"])
+
+HARMONY_MODELS = {
+    "analogous": ((0,), 180, False),
+    "complementary": ((0, 180), 90, False),
+    "neutral": ((0,), 180, True),
+}
+
+RankedOutfit = namedtuple("RankedOutfit", ["cost", "kira_id", "tego_id", "wonju_id"])
+
+# sRGB (D65) to CIE XYZ, and the D65 white point
+RGB_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+])
+WHITE_POINT = np.array([0.95047, 1.0, 1.08883])
+
+
+def get_harmony_model(name=None, weights=None):
+    name = name or OUTFIT_HARMONY
+    if name not in HARMONY_MODELS:
+        raise ValueError(f"Unknown harmony model: {name}")
+    targets, hue_range, neutral_tolerant = HARMONY_MODELS[name]
+    return HarmonyModel(name, targets, hue_range, neutral_tolerant, tuple(weights or OUTFIT_SCORE_WEIGHTS))
+
+
+def hex_to_rgb(colors):
+    """(n, 3) array of sRGB values in [0, 1] from '#rrggbb' strings."""
+    values = np.array([int(color.lstrip("#")[:6], 16) for color in colors], dtype=np.int64)
+    return np.stack([(values >> 16) & 255, (values >> 8) & 255, values & 255], axis=1) / 255.0
+
+
+def rgb_to_lab(rgb):
+    linear = np.where(rgb > 0.04045, ((rgb + 0.055) / 1.055) ** 2.4, rgb / 12.92)
+    xyz = linear @ RGB_TO_XYZ.T / WHITE_POINT
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    return np.stack([116 * f[:, 1] - 16, 500 * (f[:, 0] - f[:, 1]), 200 * (f[:, 1] - f[:, 2])], axis=1)
+
+
+class WardrobeArrays:
+    """The colors of a set of wardrobe items, one row per item."""
+
+    def __init__(self, ids, types, colors, hsl=None):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.types = np.array([ITEM_TYPES.index(item_type) for item_type in types], dtype=np.int8)
+
+        if hsl is None:
+            hsl = [hex_to_hsl(color) for color in colors]
+        hsl = np.asarray(hsl, dtype=np.float64).reshape(-1, 3)
+        self.hue = hsl[:, 0]
+        self.saturation = hsl[:, 1]
+
+        lab = rgb_to_lab(hex_to_rgb(colors)) if len(colors) else np.empty((0, 3))
+        self.lightness = lab[:, 0] / 100
+        self.neutral = np.hypot(lab[:, 1], lab[:, 2]) < OUTFIT_NEUTRAL_CHROMA
+
+    @classmethod
+    def from_items(cls, items):
+        hsl = [
+            (item.hue, item.saturation, item.lightness)
+            if item.saturation is not None and item.lightness is not None else hex_to_hsl(item.color)
+            for item in items
+        ]
+        return cls([item.id for item in items], [item.type for item in items], [item.color for item in items], hsl)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def subset(self, positions):
+        subset = WardrobeArrays.__new__(WardrobeArrays)
+        for name in ("ids", "types", "hue", "saturation", "lightness", "neutral"):
+            setattr(subset, name, getattr(self, name)[positions])
+        return subset
+
+    def positions(self, item_type):
+        return np.flatnonzero(self.types == ITEM_TYPES.index(item_type))
+
+
+def pair_costs(wardrobe, rows, cols, model=None):
+    """(len(rows), len(cols)) costs between the items at the given positions."""
+    model = model or get_harmony_model()
+    hue_weight, saturation_weight, lightness_weight = model.weights
+
+    difference = np.abs(wardrobe.hue[rows][:, None] - wardrobe.hue[cols][None, :])
+    difference = np.minimum(difference, 360 - difference)
+    hue_cost = np.abs(difference - model.targets[0])
+    for target in model.targets[1:]:
+        hue_cost = np.minimum(hue_cost, np.abs(difference - target))
+    hue_cost /= model.hue_range
+    if model.neutral_tolerant:
+        neutral = wardrobe.neutral[rows][:, None] | wardrobe.neutral[cols][None, :]
+        hue_cost = np.where(neutral, 0.0, hue_cost)
+
+    saturation_cost = np.abs(wardrobe.saturation[rows][:, None] - wardrobe.saturation[cols][None, :])
+    lightness_cost = np.abs(wardrobe.lightness[rows][:, None] - wardrobe.lightness[cols][None, :])
+
+    return hue_weight * hue_cost + saturation_weight * saturation_cost + lightness_weight * lightness_cost
+
+
+def smallest(costs, k):
+    """Flat indices of the k smallest costs, smallest first, ties by position."""
+    costs = costs.ravel()
+    if k < costs.size:
+        # Keep everything tied with the k-th cost, so ties are broken the same way however costs are split
+        threshold = np.partition(costs, k - 1)[k - 1]
+        candidates = np.flatnonzero(costs <= threshold)
+    else:
+        candidates = np.arange(costs.size)
+    return candidates[np.argsort(costs[candidates], kind="stable")][:k]
+
+
+def prune(kira_tego, kira_wonju, tego_wonju, k, seed=None):
+    """
+    The positions (into each type's pair cost axis) of the items that can be
+    part of the k best outfits, or None when every item has to be kept.
+
+    Each item gets a lower bound on the cost of its best outfit from the pair
+    costs alone, the seed best items of each type by that bound are scored
+    together, and the k-th best of those outfits bounds the k-th best overall:
+    an item whose lower bound is above it can't be in the result.
+    """
+    seed = OUTFIT_PRUNE_SEED if seed is None else seed
+    sizes = kira_tego.shape + kira_wonju.shape[1:]
+    if not seed or all(size <= seed for size in sizes):
+        return None
+
+    # Cheapest pair of each item with each other type, then the cheapest outfit bound through either pair
+    kira_tego_min, tego_kira_min = kira_tego.min(axis=1), kira_tego.min(axis=0)
+    kira_wonju_min, wonju_kira_min = kira_wonju.min(axis=1), kira_wonju.min(axis=0)
+    tego_wonju_min, wonju_tego_min = tego_wonju.min(axis=1), tego_wonju.min(axis=0)
+    bounds = (
+        np.maximum((kira_tego + tego_wonju_min).min(axis=1) + kira_wonju_min,
+                   (kira_wonju + wonju_tego_min).min(axis=1) + kira_tego_min),
+        np.maximum((kira_tego + kira_wonju_min[:, None]).min(axis=0) + tego_wonju_min,
+                   (tego_wonju + wonju_kira_min).min(axis=1) + tego_kira_min),
+        np.maximum((kira_wonju + kira_tego_min[:, None]).min(axis=0) + wonju_tego_min,
+                   (tego_wonju + tego_kira_min[:, None]).min(axis=0) + wonju_kira_min),
+    )
+
+    kira, tego, wonju = (np.sort(np.argsort(bound, kind="stable")[:seed]) for bound in bounds)
+    if len(kira) * len(tego) * len(wonju) < k:
+        return None
+    costs = (kira_tego[np.ix_(kira, tego)][:, :, None] + kira_wonju[np.ix_(kira, wonju)][:, None, :]
+             + tego_wonju[np.ix_(tego, wonju)][None, :, :])
+    threshold = np.partition(costs.ravel(), k - 1)[k - 1]
+
+    # The bounds add the same costs in another order, leave room for the rounding
+    return [np.flatnonzero(bound <= threshold + 1e-9) for bound in bounds]
+
+
+def top_outfits(wardrobe, k=10, anchor=None, model=None):
+    """
+    The k lowest cost kira/tego/wonju combinations of the wardrobe, as
+    RankedOutfit, best first. With anchor (an item id) only the outfits
+    containing that item are scored. Items that can't be part of the k best
+    are pruned first, so a full search of a large wardrobe only scores the
+    combinations of a few items of each type.
+    """
+    model = model or get_harmony_model()
+    positions = {item_type: wardrobe.positions(item_type) for item_type in ITEM_TYPES}
+
+    if anchor is not None:
+        anchor_position = int(np.flatnonzero(wardrobe.ids == anchor)[0])
+        positions[ITEM_TYPES[wardrobe.types[anchor_position]]] = np.array([anchor_position])
+
+    kira, tego, wonju = (positions[item_type] for item_type in ITEM_TYPES)
+    if k <= 0 or not (len(kira) and len(tego) and len(wonju)):
+        return []
+
+    kira_tego = pair_costs(wardrobe, kira, tego, model)
+    kira_wonju = pair_costs(wardrobe, kira, wonju, model)
+    tego_wonju = pair_costs(wardrobe, tego, wonju, model)
+
+    # Only score the items that can still make the k best, in the same order so ties are broken the same way
+    kept = prune(kira_tego, kira_wonju, tego_wonju, k)
+    if kept is not None:
+        kept_kira, kept_tego, kept_wonju = kept
+        kira, tego, wonju = kira[kept_kira], tego[kept_tego], wonju[kept_wonju]
+        kira_tego = kira_tego[np.ix_(kept_kira, kept_tego)]
+        kira_wonju = kira_wonju[np.ix_(kept_kira, kept_wonju)]
+        tego_wonju = tego_wonju[np.ix_(kept_tego, kept_wonju)]
+
+    # Score blocks of kira against every tego x wonju and keep the k best of each block
+    block = max(1, OUTFIT_SCORE_BLOCK // (len(tego) * len(wonju)))
+    best_costs, best_outfits = [], []
+    for start in range(0, len(kira), block):
+        stop = min(start + block, len(kira))
+        costs = (kira_tego[start:stop, :, None] + kira_wonju[start:stop, None, :]) + tego_wonju[None, :, :]
+        flat = smallest(costs, k)
+        best_costs.append(costs.ravel()[flat])
+        best_outfits.append(np.stack(np.unravel_index(flat, costs.shape), axis=1) + [start, 0, 0])
+
+    costs = np.concatenate(best_costs)
+    outfits = np.concatenate(best_outfits)
+    return [
+        RankedOutfit(
+            float(costs[index]),
+            int(wardrobe.ids[kira[outfits[index, 0]]]),
+            int(wardrobe.ids[tego[outfits[index, 1]]]),
+            int(wardrobe.ids[wonju[outfits[index, 2]]]),
+        )
+        for index in smallest(costs, k)
+    ]
@@ -1,36 +1,53 @@
 # Convert hex color to HSL
 import colorsys
 
-import colorsys
+from sqlalchemy import select
+
+from db import db
+from models import WardrobeItemsModel
+
 def hex_to_hsl(hex_color):
     hex_color = hex_color.lstrip('#')
     r, g, b = tuple(int(hex_color[i:i+2], 16)/255.0 for i in (0, 2, 4))
     h, l, s = colorsys.rgb_to_hls(r, g, b)
     return (h * 360, s, l)  # Convert hue to degrees
 
+# Column values stored on WardrobeItemsModel at ingest time
+def hsl_columns(hex_color):
+    hue, saturation, lightness = hex_to_hsl(hex_color)
+    return {"hue": hue, "saturation": saturation, "lightness": lightness}
+
 # Return smallest difference between hues on the color wheel
 def hue_difference(hue1, hue2):
     diff = abs(hue1 - hue2)
     return min(diff, 360 - diff)
 
-# Get the most similar item by hue
-def get_closest_item_by_hue(base_hex, items):
-    try:
-        base_hue, _, _ = hex_to_hsl(base_hex)
-    except Exception:
+# Get the user's item of the given type with the most similar hue, ties to the oldest
+# Used by recommendations when the outfit candidate index is disabled (OUTFIT_CANDIDATES_PER_TYPE=0)
+def get_closest_item_by_hue(base_hue, user_id, item_type):
+    if base_hue is None:
         return None
 
-    closest_item = None
-    min_diff = float('inf')
+    hue = WardrobeItemsModel.hue
+    items = (WardrobeItemsModel.user_id == user_id, WardrobeItemsModel.type == item_type, hue.isnot(None))
+
+    # The nearest hue is the next one up or down the color wheel; each is a seek on the (user_id, type, hue)
+    # index, unlike ordering by the circular distance, which reads and sorts every item of the type
+    def seek(order, *conditions):
+        return select(hue).where(*items, *conditions).order_by(order).limit(1).scalar_subquery()
 
-    for item in items:
-        try:
-            hue, _, _ = hex_to_hsl(item.color)
-            diff = hue_difference(base_hue, hue)
-            if diff < min_diff:
-                min_diff = diff
-                closest_item = item
-        except Exception:
-            continue
+    neighbours = db.session.execute(select(
+        seek(hue, hue >= base_hue),
+        seek(hue.desc(), hue < base_hue),
+        # Lowest and highest hue, the next ones across 360 and 0
+        seek(hue),
+        seek(hue.desc()),
+    )).one()
+    hues = {value for value in neighbours if value is not None}
+    if not hues:
+        return None
 
-    return closest_item
\ No newline at end of file
+    closest = min(hue_difference(base_hue, value) for value in hues)
+    return WardrobeItemsModel.query.filter(
+        *items, hue.in_([value for value in hues if hue_difference(base_hue, value) == closest])
+    ).order_by(WardrobeItemsModel.id).first()
@@ -0,0 +1,58 @@
+import base64
+
+from flask import jsonify
+from flask_smorest import abort
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(last_id):
+    return base64.urlsafe_b64encode(f"id:{last_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        prefix, last_id = base64.urlsafe_b64decode(padded).decode().split(":", 1)
+        if prefix != "id":
+            raise ValueError
+        return int(last_id)
+    except ValueError:
+        abort(400, message="Invalid cursor.")
+
+
+def paginate_by_id(query, id_column, cursor=None, limit=None):
+    """
+    Keyset pagination on an increasing id column.
+    - Returns (items, next_cursor); next_cursor is None on the last page
+    - Without a limit every remaining row is returned
+    """
+    if cursor:
+        query = query.filter(id_column > decode_cursor(cursor))
+    query = query.order_by(id_column)
+
+    if not limit:
+        return query.all(), None
+
+    items = query.limit(limit + 1).all()
+    if len(items) > limit:
+        return items[:limit], encode_cursor(items[limit - 1].id)
+    return items, None
+
+
+def list_response(items, schema_class, next_cursor=None, only=None):
+    """
+    Builds a listing response with the next cursor in a header.
+    - only: comma separated field names for a sparse fieldset
+    """
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+
+    if not only:
+        return items, 200, headers
+
+    try:
+        schema = schema_class(many=True, only=[name.strip() for name in only.split(",") if name.strip()])
+    except ValueError:
+        abort(400, message=f"Invalid value for 'fields': {only}")
+
+    return jsonify(schema.dump(items)), 200, headers
@@ -0,0 +1,57 @@
+import os
+
+from passlib.context import CryptContext
+
+# New hashes use the first scheme; the others are still accepted and upgraded on login.
+# "argon2" needs argon2-cffi and "bcrypt" needs bcrypt installed.
+PASSWORD_SCHEMES = [scheme.strip() for scheme in os.getenv("PASSWORD_SCHEMES", "pbkdf2_sha256").split(",") if scheme.strip()]
+PASSWORD_PBKDF2_ROUNDS = int(os.getenv("PASSWORD_PBKDF2_ROUNDS", "29000"))
+PASSWORD_BCRYPT_ROUNDS = int(os.getenv("PASSWORD_BCRYPT_ROUNDS", "12"))
+PASSWORD_ARGON2_TIME_COST = int(os.getenv("PASSWORD_ARGON2_TIME_COST", "2"))
+PASSWORD_ARGON2_MEMORY_COST = int(os.getenv("PASSWORD_ARGON2_MEMORY_COST", "19456"))  # KiB
+PASSWORD_ARGON2_PARALLELISM = int(os.getenv("PASSWORD_ARGON2_PARALLELISM", "1"))
+
+
+def build_context(schemes, pbkdf2_rounds=PASSWORD_PBKDF2_ROUNDS, bcrypt_rounds=PASSWORD_BCRYPT_ROUNDS):
+    # Existing hashes are pbkdf2_sha256, so it always stays verifiable
+    if "pbkdf2_sha256" not in schemes:
+        schemes = schemes + ["pbkdf2_sha256"]
+
+    return CryptContext(
+        schemes=schemes,
+        default=schemes[0],
+        # every scheme but the default is deprecated, so its hashes get replaced on login
+        deprecated="auto",
+        # min_rounds makes hashes with fewer rounds than configured count as outdated too
+        pbkdf2_sha256__default_rounds=pbkdf2_rounds,
+        pbkdf2_sha256__min_rounds=pbkdf2_rounds,
+        bcrypt__default_rounds=bcrypt_rounds,
+        bcrypt__min_rounds=bcrypt_rounds,
+        argon2__time_cost=PASSWORD_ARGON2_TIME_COST,
+        argon2__memory_cost=PASSWORD_ARGON2_MEMORY_COST,
+        argon2__parallelism=PASSWORD_ARGON2_PARALLELISM,
+    )
+
+
+pwd_context = build_context(PASSWORD_SCHEMES)
+
+
+def hash_password(password):
+    return pwd_context.hash(password)
+
+
+def verify_password(password, password_hash):
+    if not password_hash:
+        return False
+    return pwd_context.verify(password, password_hash)
+
+
+def verify_and_update_password(password, password_hash):
+    """
+    Verifies the password against the stored hash.
+    Returns (valid, new_hash); new_hash is set when the stored hash uses an
+    outdated scheme or cost and should be replaced.
+    """
+    if not password_hash:
+        return False, None
+    return pwd_context.verify_and_update(password, password_hash)
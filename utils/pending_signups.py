@@ -0,0 +1,109 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.exc import IntegrityError
+
+from db import db
+from models import PendingSignupModel
+from utils.password_service import hash_password
+
+PENDING_SIGNUP_TTL = int(os.getenv("PENDING_SIGNUP_TTL", "600"))  # 10 min expiry
+PENDING_SIGNUP_MAX_PER_EMAIL = int(os.getenv("PENDING_SIGNUP_MAX_PER_EMAIL", "5"))
+PENDING_SIGNUP_MAX_TOTAL = int(os.getenv("PENDING_SIGNUP_MAX_TOTAL", "10000"))
+PENDING_SIGNUP_SWEEP_INTERVAL = int(os.getenv("PENDING_SIGNUP_SWEEP_INTERVAL", "60"))
+# Rounds of losing the race to create or update the same email before giving up
+PENDING_SIGNUP_SAVE_ATTEMPTS = 3
+
+
+class PendingSignupLimitError(Exception):
+    pass
+
+
+def as_utc(value):
+    # SQLite hands back naive datetimes
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def save_pending_signup(user_data, code):
+    """
+    Stores (or refreshes) the signup waiting for its verification code.
+    - Each email can request at most PENDING_SIGNUP_MAX_PER_EMAIL codes per TTL window
+    - At most PENDING_SIGNUP_MAX_TOTAL signups can be pending at once, checked
+      by the INSERT itself so workers can't all pass the count and then insert
+    The password is stored already hashed.
+    """
+    email = user_data["email"]
+    password = hash_password(user_data["password"])
+
+    for _ in range(PENDING_SIGNUP_SAVE_ATTEMPTS):
+        now = datetime.now(timezone.utc)
+        values = {
+            "name": user_data.get("name", ""),
+            "password": password,
+            "verification_code": code,
+            "expires_at": now + timedelta(seconds=PENDING_SIGNUP_TTL),
+        }
+        pending = PendingSignupModel.query.get(email)
+
+        if pending:
+            if as_utc(pending.window_started_at) + timedelta(seconds=PENDING_SIGNUP_TTL) > now:
+                if pending.send_count >= PENDING_SIGNUP_MAX_PER_EMAIL:
+                    raise PendingSignupLimitError("Too many verification codes requested. Please try again later.")
+                pending.send_count += 1
+            else:
+                pending.send_count = 1
+                pending.window_started_at = now
+            for key, value in values.items():
+                setattr(pending, key, value)
+            db.session.commit()
+            return pending
+
+        try:
+            inserted = insert_if_under_cap({**values, "email": email, "send_count": 1, "window_started_at": now}, now)
+            db.session.commit()
+        except IntegrityError:
+            # Another worker created the row for this email in the meantime, refresh it instead
+            db.session.rollback()
+            continue
+        if not inserted:
+            raise PendingSignupLimitError("Too many pending signups. Please try again later.")
+        return PendingSignupModel.query.get(email)
+
+    raise PendingSignupLimitError("The signup is being updated concurrently. Please try again.")
+
+
+def insert_if_under_cap(values, now):
+    """
+    INSERT ... SELECT ... WHERE (SELECT count(*) of the active signups) < cap,
+    so the cap is checked in the same statement that inserts the row.
+    - Returns whether the row was inserted
+    """
+    table = PendingSignupModel.__table__
+    active = select(func.count()).select_from(table).where(table.c.expires_at > now).scalar_subquery()
+    row = select(*[literal(value, table.c[name].type) for name, value in values.items()]).where(
+        active < PENDING_SIGNUP_MAX_TOTAL
+    )
+    result = db.session.execute(insert(table).from_select(list(values), row))
+    return result.rowcount == 1
+
+
+def get_pending_signup(email):
+    return PendingSignupModel.query.get(email) if email else None
+
+
+def is_pending_signup_expired(pending):
+    return datetime.now(timezone.utc) > as_utc(pending.expires_at)
+
+
+def delete_pending_signup(pending):
+    db.session.delete(pending)
+    db.session.commit()
+
+
+def purge_expired_signups():
+    deleted = PendingSignupModel.query.filter(
+        PendingSignupModel.expires_at <= datetime.now(timezone.utc)
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
@@ -0,0 +1,35 @@
+import os
+import random
+import threading
+import time
+import traceback
+
+
+def register_periodic_task(app, name, interval, func):
+    """
+    Runs func every `interval` seconds on a daemon thread inside an app context.
+    - The thread is started on the first request of each process, so it also
+      runs in every gunicorn worker and never in the preloading master
+    - A random initial delay keeps the workers from firing at the same moment
+    """
+    started_pid = [None]
+    lock = threading.Lock()
+
+    def loop():
+        time.sleep(random.uniform(0, interval))
+        while True:
+            try:
+                with app.app_context():
+                    func()
+            except Exception:
+                traceback.print_exc()
+            time.sleep(interval)
+
+    @app.before_request
+    def start_periodic_task():
+        if started_pid[0] == os.getpid():
+            return
+        with lock:
+            if started_pid[0] != os.getpid():
+                started_pid[0] = os.getpid()
+                threading.Thread(target=loop, name=name, daemon=True).start()
@@ -0,0 +1,212 @@
+"""
+HTTP client for the attire prediction service.
+
+Requests go through one keep-alive connection pool per process, with connect
+and read timeouts, a bounded number of retries (exponential backoff with full
+jitter) on connection errors and 429/502/503/504, and a circuit breaker that
+fails fast once the service keeps failing, instead of tying up a worker on
+every upload.
+
+The service answers a multipart "file" on PREDICTION_URL with
+{"prediction": "<type>"}. If PREDICTION_BATCH_URL is set, predict_batch sends
+several "files" in one request there and expects {"predictions": [...]} in
+the same order; otherwise it makes the single calls concurrently.
+"""
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.metrics import PREDICTION_REQUESTS
+
+PREDICTION_URL = os.getenv("PREDICTION_URL", "https://model.gyencha.purnabdrrana.com/predict")
+PREDICTION_BATCH_URL = os.getenv("PREDICTION_BATCH_URL")
+PREDICTION_CONNECT_TIMEOUT = float(os.getenv("PREDICTION_CONNECT_TIMEOUT", "2"))
+PREDICTION_READ_TIMEOUT = float(os.getenv("PREDICTION_READ_TIMEOUT", "10"))
+PREDICTION_POOL_SIZE = int(os.getenv("PREDICTION_POOL_SIZE", "10"))
+
+# Retries after the first attempt; the backoff doubles each time, up to PREDICTION_BACKOFF_MAX
+PREDICTION_RETRIES = int(os.getenv("PREDICTION_RETRIES", "2"))
+PREDICTION_BACKOFF = float(os.getenv("PREDICTION_BACKOFF", "0.2"))
+PREDICTION_BACKOFF_MAX = float(os.getenv("PREDICTION_BACKOFF_MAX", "2"))
+
+# Consecutive failed calls before the breaker opens, and seconds before it lets a trial call through
+PREDICTION_BREAKER_FAILURES = int(os.getenv("PREDICTION_BREAKER_FAILURES", "5"))
+PREDICTION_BREAKER_RESET = float(os.getenv("PREDICTION_BREAKER_RESET", "30"))
+
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class PredictionError(Exception):
+    pass
+
+
+class PredictionUnavailableError(PredictionError):
+    """The circuit breaker is open, the service wasn't called."""
+
+
+class CircuitBreaker:
+    """
+    closed: calls go through, consecutive failures are counted
+    open: calls are rejected until reset_timeout has passed
+    half-open: one trial call goes through, its outcome closes or reopens the breaker
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.trial_running:
+                return False
+            self.trial_running = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+
+class PredictionClient:
+    def __init__(self, url, batch_url=None, pool_size=10, timeout=(2, 10), retries=2,
+                 backoff=0.2, backoff_max=2, breaker=None):
+        self.url = url
+        self.batch_url = batch_url
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker(PREDICTION_BREAKER_FAILURES, PREDICTION_BREAKER_RESET)
+
+        # Retries are done here, so they can share the backoff and the breaker
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="prediction-client")
+
+    def send(self, url, files):
+        # Returns the first response that isn't worth retrying, raises PredictionError once retries run out
+        for attempt in range(self.retries + 1):
+            if attempt:
+                PREDICTION_REQUESTS.labels(outcome="retry").inc()
+                time.sleep(random.uniform(0, min(self.backoff_max, self.backoff * 2 ** (attempt - 1))))
+                for _, (_, stream, _) in files:
+                    stream.seek(0)
+
+            try:
+                response = self.session.post(url, files=files, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = PredictionError(f"Prediction service unreachable: {e}")
+                continue
+
+            if response.status_code in RETRY_STATUSES:
+                error = PredictionError(f"Prediction service error: {response.status_code} {response.text}")
+                continue
+
+            return response
+
+        raise error
+
+    def post(self, url, files):
+        if not self.breaker.allow():
+            PREDICTION_REQUESTS.labels(outcome="rejected").inc()
+            raise PredictionUnavailableError("Prediction service is unavailable, try again later.")
+
+        try:
+            response = self.send(url, files)
+        except Exception:
+            # Whatever went wrong (retries exhausted, a broken response, a bug), the breaker has to hear
+            # about it, or a half-open trial would never end and every later call would be rejected
+            self.breaker.record_failure()
+            PREDICTION_REQUESTS.labels(outcome="failure").inc()
+            raise
+
+        if response.status_code >= 500:
+            # Not worth retrying, but the service is failing all the same
+            self.breaker.record_failure()
+            PREDICTION_REQUESTS.labels(outcome="failure").inc()
+            raise PredictionError(f"Prediction service error: {response.status_code} {response.text}")
+
+        # The service answered, even a rejected request means it is up
+        self.breaker.record_success()
+        if response.status_code != 200:
+            # The request itself was rejected, retrying won't help
+            PREDICTION_REQUESTS.labels(outcome="failure").inc()
+            raise PredictionError(f"Prediction service error: {response.text}")
+
+        PREDICTION_REQUESTS.labels(outcome="success").inc()
+        try:
+            return response.json()
+        except ValueError:
+            raise PredictionError("Invalid response from prediction service.")
+
+    def predict(self, image_stream, filename="attire.jpg", content_type="image/jpeg"):
+        data = self.post(self.url, [("file", (filename, image_stream, content_type))])
+        prediction = data.get("prediction") if isinstance(data, dict) else None
+        if not prediction:
+            raise PredictionError("Invalid response from prediction service.")
+        return prediction
+
+    def predict_batch(self, image_streams, content_type="image/jpeg"):
+        """Returns the predictions in the order of image_streams."""
+        if not image_streams:
+            return []
+
+        if not self.batch_url:
+            return list(self.executor.map(lambda stream: self.predict(stream, content_type=content_type), image_streams))
+
+        files = [
+            ("files", (f"attire_{index}.jpg", stream, content_type))
+            for index, stream in enumerate(image_streams)
+        ]
+        data = self.post(self.batch_url, files)
+        predictions = data.get("predictions") if isinstance(data, dict) else None
+        if not isinstance(predictions, list) or len(predictions) != len(image_streams) or not all(predictions):
+            raise PredictionError("Invalid response from prediction service.")
+        return predictions
+
+    def get_stats(self):
+        return {"url": self.url, "batch_url": self.batch_url, "breaker": self.breaker.state,
+                "consecutive_failures": self.breaker.failures}
+
+
+client = PredictionClient(
+    PREDICTION_URL,
+    batch_url=PREDICTION_BATCH_URL,
+    pool_size=PREDICTION_POOL_SIZE,
+    timeout=(PREDICTION_CONNECT_TIMEOUT, PREDICTION_READ_TIMEOUT),
+    retries=PREDICTION_RETRIES,
+    backoff=PREDICTION_BACKOFF,
+    backoff_max=PREDICTION_BACKOFF_MAX,
+)
@@ -0,0 +1,174 @@
+import io
+import time
+
+from models import WardrobeItemsModel
+from utils.attire_classifier import classify_attire
+from utils.color_extractor import get_dominant_color
+from utils.image_cache import get_cached_image, store_cached_image
+from utils.image_hash import calculate_image_hash
+from utils.metrics import stage_timer
+from utils.object_storage import schedule_delete, upload_executor, upload_image
+from utils.outfits_recommendation import hsl_columns
+from utils.prediction_client import PredictionError, PredictionUnavailableError
+from utils.remove_bg import remove_background
+
+# Ingestion stages; the upload runs alongside predict and color
+STAGE_NAMES = ("hash", "remove_bg", "predict", "color", "upload")
+
+
+class PipelineError(Exception):
+    status_code = 500
+
+
+class DuplicateImageError(PipelineError):
+    status_code = 400
+
+
+class ServiceUnavailableError(PipelineError):
+    status_code = 503
+
+
+def predict_attire_type(img_no_bg):
+    try:
+        return classify_attire(img_no_bg)
+    except PredictionUnavailableError as e:
+        raise ServiceUnavailableError(str(e))
+    except PredictionError as e:
+        raise PipelineError(str(e))
+
+
+def upload_attire_image(img_no_bg, user_id):
+    temp_stream = io.BytesIO()
+    img_no_bg.save(temp_stream, format="PNG")
+    temp_stream.seek(0)
+
+    return upload_image(
+        temp_stream,
+        user_id,
+        subfolder="attire",
+        is_unique=True
+    )
+
+
+# Stage implementations, swappable with set_stage (e.g. local stand-ins in tests)
+stages = {
+    "hash": calculate_image_hash,
+    "remove_bg": remove_background,
+    "predict": predict_attire_type,
+    "color": get_dominant_color,
+    "upload": upload_attire_image,
+}
+
+
+def set_stage(name, func):
+    if name not in STAGE_NAMES:
+        raise ValueError(f"Unknown ingestion stage: {name}")
+    stages[name] = func
+
+
+def run_stage(name, *args):
+    with stage_timer(name):
+        return stages[name](*args)
+
+
+def run_timed_stage(name, *args):
+    started = time.perf_counter()
+    result = run_stage(name, *args)
+    return result, time.perf_counter() - started
+
+
+def discard_upload(upload):
+    # The item won't be saved, delete the image once its upload has finished
+    def delete_stored(future):
+        if not future.cancelled() and future.exception() is None:
+            schedule_delete(future.result()[0].public_id)
+
+    upload.add_done_callback(delete_stored)
+
+
+def run_pipeline(image_file, user_id, on_stage=None):
+    """
+    Runs an uploaded image through every ingestion stage.
+    - on_stage(name, state, seconds) is called when a stage starts and ends,
+      or with state "cached" for stages skipped thanks to the image cache
+    - Returns the column values for the new WardrobeItemsModel
+    """
+    def run(name, *args):
+        if on_stage:
+            on_stage(name, "running", None)
+        started = time.perf_counter()
+        result = run_stage(name, *args)
+        if on_stage:
+            on_stage(name, "done", time.perf_counter() - started)
+        return result
+
+    def start(name, *args):
+        # Runs the stage on the upload pool; on_stage is still called from this thread
+        if on_stage:
+            on_stage(name, "running", None)
+        return upload_executor.submit(run_timed_stage, name, *args)
+
+    def finish(name, future):
+        result, seconds = future.result()
+        if on_stage:
+            on_stage(name, "done", seconds)
+        return result
+
+    # Step 1: Check for duplicate image using hash
+    image_hash = run("hash", image_file)
+
+    duplicate_item = WardrobeItemsModel.query.filter_by(
+        user_id=user_id,
+        image_hash=image_hash
+    ).first()
+    if duplicate_item:
+        raise DuplicateImageError("This image has already been uploaded.")
+
+    cached = get_cached_image(image_hash)
+    if cached:
+        # Same content processed before, only the upload is left to do
+        img_no_bg, attire_type, color_hex = cached
+        if on_stage:
+            for name in ("remove_bg", "predict", "color"):
+                on_stage(name, "cached", None)
+        upload = start("upload", img_no_bg, user_id)
+    else:
+        # Step 2: Remove background
+        img_no_bg = run("remove_bg", image_file)
+
+        # Step 3: Upload in the background, it only needs the processed image
+        upload = start("upload", img_no_bg, user_id)
+
+        try:
+            # Step 4: Predict the attire type
+            attire_type = run("predict", img_no_bg)
+
+            # Step 5: Extract dominant color
+            color_hex = run("color", img_no_bg)
+        except Exception:
+            discard_upload(upload)
+            raise
+
+        store_cached_image(image_hash, img_no_bg, attire_type, color_hex)
+
+    stored_image = finish("upload", upload)
+
+    return {
+        "type": attire_type,
+        "color": color_hex,
+        "image_url": stored_image.url,
+        "public_id": stored_image.public_id,
+        "image_hash": image_hash,
+        **hsl_columns(color_hex),
+    }
+
+
+def remove_background_and_extract_color(image_file):
+    # CPU-bound stages
+    img_no_bg = run_stage("remove_bg", image_file)
+    return img_no_bg, run_stage("color", img_no_bg)
+
+
+def predict_and_upload(img_no_bg, user_id):
+    # Network-bound stages
+    return run_stage("predict", img_no_bg), run_stage("upload", img_no_bg, user_id)